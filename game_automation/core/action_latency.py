@@ -0,0 +1,110 @@
+"""
+Frame-to-action latency: how old the pixels were when an input fired.
+
+Every vision result carries the capture time of its frame ("timestamp",
+time.time() clock) and its sequence numbers ("seq" from the VisionFeed,
+"capture_seq" from the capture worker). AutomationController remembers the
+last result a node read (the decision) and, when the node sends an input
+(note_input()), records one entry here:
+
+    capture -> decision   pipeline latency plus the time the frame waited for the node
+    decision -> input     the handler's own work, including mouse movement
+
+Only the first input after a vision read is attributed to that frame; inputs
+that follow without a new read (e.g. a key press right after a click) acted on
+nothing new and are not recorded.
+
+The most recent ACTION_LATENCY_SAMPLES entries of every script are kept, and
+summary() reports percentiles per script and per node.
+"""
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import numpy as np
+
+ACTION_LATENCY_SAMPLES = 2048
+ACTION_LATENCY_QUANTILES = (50, 95, 99)
+# Intervals reported by summary()
+ACTION_LATENCY_INTERVALS = ("total_ms", "capture_to_decision_ms", "decision_to_input_ms")
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    points = np.percentile(np.asarray(values, dtype=np.float64), ACTION_LATENCY_QUANTILES)
+    result = {f"p{q}": float(v) for q, v in zip(ACTION_LATENCY_QUANTILES, points)}
+    result["max"] = float(max(values))
+    return result
+
+
+def _summarize(records: List[dict]) -> dict:
+    summary = {"count": len(records)}
+    for key in ACTION_LATENCY_INTERVALS:
+        summary[key[:-3]] = _percentiles([r[key] for r in records])
+    return summary
+
+
+class ActionLatencyTracker:
+    def __init__(self, samples: int = ACTION_LATENCY_SAMPLES):
+        self.samples = max(1, int(samples))
+        self._lock = threading.Lock()
+        self._records: Dict[str, Deque[dict]] = {}
+        self.last: Optional[dict] = None
+
+    def record(self, script: str, node_id: str, node_type: str, frame: dict, decision_time: float, input_time: float) -> Optional[dict]:
+        """
+        Record an input sent by ``node_id`` that acted on vision result ``frame``.
+        Times are time.time() values; results without a capture timestamp are ignored.
+        """
+        capture_time = frame.get("timestamp")
+        if capture_time is None:
+            return None
+        entry = {
+            "script": script,
+            "node_id": node_id,
+            "node_type": node_type,
+            "frame_seq": frame.get("seq"),
+            "capture_seq": frame.get("capture_seq"),
+            "capture_time": capture_time,
+            "decision_time": decision_time,
+            "input_time": input_time,
+            "capture_to_decision_ms": (decision_time - capture_time) * 1000.0,
+            "decision_to_input_ms": (input_time - decision_time) * 1000.0,
+            "total_ms": (input_time - capture_time) * 1000.0,
+        }
+        with self._lock:
+            records = self._records.get(script)
+            if records is None:
+                records = self._records[script] = deque(maxlen=self.samples)
+            records.append(entry)
+            self.last = entry
+        return entry
+
+    def scripts(self) -> List[str]:
+        with self._lock:
+            return sorted(self._records)
+
+    def records(self, script: str) -> List[dict]:
+        with self._lock:
+            return list(self._records.get(script, ()))
+
+    def summary(self, script: str) -> dict:
+        """
+        count and p50/p95/p99/max of "total", "capture_to_decision" and
+        "decision_to_input" (ms) for ``script``, plus the same per node under "nodes"
+        """
+        records = self.records(script)
+        by_node: Dict[str, List[dict]] = {}
+        for r in records:
+            by_node.setdefault(r["node_id"], []).append(r)
+        summary = _summarize(records)
+        summary["nodes"] = {nid: dict(_summarize(rs), type=rs[-1]["node_type"]) for nid, rs in by_node.items()}
+        return summary
+
+    def reset(self, script: Optional[str] = None):
+        """Forget the entries of ``script`` (None: every script)"""
+        with self._lock:
+            if script is None:
+                self._records.clear()
+            else:
+                self._records.pop(script, None)
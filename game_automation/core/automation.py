@@ -1,25 +1,255 @@
+import time
+import threading
 from typing import Optional, Callable, Union
 from .actions import VisualScript, VisualNode
+from .image_processor import ImageProcessor, get_shared_image_processor
+from .script_plan import LOOP_NODE_TYPES, ExecutionPlan, compile_action, compile_script, script_fingerprint
+from .node_handlers import get_node_handler, handler_uses_vision, registry_version
+from .vision_feed import VisionFeed
+from .action_latency import ActionLatencyTracker
+from .node_stats import NodeStatistics
+from .tracer import get_tracer
+
+
+# Re-check interval for wait_for nodes when the run has no VisionFeed to notify them
+VISION_POLL_INTERVAL = 0.05
+
+# Wake-up interval used only when cancellation is signalled by a caller-supplied
+# callback instead of the controller's cancel event (the callback cannot notify us)
+CALLBACK_POLL_INTERVAL = 0.05
 
 
 class AutomationController:
-    def __init__(self, scale_factor: float = 1.0):
+    def __init__(self, scale_factor: float = 1.0, image_processor: Optional[ImageProcessor] = None):
+        # Vision service used by color-search nodes; resolved lazily to the shared instance
+        self._image_processor: Optional[ImageProcessor] = image_processor
         self.on_node_executed: Optional[Callable[[str, bool], None]] = None
         self.on_node_about_to_execute: Optional[Callable[[str], None]] = None
         self.scale_factor = float(scale_factor)
         self._loop_counters: dict[str, int] = {}
+        # find_all node ID -> [instances snapshot, index of the next instance]
+        self._instance_iterators: dict[str, list] = {}
+        # Detection selected by the innermost active find_all (used by click mode "instance")
+        self.current_instance: Optional[dict] = None
         self.execution_mode: str = "continuous"  # "continuous", "step", "paused"
         self.breakpoints: set[str] = set()
         self._execution_paused: bool = False
         self._waiting_for_step: bool = False
+        # Pause/step/resume and cancellation are signalled through these instead of polling
+        self._state_cond = threading.Condition()
+        self._cancel_event: Optional[threading.Event] = None  # Cancel event of the active run
+        self._external_cancel: Optional[Callable[[], bool]] = None  # Caller-supplied cancel callback of the active run
+        # After an input action, vision-reading nodes wait (up to this long) for a frame
+        # captured after the input, so they never act on a stale screen
+        self.fresh_frame_timeout: float = 0.5
+        self._vision_feed: Optional[VisionFeed] = None  # Feed of the active run, if any
+        self._get_vision_result: Optional[Callable[[], dict]] = None  # Vision source of the active run
+        self._last_input_time: Optional[float] = None  # time.time() of the last input not yet observed
+        # Frame-ring leases of the vision results the current node reads; released after the node
+        self._held_leases: list = []
+        # While a script runs, template matching is limited to the labels it reads.
+        # With a horizon, only labels reachable within that many steps of the
+        # current node stay active (None: every label the script references)
+        self.active_label_horizon: Optional[int] = None
+        # Last compiled plan; reused until the script object or its content changes
+        self._plan: Optional[ExecutionPlan] = None
+        # PerformanceMonitor that receives "node:<type>" handler times, if any
+        self.latency_monitor = None
+        # Frame-to-input latency of every input action, per script and node
+        self.action_latency = ActionLatencyTracker()
+        # Constant-memory per-node/per-type durations of the current (or last) run
+        self.node_stats = NodeStatistics()
+        self._script_name: str = ""  # Script of the active run
+        self._current_node = None  # CompiledNode whose handler is running
+        # (vision result, time.time() it was handed to the node) the next input acts on
+        self._decision: Optional[tuple] = None
     
+    @property
+    def image_processor(self) -> ImageProcessor:
+        """Vision service used for color search (defaults to the process-wide instance)"""
+        if self._image_processor is None:
+            self._image_processor = get_shared_image_processor()
+        return self._image_processor
+
     def resume_execution(self):
         """Resume execution from pause or step mode"""
-        self._execution_paused = False
+        with self._state_cond:
+            self._execution_paused = False
+            self._state_cond.notify_all()
     
     def pause_execution(self):
         """Pause execution"""
-        self._execution_paused = True
+        with self._state_cond:
+            self._execution_paused = True
+    
+    def cancel_execution(self, cancel_event: Optional[threading.Event] = None):
+        """
+        Cancel the running script.
+
+        Sets ``cancel_event`` (or the active run's event) and wakes every wait in
+        the engine (pause, step, breakpoint and timed waits) immediately.
+        Passing the event that will be handed to execute_visual_script() makes
+        cancellation safe to request before the run has actually started.
+        """
+        event = cancel_event or self._cancel_event
+        if event is not None:
+            event.set()
+        with self._state_cond:
+            self._state_cond.notify_all()
+        feed = self._vision_feed
+        if feed is not None:
+            feed.wake_waiters()
+    
+    def is_cancelled(self) -> bool:
+        """True if the active run has been cancelled (event or caller-supplied callback)"""
+        event = self._cancel_event
+        if event is not None and event.is_set():
+            return True
+        callback = self._external_cancel
+        return bool(callback and callback())
+    
+    def note_input(self):
+        """Record that an input action (click/key) was just sent"""
+        now = self._last_input_time = time.time()
+        decision, self._decision = self._decision, None
+        cn = self._current_node
+        if decision is None or cn is None:
+            return
+        entry = self.action_latency.record(self._script_name, cn.id, cn.type, decision[0], decision[1], now)
+        if entry is not None and self.latency_monitor is not None:
+            self.latency_monitor.record_latency("frame_to_input", entry["total_ms"])
+    
+    def _update_active_labels(self, plan: ExecutionPlan, nid: Optional[str]):
+        """Point the shared matcher at the labels the script can read from ``nid``"""
+        horizon = self.active_label_horizon
+        if horizon is None:
+            labels = plan.referenced_labels()
+        else:
+            # Keep at least the successors active so frames already in flight cover the next node
+            labels = plan.referenced_labels(nid, max(1, int(horizon)))
+        self._set_matcher_labels(labels)
+    
+    def _set_matcher_labels(self, labels):
+        # Injected processors that only provide color search have no matcher to scope
+        matcher = getattr(self.image_processor, "matcher", None)
+        if matcher is not None:
+            matcher.set_active_labels(labels)
+    
+    def _set_capture_scope(self, plan: Optional[ExecutionPlan]):
+        """Limit the capture crop to what ``plan`` reads (None: back to every target)"""
+        crop = getattr(self.image_processor, "capture_crop", None)
+        if crop is None:
+            return
+        changed = crop.reset() if plan is None else crop.set_scope(plan.referenced_labels(), plan.referenced_regions(), plan.referenced_reach())
+        if changed and plan is not None:
+            # Frames in flight were cropped for the previous scope; act on one captured from now on
+            self._last_input_time = time.time()
+
+    def _vision_for_node(self, get_vision_result: Callable[[], dict]) -> dict:
+        """
+        Return the vision result a node should act on.
+
+        If an input was sent since the last vision read and the run is fed by a
+        VisionFeed, block until a frame captured after that input arrives (or
+        fresh_frame_timeout elapses) instead of acting on the pre-input frame.
+        """
+        feed = self._vision_feed
+        input_time = self._last_input_time
+        if feed is not None and input_time is not None:
+            self._last_input_time = None
+            res = feed.wait_for_result(after_time=input_time, timeout=self.fresh_frame_timeout, should_abort=self.is_cancelled)
+            if res is not None and self._hold_vision(res):
+                return res
+        res = get_vision_result()
+        if not self._hold_vision(res):
+            # Superseded and recycled between the read and the retain; the new latest is live
+            res = get_vision_result()
+            self._hold_vision(res)
+        return res
+
+    def _hold_vision(self, result: Optional[dict]) -> bool:
+        """
+        Keep the frame buffers of ``result`` alive until the current node finishes.
+        Returns False if they were already recycled (results without a lease always succeed).
+        """
+        lease = result.get("frame_lease") if result else None
+        if lease is not None:
+            if not lease.retain():
+                return False
+            self._held_leases.append(lease)
+        if result:
+            # The node decides on this frame; note_input() measures from its capture
+            self._decision = (result, time.time())
+        return True
+
+    def _drop_vision(self, result: Optional[dict]):
+        """Release the current node's hold on ``result`` (a frame it has moved past)"""
+        lease = result.get("frame_lease") if result else None
+        if lease is None:
+            return
+        for i, held in enumerate(self._held_leases):
+            if held is lease:
+                del self._held_leases[i]
+                lease.release()
+                return
+
+    def _release_vision(self):
+        leases, self._held_leases = self._held_leases, []
+        for lease in leases:
+            lease.release()
+    
+    def next_vision_result(self, previous: Optional[dict], timeout: float) -> Optional[dict]:
+        """
+        Block until a vision result newer than ``previous`` is available.
+
+        With a VisionFeed this wakes on the exact frame that is published next;
+        otherwise it re-reads the vision source every VISION_POLL_INTERVAL.
+        Returns None on timeout or cancellation, and after one poll interval
+        if there is no vision source to re-read (a static result). The node's hold moves from
+        ``previous`` to the returned result, so a node polling many frames only
+        ever keeps the newest one alive.
+        """
+        feed = self._vision_feed
+        if feed is not None:
+            after_seq = (previous or {}).get("seq", 0)
+            while True:
+                res = feed.wait_for_result(after_seq=after_seq, timeout=max(0.0, timeout), should_abort=self.is_cancelled)
+                if res is None:
+                    return None
+                if self._hold_vision(res):
+                    self._drop_vision(previous)
+                    return res
+        # Sleep even without a source, so a caller re-checking a static result does not spin
+        if not self.wait(min(VISION_POLL_INTERVAL, max(0.0, timeout))):
+            return None
+        get_vision_result = self._get_vision_result
+        if get_vision_result is None:
+            return None
+        res = get_vision_result()
+        if self._hold_vision(res):
+            self._drop_vision(previous)
+        return res
+    
+    def wait(self, seconds: float) -> bool:
+        """
+        Interruptible timed wait for node handlers.
+
+        Returns True if the full duration elapsed, False if the run was cancelled.
+        """
+        event = self._cancel_event or threading.Event()
+        callback = self._external_cancel
+        if callback is None:
+            return not event.wait(max(0.0, seconds))
+        # A callback cannot wake us, so fall back to waking periodically to check it
+        deadline = time.monotonic() + max(0.0, seconds)
+        while True:
+            if callback():
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            if event.wait(min(CALLBACK_POLL_INTERVAL, remaining)):
+                return False
     
     def toggle_breakpoint(self, node_id: str):
         """Toggle breakpoint on a node"""
@@ -28,9 +258,37 @@ class AutomationController:
         else:
             self.breakpoints.add(node_id)
 
-    def execute_visual_script(self, script: VisualScript, vision_result: Union[dict, Callable[[], dict]], current_node_id: Optional[str] = None, should_cancel_callback: Optional[Callable[[], bool]] = None):
+    def compile_script(self, script: VisualScript) -> ExecutionPlan:
+        """
+        Return the compiled ExecutionPlan for ``script``.
+
+        The plan is cached and only rebuilt when a different script is passed,
+        the script's nodes/connections have changed since the last compile, or
+        node handlers were registered in the meantime.
+        """
+        fingerprint = script_fingerprint(script)
+        version = registry_version()
+        plan = self._plan
+        if plan is not None and plan.script is script and plan.fingerprint == fingerprint and plan.handlers_version == version:
+            return plan
+        plan = compile_script(script, get_node_handler, fingerprint=fingerprint, handlers_version=version, uses_vision=handler_uses_vision)
+        self._plan = plan
+        return plan
+
+    def execute_visual_script(self, script: VisualScript, vision_result: Union[dict, Callable[[], dict], VisionFeed], current_node_id: Optional[str] = None, should_cancel_callback: Optional[Callable[[], bool]] = None, cancel_event: Optional[threading.Event] = None):
+        """
+        Execute ``script`` from ``current_node_id`` (or its first node).
+
+        ``vision_result`` may be a static dict, a callable returning the latest
+        result, or a VisionFeed; with a feed, nodes that read vision after an
+        input action wait for a frame captured after that input.
+        Cancellation is requested through ``cancel_event`` / cancel_execution();
+        ``should_cancel_callback`` is still honoured for callers that only have a flag.
+        """
         # Reset loop counters at the start of each execution
         self._loop_counters.clear()
+        self._instance_iterators.clear()
+        self.current_instance = None
         
         # Handle empty script or missing starting node
         if not script.nodes:
@@ -39,7 +297,8 @@ class AutomationController:
                 self.on_node_executed("", False)
             raise ValueError("VisualScript has no nodes")
         
-        nid = current_node_id or (script.nodes[0].id if script.nodes else None)
+        plan = self.compile_script(script)
+        nid = current_node_id or plan.entry_id
         if nid is None:
             if self.on_node_executed:
                 # Signal error condition
@@ -53,433 +312,147 @@ class AutomationController:
         else:
             get_vision_result = vision_result
         
+        self._cancel_event = cancel_event or threading.Event()
+        self._external_cancel = should_cancel_callback
+        self._vision_feed = vision_result if isinstance(vision_result, VisionFeed) else None
+        self._get_vision_result = get_vision_result
+        self._last_input_time = None
+        self._script_name = script.name or script.id
+        self._decision = None
+        is_cancelled = self.is_cancelled
+        
         steps = 0
         visited = set()
         prev_loop_driven = False
-        prev_node_id = None
+        run_start = time.perf_counter()
+        self.node_stats.start()
         try:
+            self._update_active_labels(plan, nid)
+            self._set_capture_scope(plan)
             while nid and steps < 1000:
                 # Check for cancellation before executing each node
-                if should_cancel_callback and should_cancel_callback():
+                if is_cancelled():
                     break
                 
                 # Check for global pause (applies to all execution modes)
                 # This allows pause button to interrupt continuous execution
                 if self._execution_paused:
-                    self._wait_for_resume(should_cancel_callback)
+                    self._wait_for_resume()
                     # If cancelled during pause, break out of loop
-                    if should_cancel_callback and should_cancel_callback():
+                    if is_cancelled():
                         break
                 
-                node = self._find_node(script, nid)
-                if node is None:
+                cn = plan.get(nid)
+                if cn is None:
                     # Node ID exists in connections but node not found in script
                     # Log error and break to prevent infinite loop
                     if self.on_node_executed:
                         self.on_node_executed(nid, False)
                     break
                 
-                allow_repeat = bool(node and (node.type == "loop" or prev_loop_driven))
+                allow_repeat = cn.type in LOOP_NODE_TYPES or prev_loop_driven
                 if nid in visited and not allow_repeat:
                     break
                 visited.add(nid)
                 steps += 1
+                if self.active_label_horizon is not None:
+                    self._update_active_labels(plan, nid)
                 
                 # Check for breakpoints and step mode
                 if nid in self.breakpoints:
-                    self._execution_paused = True
-                    # Wait for resume with frequent cancellation checks
-                    self._wait_for_resume(should_cancel_callback)
+                    self.pause_execution()
+                    # Block until resumed or cancelled
+                    self._wait_for_resume()
                 
                 if self.execution_mode == "step":
-                    self._execution_paused = True
+                    self.pause_execution()
                     self._waiting_for_step = True
-                    # Wait for step signal with frequent cancellation checks
-                    self._wait_for_resume(should_cancel_callback)
+                    # Block until the next step signal or cancellation
+                    self._wait_for_resume()
                     self._waiting_for_step = False
                 
+                if is_cancelled():
+                    break
+                
                 # Signal that we're about to execute this node (for running state)
-                # This should be done via a callback if available
-                if hasattr(self, 'on_node_about_to_execute') and self.on_node_about_to_execute:
+                if self.on_node_about_to_execute:
                     self.on_node_about_to_execute(nid)
                 
                 ok = False
-                next_override = None
-                if node:
-                    # Get fresh vision result for each node execution
-                    current_vision = get_vision_result()
-                    # Pass cancellation callback to _exec_node for cancellable operations
-                    ok, next_override = self._exec_node(node, current_vision, should_cancel_callback=should_cancel_callback)
+                slot = None
+                if cn.handler is not None and cn.error is None:
+                    handler_start = time.perf_counter()
+                    # Get fresh vision result for each node execution (post-input frame if needed);
+                    # a find_all re-entry only advances over the detections it snapshotted on entry
+                    reads_vision = cn.uses_vision and not (cn.type == "find_all" and cn.id in self._instance_iterators)
+                    current_vision = self._vision_for_node(get_vision_result) if reads_vision else {}
+                    self._current_node = cn
+                    try:
+                        # Pass cancellation check to the handler for cancellable operations
+                        ok, slot = cn.handler(self, cn, current_vision, is_cancelled)
+                    finally:
+                        self._current_node = None
+                        self._release_vision()
+                        handler_end = time.perf_counter()
+                        handler_ms = (handler_end - handler_start) * 1000.0
+                        self.node_stats.record(cn.id, cn.type, handler_ms)
+                        get_tracer().complete(f"node:{cn.type}", "engine", handler_start, handler_end, {"node": cn.id})
+                        if self.latency_monitor is not None:
+                            self.latency_monitor.record_latency(f"node:{cn.type}", handler_ms)
                 if self.on_node_executed:
                     self.on_node_executed(nid, ok)
                 
-                prev_node_id = nid
-                if node and node.type == "loop":
-                    prev_loop_driven = (next_override == node.params.get("next_body"))
-                else:
-                    prev_loop_driven = False
-                nid = next_override or script.connections.get(nid)
+                prev_loop_driven = cn.type in LOOP_NODE_TYPES and slot == "next_body"
+                nid = cn.successor(slot)
         finally:
+            self.node_stats.finish(cancelled=is_cancelled())
             # Reset execution state to clean default regardless of how execution ended
             self.execution_mode = "continuous"
             self._execution_paused = False
             self._waiting_for_step = False
+            self._cancel_event = None
+            self._external_cancel = None
+            self._vision_feed = None
+            self._get_vision_result = None
+            self._last_input_time = None
+            self._decision = None
+            get_tracer().complete(f"script:{self._script_name}", "engine", run_start, time.perf_counter())
+            self._set_matcher_labels(None)
+            self._set_capture_scope(None)
 
-    def _wait_for_resume(self, should_cancel_callback: Optional[Callable[[], bool]] = None):
+    def _wait_for_resume(self):
         """
         Wait for execution to resume (pause, breakpoint, or step mode).
-        Continuously checks for cancellation to support stop button.
         
+        Blocks on the state condition, which resume_execution() and
+        cancel_execution() notify, so stop/step/continue take effect immediately.
         This helper function is used by pause, breakpoint, and step mode to avoid code duplication.
         """
-        import time
-        while self._execution_paused and not (should_cancel_callback and should_cancel_callback()):
-            time.sleep(0.05)  # Reduced sleep interval for faster cancellation response
-            # Check cancellation more frequently
-            if should_cancel_callback and should_cancel_callback():
-                break
+        # Only a caller-supplied cancel callback needs periodic wake-ups
+        timeout = CALLBACK_POLL_INTERVAL if self._external_cancel is not None else None
+        with self._state_cond:
+            while self._execution_paused and not self.is_cancelled():
+                self._state_cond.wait(timeout)
     
     def _find_node(self, script: VisualScript, nid: str) -> Optional[VisualNode]:
-        for n in script.nodes:
-            if n.id == nid:
-                return n
-        return None
+        plan = self._plan
+        if plan is None or plan.script is not script:
+            plan = self.compile_script(script)
+        cn = plan.get(nid)
+        return cn.node if cn else None
 
-    def _exec_node(self, node: VisualNode, vision_result: dict, should_cancel_callback: Optional[Callable[[], bool]] = None) -> tuple[bool, Optional[str]]:
-        t = node.type
-        if t == "sleep":
-            import time
-            secs = float(node.params.get("seconds", 0.2))
-            # Break long sleep into smaller chunks to allow cancellation
-            chunk_duration = 0.1  # Check cancellation every 100ms
-            elapsed = 0.0
-            while elapsed < secs:
-                if should_cancel_callback and should_cancel_callback():
-                    # Cancellation requested, return early
-                    return False, None
-                remaining = secs - elapsed
-                sleep_time = min(chunk_duration, remaining)
-                time.sleep(sleep_time)
-                elapsed += sleep_time
-            return True, None
-        if t == "key":
-            try:
-                # Check cancellation before key press
-                if should_cancel_callback and should_cancel_callback():
-                    return False, None
-                
-                import pyautogui
-                key = str(node.params.get("key", "space"))
-                pyautogui.press(key)
-                
-                # Check cancellation after key press
-                if should_cancel_callback and should_cancel_callback():
-                    return False, None
-                
-                return True, None
-            except Exception:
-                return False, None
-        if t == "click":
-            try:
-                import pyautogui
-                m = node.params.get("mode", "label")
-                if m == "label":
-                    label = str(node.params.get("label", ""))
-                    det = next((d for d in vision_result.get("found_targets", []) if d.get("label") == label), None)
-                    if det:
-                        x1, y1, x2, y2 = det["bbox"]
-                        cx = int((x1 + x2) / 2 * self.scale_factor)
-                        cy = int((y1 + y2) / 2 * self.scale_factor)
-                        pyautogui.moveTo(cx, cy, duration=float(node.params.get("duration", 0)))
-                        pyautogui.click(button=str(node.params.get("button", "left")))
-                        return True, None
-                return False, None
-            except Exception:
-                return False, None
-        if t == "find_color":
-            try:
-                # Check cancellation before starting image processing
-                if should_cancel_callback and should_cancel_callback():
-                    return False, None
-                
-                from .image_processor import ImageProcessor
-                frame_bgr = vision_result.get("frame")
-                if frame_bgr is None:
-                    return False, None
-                hsv_min = node.params.get("hsv_min")
-                hsv_max = node.params.get("hsv_max")
-                bgr_min = node.params.get("bgr_min")
-                bgr_max = node.params.get("bgr_max")
-                ip = ImageProcessor()
-                boxes = ip.find_color(frame_bgr, hsv_min=hsv_min, hsv_max=hsv_max, bgr_min=bgr_min, bgr_max=bgr_max)
-                
-                # Check cancellation after image processing completes
-                if should_cancel_callback and should_cancel_callback():
-                    return False, None
-                
-                return bool(boxes), None
-            except Exception:
-                return False, None
-        if t == "condition":
-            try:
-                result = False
-                m = node.params.get("mode", "label")
-                if m == "label":
-                    label = str(node.params.get("label", ""))
-                    min_confidence = float(node.params.get("min_confidence", 0.0))
-                    det = next((d for d in vision_result.get("found_targets", []) if d.get("label") == label), None)
-                    if det:
-                        det_confidence = det.get("confidence", 0.0)
-                        result = det_confidence >= min_confidence
-                    else:
-                        result = False
-                elif m == "color":
-                    # Check cancellation before starting image processing
-                    if should_cancel_callback and should_cancel_callback():
-                        return False, None
-                    
-                    from .image_processor import ImageProcessor
-                    frame_bgr = vision_result.get("frame")
-                    if frame_bgr is not None:
-                        hsv_min = node.params.get("hsv_min")
-                        hsv_max = node.params.get("hsv_max")
-                        bgr_min = node.params.get("bgr_min")
-                        bgr_max = node.params.get("bgr_max")
-                        ip = ImageProcessor()
-                        boxes = ip.find_color(frame_bgr, hsv_min=hsv_min, hsv_max=hsv_max, bgr_min=bgr_min, bgr_max=bgr_max)
-                        
-                        # Check cancellation after image processing completes
-                        if should_cancel_callback and should_cancel_callback():
-                            return False, None
-                        
-                        result = bool(boxes)
-                next_id = node.params.get("next_true") if result else node.params.get("next_false")
-                return result, next_id
-            except Exception:
-                return False, None
-        if t == "loop":
-            try:
-                count = int(node.params.get("count", 0))
-                executed = self._loop_counters.get(node.id, 0)
-                if executed < count:
-                    self._loop_counters[node.id] = executed + 1
-                    return True, node.params.get("next_body")
-                else:
-                    self._loop_counters.pop(node.id, None)
-                    return True, node.params.get("next_after")
-            except Exception:
-                return False, None
-        if t == "find_image":
-            try:
-                template_name = str(node.params.get("template_name", ""))
-                confidence_threshold = float(node.params.get("confidence", 0.8))
-                
-                if not template_name:
-                    return False, None
-                
-                # Check found_targets from vision_result
-                found_targets = vision_result.get("found_targets", [])
-                for det in found_targets:
-                    if det.get("label") == template_name:
-                        det_confidence = det.get("confidence", 0.0)
-                        if det_confidence >= confidence_threshold:
-                            return True, None
-                
-                return False, None
-            except Exception:
-                return False, None
-        if t == "verify_image_color":
+    def run_sequence(self, seq, vision_result: dict):
+        """
+        Run a legacy ActionSequence against a single vision result.
+
+        Actions run on the same node handlers as VisualScript nodes; results are
+        ignored because sequences have no branching.
+        """
+        for index, action in enumerate(getattr(seq, "actions", [])):
+            cn = compile_action(action, get_node_handler, index=index)
+            if cn.handler is None or cn.error is not None:
+                continue
             try:
-                # Check cancellation before starting verification
-                if should_cancel_callback and should_cancel_callback():
-                    return False, None
-                
-                template_name = str(node.params.get("template_name", ""))
-                offset_x = int(node.params.get("offset_x", 0))
-                offset_y = int(node.params.get("offset_y", 0))
-                hsv_min = node.params.get("hsv_min")
-                hsv_max = node.params.get("hsv_max")
-                bgr_min = node.params.get("bgr_min")
-                bgr_max = node.params.get("bgr_max")
-                radius = float(node.params.get("radius", 0.0))
-                
-                if not template_name:
-                    return False, None
-                
-                # Find the template in found_targets
-                found_targets = vision_result.get("found_targets", [])
-                det = next((d for d in found_targets if d.get("label") == template_name), None)
-                if not det:
-                    return False, None
-                
-                # Get bbox and calculate actual coordinates
-                x1, y1, x2, y2 = det["bbox"]
-                # Calculate center or use offset from top-left
-                center_x = int((x1 + x2) / 2)
-                center_y = int((y1 + y2) / 2)
-                check_x = center_x + offset_x
-                check_y = center_y + offset_y
-                
-                # Get frame
-                frame_bgr = vision_result.get("frame")
-                if frame_bgr is None:
-                    return False, None
-                
-                # Check bounds
-                h, w = frame_bgr.shape[:2]
-                if check_x < 0 or check_x >= w or check_y < 0 or check_y >= h:
-                    return False, None
-                
-                # Extract a small ROI around the check point
-                # Use radius as the ROI radius (half the side length of the square ROI)
-                # ROI will be a square from (check_x - radius, check_y - radius) to (check_x + radius, check_y + radius)
-                roi_size = max(1, int(radius) if radius > 0 else 5)
-                roi_x1 = max(0, check_x - roi_size)
-                roi_y1 = max(0, check_y - roi_size)
-                roi_x2 = min(w, check_x + roi_size)
-                roi_y2 = min(h, check_y + roi_size)
-                roi = frame_bgr[roi_y1:roi_y2, roi_x1:roi_x2]
-                
-                if roi.size == 0:
-                    return False, None
-                
-                # Check cancellation before image processing
-                if should_cancel_callback and should_cancel_callback():
-                    return False, None
-                
-                # Use ImageProcessor to find color in ROI
-                from .image_processor import ImageProcessor
-                ip = ImageProcessor()
-                boxes = ip.find_color(roi, hsv_min=hsv_min, hsv_max=hsv_max, bgr_min=bgr_min, bgr_max=bgr_max)
-                
-                # Check cancellation after image processing completes
-                if should_cancel_callback and should_cancel_callback():
-                    return False, None
-                
-                return bool(boxes), None
+                cn.handler(self, cn, vision_result, None)
             except Exception:
-                return False, None
-        return False, None
-
-    def run_sequence(self, seq, vision_result: dict):
-        for a in getattr(seq, "actions", []):
-            t = a.type
-            if t == "sleep":
-                import time
-                secs = float(a.params.get("seconds", 0.0))
-                time.sleep(secs)
-            elif t == "key":
-                try:
-                    import pyautogui
-                    key = str(a.params.get("key", "space"))
-                    pyautogui.keyDown(key)
-                    pyautogui.keyUp(key)
-                except Exception:
-                    pass
-            elif t == "click":
-                try:
-                    import pyautogui
-                    mode = a.params.get("mode", "bbox")
-                    if mode == "bbox":
-                        x1, y1, x2, y2 = a.params.get("bbox", [0, 0, 0, 0])
-                        cx = int((x1 + x2) / 2 * self.scale_factor)
-                        cy = int((y1 + y2) / 2 * self.scale_factor)
-                        pyautogui.moveTo(cx, cy, duration=float(a.params.get("duration", 0)))
-                        pyautogui.click(button=str(a.params.get("button", "left")))
-                    elif mode == "label":
-                        label = str(a.params.get("label", ""))
-                        det = next((d for d in vision_result.get("found_targets", []) if d.get("label") == label), None)
-                        if det:
-                            x1, y1, x2, y2 = det["bbox"]
-                            cx = int((x1 + x2) / 2 * self.scale_factor)
-                            cy = int((y1 + y2) / 2 * self.scale_factor)
-                            pyautogui.moveTo(cx, cy, duration=float(a.params.get("duration", 0)))
-                            pyautogui.click(button=str(a.params.get("button", "left")))
-                except Exception:
-                    pass
-            elif t == "find_color":
-                try:
-                    import pyautogui
-                    from .image_processor import ImageProcessor
-                    frame_bgr = vision_result.get("frame")
-                    if frame_bgr is None:
-                        continue
-                    hsv_min = a.params.get("hsv_min")
-                    hsv_max = a.params.get("hsv_max")
-                    bgr_min = a.params.get("bgr_min")
-                    bgr_max = a.params.get("bgr_max")
-                    ip = ImageProcessor()
-                    boxes = ip.find_color(frame_bgr, hsv_min=hsv_min, hsv_max=hsv_max, bgr_min=bgr_min, bgr_max=bgr_max)
-                    if boxes:
-                        x1, y1, x2, y2 = boxes[0]
-                        cx = int((x1 + x2) / 2 * self.scale_factor)
-                        cy = int((y1 + y2) / 2 * self.scale_factor)
-                        if bool(a.params.get("click", True)):
-                            pyautogui.moveTo(cx, cy, duration=float(a.params.get("duration", 0)))
-                            pyautogui.click(button=str(a.params.get("button", "left")))
-                except Exception:
-                    pass
-            elif t == "verify_image_color":
-                try:
-                    from .image_processor import ImageProcessor
-                    template_name = str(a.params.get("template_name", ""))
-                    offset_x = int(a.params.get("offset_x", 0))
-                    offset_y = int(a.params.get("offset_y", 0))
-                    hsv_min = a.params.get("hsv_min")
-                    hsv_max = a.params.get("hsv_max")
-                    bgr_min = a.params.get("bgr_min")
-                    bgr_max = a.params.get("bgr_max")
-                    radius = float(a.params.get("radius", 0.0))
-                    
-                    if not template_name:
-                        continue
-                    
-                    # Find the template in found_targets
-                    found_targets = vision_result.get("found_targets", [])
-                    det = next((d for d in found_targets if d.get("label") == template_name), None)
-                    if not det:
-                        continue
-                    
-                    # Get bbox and calculate actual coordinates
-                    x1, y1, x2, y2 = det["bbox"]
-                    # Calculate center or use offset from top-left
-                    center_x = int((x1 + x2) / 2)
-                    center_y = int((y1 + y2) / 2)
-                    check_x = center_x + offset_x
-                    check_y = center_y + offset_y
-                    
-                    # Get frame
-                    frame_bgr = vision_result.get("frame")
-                    if frame_bgr is None:
-                        continue
-                    
-                    # Check bounds
-                    h, w = frame_bgr.shape[:2]
-                    if check_x < 0 or check_x >= w or check_y < 0 or check_y >= h:
-                        continue
-                    
-                    # Extract a small ROI around the check point
-                    roi_size = max(1, int(radius) if radius > 0 else 5)
-                    roi_x1 = max(0, check_x - roi_size)
-                    roi_y1 = max(0, check_y - roi_size)
-                    roi_x2 = min(w, check_x + roi_size)
-                    roi_y2 = min(h, check_y + roi_size)
-                    roi = frame_bgr[roi_y1:roi_y2, roi_x1:roi_x2]
-                    
-                    if roi.size == 0:
-                        continue
-                    
-                    # Use ImageProcessor to find color in ROI
-                    ip = ImageProcessor()
-                    boxes = ip.find_color(roi, hsv_min=hsv_min, hsv_max=hsv_max, bgr_min=bgr_min, bgr_max=bgr_max)
-                    
-                    # For legacy ActionSequence, we just verify and continue (no node control)
-                    # The result can be logged or used for conditional logic in the sequence
-                    if boxes:
-                        # Verification successful - could log or perform additional actions here
-                        pass
-                    else:
-                        # Verification failed - could log or skip remaining actions here
-                        pass
-                except Exception:
-                    pass
+                pass
@@ -0,0 +1,359 @@
+"""
+Capture backends for ScreenCaptureWorker.
+
+A backend produces BGRA uint8 frames (the format mss returns), one per grab()
+call, and returns None once a finite source is exhausted. Besides live screen
+capture through mss, recorded sources can be replayed for benchmarking and
+headless regression runs:
+
+    mss     live screen capture (primary monitor or a given region)
+    images  a directory of image frames, replayed in file-name order
+    video   a recorded video file (any format cv2.VideoCapture can read)
+    raw     a raw frame dump (N x height x width x channels uint8), memory-mapped
+
+The backend is selected by the optional "capture" section of resources.json:
+
+    "capture": {"backend": "images", "path": "recordings/run1", "pacing": "fast", "loop": false}
+
+Replay sources honour ``pacing``: "realtime" delivers frames at the source's
+frame rate, "fast" as quickly as the pipeline consumes them. With
+``"process": true`` the window runs capture and matching in a child process
+(see vision_process).
+"""
+import os
+import glob
+import json
+from typing import Callable, Dict, Optional, Tuple
+import cv2
+import numpy as np
+from .path_utils import get_base_dir, to_absolute_path
+
+PACING_REALTIME = "realtime"
+PACING_FAST = "fast"
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def _to_bgra(img: np.ndarray) -> np.ndarray:
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+    if img.shape[2] == 3:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+    return img
+
+
+class CaptureBackend:
+    """Base class: open(), grab() until None, close()"""
+
+    # True for sources that show the real screen (frame pixels map to screen coordinates)
+    live = False
+
+    def __init__(self, fps: Optional[float] = None, loop: bool = False):
+        # Native frame rate of a recorded source (None: unknown, the worker's fps is used)
+        self.fps = fps
+        self.loop = loop
+
+    @property
+    def region(self) -> Dict[str, int]:
+        """Screen region (left/top/width/height) covered by the frames"""
+        raise NotImplementedError
+
+    def open(self):
+        pass
+
+    def grab(self) -> Optional[np.ndarray]:
+        """Next BGRA frame, or None when the source is exhausted"""
+        raise NotImplementedError
+
+    def grab_into(self, out: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Write the next BGRA frame into the preallocated ``out`` and return it.
+
+        A frame of a different size is returned as a new array instead (the
+        caller then resizes its buffers); None when the source is exhausted.
+        """
+        frame = self.grab()
+        if frame is None or frame.shape != out.shape:
+            return frame
+        np.copyto(out, frame)
+        return out
+
+    def grab_crop_into(self, out: np.ndarray, crop: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """
+        Like grab_into(), for only the ``crop`` (x_min, y_min, x_max, y_max in frame
+        pixels) of the next frame. The base version grabs the whole frame and copies
+        the crop; sources that can read a sub-rectangle directly override it.
+        """
+        frame = self.grab()
+        if frame is None:
+            return None
+        x1, y1, x2, y2 = crop
+        frame = frame[y1:y2, x1:x2]
+        if frame.shape != out.shape:
+            return np.ascontiguousarray(frame)
+        np.copyto(out, frame)
+        return out
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MssBackend(CaptureBackend):
+    live = True
+
+    def __init__(self, region: Optional[Dict[str, int]] = None, monitor: int = 1, **kwargs):
+        super().__init__(**kwargs)
+        self._region = region
+        self.monitor = monitor
+        self._sct = None
+
+    @property
+    def region(self) -> Dict[str, int]:
+        if self._region is None:
+            import mss
+            with mss.mss() as sct:
+                mon = sct.monitors[self.monitor]
+                self._region = {"left": mon["left"], "top": mon["top"], "width": mon["width"], "height": mon["height"]}
+        return self._region
+
+    def open(self):
+        import mss
+        self._sct = mss.mss()
+
+    def grab(self) -> Optional[np.ndarray]:
+        return np.array(self._sct.grab(self.region))
+
+    def grab_into(self, out: np.ndarray) -> Optional[np.ndarray]:
+        # mss allocates the raw screenshot itself; wrap it without an intermediate array
+        shot = self._sct.grab(self.region)
+        src = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        if src.shape != out.shape:
+            return src.copy()
+        np.copyto(out, src)
+        return out
+
+    def grab_crop_into(self, out: np.ndarray, crop: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        # Only the cropped rectangle is read from the screen
+        region = self.region
+        x1, y1, x2, y2 = crop
+        shot = self._sct.grab({"left": region["left"] + x1, "top": region["top"] + y1, "width": x2 - x1, "height": y2 - y1})
+        src = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        if src.shape != out.shape:
+            return src.copy()
+        np.copyto(out, src)
+        return out
+
+    def close(self):
+        if self._sct is not None:
+            self._sct.close()
+            self._sct = None
+
+
+class ImageDirectoryBackend(CaptureBackend):
+    def __init__(self, path: str, fps: Optional[float] = None, loop: bool = False):
+        super().__init__(fps=fps, loop=loop)
+        self.path = path
+        self.files = sorted(f for f in glob.glob(os.path.join(path, "*")) if f.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.files:
+            raise ValueError(f"No image frames in {path}")
+        self._index = 0
+        self._region: Optional[Dict[str, int]] = None
+
+    @property
+    def region(self) -> Dict[str, int]:
+        if self._region is None:
+            img = cv2.imread(self.files[0], cv2.IMREAD_UNCHANGED)
+            h, w = img.shape[:2]
+            self._region = {"left": 0, "top": 0, "width": w, "height": h}
+        return self._region
+
+    def grab(self) -> Optional[np.ndarray]:
+        # Unreadable files are skipped; give up once a whole pass yields nothing
+        for _ in range(len(self.files)):
+            if self._index >= len(self.files):
+                if not self.loop:
+                    return None
+                self._index = 0
+            path = self.files[self._index]
+            self._index += 1
+            img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if img is not None:
+                return _to_bgra(img)
+            print(f"[ImageDirectoryBackend] Skipping unreadable frame {path}")
+        return None
+
+
+class VideoFileBackend(CaptureBackend):
+    def __init__(self, path: str, fps: Optional[float] = None, loop: bool = False):
+        super().__init__(fps=fps, loop=loop)
+        self.path = path
+        self._cap = None
+        self._bgr: Optional[np.ndarray] = None  # Decode buffer reused by grab_into()
+        probe = cv2.VideoCapture(path)
+        if not probe.isOpened():
+            raise ValueError(f"Cannot open video {path}")
+        w = int(probe.get(cv2.CAP_PROP_FRAME_WIDTH))
+        h = int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if self.fps is None:
+            self.fps = probe.get(cv2.CAP_PROP_FPS) or None
+        probe.release()
+        self._region = {"left": 0, "top": 0, "width": w, "height": h}
+
+    @property
+    def region(self) -> Dict[str, int]:
+        return self._region
+
+    def open(self):
+        self._cap = cv2.VideoCapture(self.path)
+
+    def grab(self) -> Optional[np.ndarray]:
+        ok, img = self._cap.read()
+        if not ok and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, img = self._cap.read()
+        return _to_bgra(img) if ok else None
+
+    def grab_into(self, out: np.ndarray) -> Optional[np.ndarray]:
+        ok, self._bgr = self._cap.read(self._bgr)
+        if not ok and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, self._bgr = self._cap.read(self._bgr)
+        if not ok:
+            return None
+        if self._bgr.shape[:2] != out.shape[:2]:
+            return _to_bgra(self._bgr)
+        return cv2.cvtColor(self._bgr, cv2.COLOR_BGR2BGRA, dst=out)
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class RawDumpBackend(CaptureBackend):
+    """
+    Frames stored back to back as raw uint8 pixels (no header), e.g. written with
+    ``np.stack(frames).tofile(path)``. The file is memory-mapped, so replay does
+    no decoding at all.
+    """
+
+    def __init__(self, path: str, width: int, height: int, channels: int = 4, fps: Optional[float] = None, loop: bool = False):
+        super().__init__(fps=fps, loop=loop)
+        if channels not in (1, 3, 4):
+            raise ValueError(f"Unsupported channel count {channels}")
+        frame_bytes = width * height * channels
+        count = os.path.getsize(path) // frame_bytes
+        if count == 0:
+            raise ValueError(f"{path} holds no complete {width}x{height}x{channels} frame")
+        self.path = path
+        self.channels = channels
+        self._frames = np.memmap(path, dtype=np.uint8, mode="r", shape=(count, height, width, channels))
+        self._index = 0
+        self._region = {"left": 0, "top": 0, "width": width, "height": height}
+
+    @property
+    def region(self) -> Dict[str, int]:
+        return self._region
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def grab(self) -> Optional[np.ndarray]:
+        if self._index >= len(self._frames):
+            if not self.loop:
+                return None
+            self._index = 0
+        frame = self._frames[self._index]
+        self._index += 1
+        if self.channels == 4:
+            # Callers may draw on the frame; never hand out the read-only mapping itself
+            return np.array(frame)
+        return _to_bgra(frame[:, :, 0] if self.channels == 1 else np.ascontiguousarray(frame))
+
+    def grab_into(self, out: np.ndarray) -> Optional[np.ndarray]:
+        if out.shape[:2] != self._frames.shape[1:3]:
+            return self.grab()
+        if self._index >= len(self._frames):
+            if not self.loop:
+                return None
+            self._index = 0
+        frame = self._frames[self._index]
+        self._index += 1
+        if self.channels == 4:
+            np.copyto(out, frame)
+            return out
+        code = cv2.COLOR_GRAY2BGRA if self.channels == 1 else cv2.COLOR_BGR2BGRA
+        return cv2.cvtColor(frame[:, :, 0] if self.channels == 1 else frame, code, dst=out)
+
+    def grab_crop_into(self, out: np.ndarray, crop: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        if self.channels != 4:
+            return super().grab_crop_into(out, crop)
+        if self._index >= len(self._frames):
+            if not self.loop:
+                return None
+            self._index = 0
+        x1, y1, x2, y2 = crop
+        # Only the cropped rows of the mapping are touched
+        frame = self._frames[self._index, y1:y2, x1:x2]
+        self._index += 1
+        if frame.shape != out.shape:
+            return np.array(frame)
+        np.copyto(out, frame)
+        return out
+
+
+def _replay_kwargs(config: dict) -> dict:
+    kwargs = {"loop": bool(config.get("loop", False))}
+    if config.get("fps"):
+        kwargs["fps"] = float(config["fps"])
+    return kwargs
+
+
+CAPTURE_BACKENDS: Dict[str, Callable[[dict, Optional[Dict[str, int]]], CaptureBackend]] = {
+    "mss": lambda config, region: MssBackend(region=region, monitor=int(config.get("monitor", 1))),
+    "images": lambda config, region: ImageDirectoryBackend(to_absolute_path(config["path"]), **_replay_kwargs(config)),
+    "video": lambda config, region: VideoFileBackend(to_absolute_path(config["path"]), **_replay_kwargs(config)),
+    "raw": lambda config, region: RawDumpBackend(
+        to_absolute_path(config["path"]), int(config["width"]), int(config["height"]),
+        channels=int(config.get("channels", 4)), **_replay_kwargs(config)),
+}
+
+
+def register_capture_backend(name: str, factory: Callable[[dict, Optional[Dict[str, int]]], CaptureBackend]):
+    """Register a backend factory: factory(capture config dict, requested region) -> CaptureBackend"""
+    CAPTURE_BACKENDS[name] = factory
+
+
+def create_capture_backend(config: Optional[dict] = None, region: Optional[Dict[str, int]] = None) -> CaptureBackend:
+    """
+    Build the backend described by a capture config dict (see module docstring).
+
+    Raises:
+        ValueError: Unknown backend name or an unusable replay source
+    """
+    config = config or {}
+    name = config.get("backend", "mss")
+    factory = CAPTURE_BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown capture backend '{name}' (available: {', '.join(sorted(CAPTURE_BACKENDS))})")
+    try:
+        return factory(config, region)
+    except KeyError as e:
+        raise ValueError(f"Capture backend '{name}' requires '{e.args[0]}'") from None
+
+
+def load_capture_config() -> dict:
+    """The "capture" section of resources.json (empty: live mss capture)"""
+    try:
+        with open(os.path.join(get_base_dir(), "resources.json"), "r", encoding="utf-8") as f:
+            config = json.load(f).get("capture", {})
+        return config if isinstance(config, dict) else {}
+    except Exception:
+        return {}
@@ -0,0 +1,105 @@
+"""
+Capture only the part of the screen the targets can be found in.
+
+Every target only searches its ROI (e.g. the built-in targets look at a band
+at 0.72-0.98 of the screen height), and color searches may be limited to a
+region as well. CaptureCrop computes the bounding box of the ROIs of the
+targets in scope plus those regions, and the capture worker grabs just that
+rectangle. Conversion and matching then work on the crop; vision results carry
+its position ("frame_origin") and the full frame size ("frame_size"), and
+detection bboxes are reported in full-frame pixels, so click coordinates are
+unaffected.
+
+While a script runs, the scope is the labels and color-search regions the
+script reads (ExecutionPlan.referenced_labels()/referenced_regions()); a
+color search without a region needs the whole frame. Pixel checks next to a
+detection (verify_image_color offsets) widen the margin to the script's
+ExecutionPlan.referenced_reach(). Otherwise the scope is every defined target.
+"""
+import threading
+from typing import FrozenSet, Iterable, Optional, Tuple
+from . import targets
+
+# Pixels added around the covered area (at least; a scope's reach can widen it)
+CROP_MARGIN = 16
+# Crop edges are aligned to this many pixels, so small ROI changes keep the crop size
+CROP_ALIGN = 16
+
+Crop = Tuple[int, int, int, int]
+Region = Tuple[float, float, float, float]
+
+
+def region_to_pixels(region: Region, width: int, height: int) -> Crop:
+    """Fractional region (x_min, y_min, x_max, y_max) in pixels, clipped to the frame"""
+    return (max(0, int(region[0] * width)), max(0, int(region[1] * height)),
+            min(width, int(region[2] * width)), min(height, int(region[3] * height)))
+
+
+class CaptureCrop:
+    def __init__(self, margin: int = CROP_MARGIN, align: int = CROP_ALIGN):
+        self.margin = max(0, int(margin))
+        self.align = max(1, int(align))
+        self._lock = threading.Lock()
+        self._labels: Optional[FrozenSet[str]] = None
+        self._regions: Optional[FrozenSet[Region]] = frozenset()
+        self._reach: Optional[int] = 0
+        # (snapshot, scope key, crop) of the last region() call
+        self._cached = None
+
+    def set_scope(self, labels: Optional[Iterable[str]] = None, regions: Optional[Iterable[Region]] = (), reach: Optional[int] = 0) -> bool:
+        """
+        Cover the ROIs of ``labels`` (None: every target) and the fractional ``regions``
+        (None: the whole frame), with a margin of at least ``reach`` pixels (None: the
+        whole frame). Returns True if the scope changed.
+        """
+        labels = None if labels is None else frozenset(labels)
+        regions = None if regions is None else frozenset(tuple(float(v) for v in r[:4]) for r in regions)
+        reach = None if reach is None else max(0, int(reach))
+        with self._lock:
+            if (labels, regions, reach) == (self._labels, self._regions, self._reach):
+                return False
+            self._labels, self._regions, self._reach = labels, regions, reach
+            return True
+
+    def scope(self) -> Tuple[Optional[FrozenSet[str]], Optional[FrozenSet[Region]], Optional[int]]:
+        """(labels, regions, reach) as last set"""
+        with self._lock:
+            return self._labels, self._regions, self._reach
+
+    def reset(self) -> bool:
+        """Back to the idle scope: every target, no extra regions"""
+        return self.set_scope(None, frozenset(), 0)
+
+    def region(self, width: int, height: int) -> Optional[Crop]:
+        """
+        Crop (x_min, y_min, x_max, y_max) of a ``width`` x ``height`` frame, or None
+        if the whole frame is needed (or nothing limits it).
+        """
+        snapshot = targets.current_snapshot()
+        with self._lock:
+            labels, regions, reach = self._labels, self._regions, self._reach
+        key = (labels, regions, reach, width, height)
+        cached = self._cached
+        if cached is not None and cached[0] is snapshot and cached[1] == key:
+            return cached[2]
+        crop = self._compute(snapshot, labels, regions, reach, width, height)
+        self._cached = (snapshot, key, crop)
+        return crop
+
+    def _compute(self, snapshot, labels, regions, reach, width: int, height: int) -> Optional[Crop]:
+        if regions is None or reach is None:
+            return None
+        boxes = [roi for record, roi in zip(snapshot.records, snapshot.pixel_rois(width, height))
+                 if labels is None or record.label in labels]
+        boxes.extend(region_to_pixels(r, width, height) for r in regions)
+        boxes = [b for b in boxes if b[2] > b[0] and b[3] > b[1]]
+        if not boxes:
+            return None
+        m, a = max(self.margin, reach), self.align
+        x1 = max(0, min(b[0] for b in boxes) - m) // a * a
+        y1 = max(0, min(b[1] for b in boxes) - m) // a * a
+        x2 = min(width, -(-(max(b[2] for b in boxes) + m) // a) * a)
+        y2 = min(height, -(-(max(b[3] for b in boxes) + m) // a) * a)
+        if (x1, y1, x2, y2) == (0, 0, width, height):
+            return None
+        return x1, y1, x2, y2
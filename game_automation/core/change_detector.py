@@ -0,0 +1,81 @@
+"""
+Cheap per-frame change detection, so unchanged screen areas are not re-matched.
+
+The gray frame is downsampled to one mean value per CHANGE_CELL_SIZE x
+CHANGE_CELL_SIZE cell (cv2.INTER_AREA, a fraction of the cost of one template
+match). A cell counts as changed when its mean differs from the cell's
+reference by more than CHANGE_THRESHOLD gray levels; the reference is only
+updated for changed cells, so slow drift accumulates until it is detected.
+
+Every cell remembers the frame sequence number it last changed at. The
+TemplateMatcher records the sequence number a target was matched at, and
+reuses that target's previous detections as long as no cell of its ROI
+changed since (see TemplateMatcher.match()).
+"""
+from typing import Dict, Optional, Tuple
+import cv2
+import numpy as np
+
+CHANGE_CELL_SIZE = 8
+# Mean gray-level difference of a cell that counts as a change
+CHANGE_THRESHOLD = 3.0
+
+
+class ChangeDetector:
+    def __init__(self, cell_size: int = CHANGE_CELL_SIZE, threshold: float = CHANGE_THRESHOLD):
+        self.cell_size = max(1, int(cell_size))
+        self.threshold = float(threshold)
+        self.seq = 0
+        self.frames = 0
+        self.unchanged_frames = 0
+        self._shape: Optional[Tuple[int, int]] = None
+        self._reference: Optional[np.ndarray] = None
+        self._changed_at: Optional[np.ndarray] = None
+        self._signature: Optional[np.ndarray] = None
+        self._diff: Optional[np.ndarray] = None
+
+    def update(self, gray: np.ndarray) -> int:
+        """Compare ``gray`` with the reference; returns the frame's sequence number"""
+        self.seq += 1
+        self.frames += 1
+        h, w = gray.shape[:2]
+        rows, cols = max(1, h // self.cell_size), max(1, w // self.cell_size)
+        if self._shape != (h, w):
+            # New size (or crop): every cell counts as changed
+            self._shape = (h, w)
+            self._signature = np.empty((rows, cols), dtype=np.uint8)
+            self._diff = np.empty((rows, cols), dtype=np.float32)
+            cv2.resize(gray, (cols, rows), dst=self._signature, interpolation=cv2.INTER_AREA)
+            self._reference = self._signature.astype(np.float32)
+            self._changed_at = np.full((rows, cols), self.seq, dtype=np.int64)
+            return self.seq
+        signature = cv2.resize(gray, (cols, rows), dst=self._signature, interpolation=cv2.INTER_AREA)
+        np.subtract(signature, self._reference, out=self._diff, dtype=np.float32)
+        changed = np.abs(self._diff, out=self._diff) > self.threshold
+        if changed.any():
+            self._reference[changed] = signature[changed]
+            self._changed_at[changed] = self.seq
+        else:
+            self.unchanged_frames += 1
+        return self.seq
+
+    def changed_since(self, roi: Tuple[int, int, int, int], seq: int) -> bool:
+        """True if any cell overlapping ``roi`` (x_min, y_min, x_max, y_max in frame pixels) changed after frame ``seq``"""
+        changed_at = self._changed_at
+        if changed_at is None:
+            return True
+        h, w = self._shape
+        rows, cols = changed_at.shape
+        x1, y1, x2, y2 = roi
+        c1, c2 = x1 * cols // w, min(cols, -(-x2 * cols // w))
+        r1, r2 = y1 * rows // h, min(rows, -(-y2 * rows // h))
+        if c2 <= c1 or r2 <= r1:
+            return False
+        return int(changed_at[r1:r2, c1:c2].max()) > seq
+
+    def reset(self):
+        self._shape = None
+        self._changed_at = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"frames": self.frames, "unchanged_frames": self.unchanged_frames}
@@ -0,0 +1,179 @@
+"""
+Preallocated, reference-counted frame buffers.
+
+A FrameRing owns a fixed number of slots. Each slot holds one buffer per named
+plane (e.g. {"frame": (h, w, 3), "gray": (h, w)}), allocated once. A producer
+acquire()s a free slot, writes into its planes, and hands the FrameLease to
+consumers; every consumer that keeps the frame beyond the call it received it
+in retain()s the lease and release()s it when done. A slot returns to the ring
+when its last reference is released, and free slots are reused in the order
+they were released, so a frame that was just dropped stays intact for as long
+as possible.
+
+Steady-state operation therefore allocates no pixel memory. If every slot is
+still referenced, acquire() falls back to a one-off heap allocation, which is
+counted in stats() so leaks or undersized rings show up as a non-zero
+allocation rate.
+"""
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+DEFAULT_RING_SLOTS = 4
+
+
+def fit_planes(buffers: Dict[str, np.ndarray], planes: Dict[str, Tuple[int, ...]]) -> Dict[str, np.ndarray]:
+    """
+    Views of the start of each contiguous buffer in ``buffers`` with the shapes in
+    ``planes`` (e.g. a capture crop in a slot sized for the full frame)
+    """
+    views = {}
+    for name, shape in planes.items():
+        buf = buffers[name]
+        size = int(np.prod(shape))
+        if size > buf.size:
+            raise ValueError(f"Plane {name} {tuple(shape)} does not fit its buffer {buf.shape}")
+        views[name] = buf.reshape(-1)[:size].reshape(shape)
+    return views
+
+
+class FrameLease:
+    """One reference-counted use of a ring slot (or of a one-off fallback buffer)"""
+
+    __slots__ = ("_ring", "_slot", "_refs", "planes")
+
+    def __init__(self, ring: "FrameRing", slot: int, planes: Dict[str, np.ndarray]):
+        self._ring = ring
+        self._slot = slot  # -1: fallback buffer outside the ring
+        self._refs = 1
+        self.planes = planes
+
+    def __getitem__(self, plane: str) -> np.ndarray:
+        """Writable buffer of ``plane`` (for the producer)"""
+        return self.planes[plane]
+
+    def view(self, plane: str) -> np.ndarray:
+        """Read-only view of ``plane`` (for consumers)"""
+        arr = self.planes[plane].view()
+        arr.flags.writeable = False
+        return arr
+
+    @property
+    def alive(self) -> bool:
+        return self._refs > 0
+
+    def retain(self) -> bool:
+        """
+        Add a reference. Returns False if the lease was already fully released;
+        its slot may then hold a newer frame and must not be read.
+        """
+        with self._ring._lock:
+            if self._refs <= 0:
+                return False
+            self._refs += 1
+            return True
+
+    @property
+    def slot(self) -> int:
+        """Ring slot index (-1 for a fallback buffer)"""
+        return self._slot
+
+    def release(self):
+        ring = self._ring
+        with ring._lock:
+            if self._refs <= 0:
+                return
+            self._refs -= 1
+            if self._refs > 0:
+                return
+        ring._recycle(self)
+
+
+class FrameRing:
+    def __init__(self, planes: Dict[str, Tuple[int, ...]], slots: int = DEFAULT_RING_SLOTS, dtype=np.uint8, buffers: Optional[List[Dict[str, np.ndarray]]] = None):
+        """
+        Args:
+            planes: Plane name -> buffer shape
+            slots: Number of preallocated slots
+            dtype: Buffer dtype
+            buffers: Externally owned slot buffers (e.g. shared memory), one planes dict
+                per slot; the ring then never reallocates them (smaller frames use the
+                start of each buffer) and ``slots`` is ignored
+        """
+        self._lock = threading.Lock()
+        self.dtype = np.dtype(dtype)
+        self.acquired = 0
+        self.allocations = 0
+        self.allocated_bytes = 0
+        self._fixed = buffers is not None
+        if buffers is not None:
+            self.slot_count = len(buffers)
+            self.plane_shapes = {name: tuple(shape) for name, shape in planes.items()}
+            self._buffers = list(buffers)
+            self._slots = list(buffers)
+            self._free = deque(range(self.slot_count))
+            self._in_use = 0
+        else:
+            self.slot_count = max(1, int(slots))
+            self._allocate(planes)
+
+    def _allocate(self, planes: Dict[str, Tuple[int, ...]]):
+        self.plane_shapes = {name: tuple(shape) for name, shape in planes.items()}
+        self._slots = [self._new_planes() for _ in range(self.slot_count)]
+        self._free = deque(range(self.slot_count))
+        self._in_use = 0
+
+    def _new_planes(self) -> Dict[str, np.ndarray]:
+        planes = {name: np.empty(shape, dtype=self.dtype) for name, shape in self.plane_shapes.items()}
+        self.allocations += 1
+        self.allocated_bytes += sum(arr.nbytes for arr in planes.values())
+        return planes
+
+    def ensure_shape(self, planes: Dict[str, Tuple[int, ...]]):
+        """
+        Reallocate every slot if the plane shapes changed (e.g. the capture size).
+        Leases of the old buffers stay valid until released. A ring with external
+        buffers re-views them instead (ValueError if the shapes do not fit); slots
+        still held keep their lease and return to the ring when it is released.
+        """
+        planes = {name: tuple(shape) for name, shape in planes.items()}
+        if planes == self.plane_shapes:
+            return
+        if self._fixed:
+            slots = [fit_planes(buffers, planes) for buffers in self._buffers]
+            with self._lock:
+                self.plane_shapes = planes
+                self._slots = slots
+            return
+        with self._lock:
+            self._allocate(planes)
+
+    def acquire(self) -> FrameLease:
+        """A writable slot holding one reference; falls back to a fresh allocation if all slots are held"""
+        with self._lock:
+            self.acquired += 1
+            if self._free:
+                slot = self._free.popleft()
+                self._in_use += 1
+                return FrameLease(self, slot, self._slots[slot])
+            return FrameLease(self, -1, self._new_planes())
+
+    def _recycle(self, lease: FrameLease):
+        """Called once the last reference to ``lease`` is released"""
+        with self._lock:
+            # Slots of a reallocated ring are gone; external buffers are the same memory under new views
+            if lease._slot >= 0 and (self._fixed or self._slots[lease._slot] is lease.planes):
+                self._in_use -= 1
+                self._free.append(lease._slot)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "slots": self.slot_count,
+                "in_use": self._in_use,
+                "acquired": self.acquired,
+                # Includes the initial slot allocation; grows only on fallbacks and resizes
+                "allocations": self.allocations,
+                "allocated_bytes": self.allocated_bytes,
+            }
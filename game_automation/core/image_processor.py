@@ -1,36 +1,123 @@
 import cv2
 import time
+import threading
+from typing import Optional, Tuple
 from .template_matcher import TemplateMatcher
+from .template_bundle import default_bundle_dir
+from .frame_ring import DEFAULT_RING_SLOTS, FrameRing
+from .capture_crop import CaptureCrop
+from .change_detector import ChangeDetector
 
 
 class ImageProcessor:
-    def __init__(self, ocr_engine=None):
+    def __init__(self, ocr_engine=None, match_workers: int = 0, template_bundle_dir: Optional[str] = None, frame_slots: int = 0, change_detection: bool = False):
         self.ocr_engine = ocr_engine
-        self.matcher = TemplateMatcher()
+        # match_workers > 1 matches templates on a thread pool (see TemplateMatcher.set_workers)
+        # template_bundle_dir: memory-map templates from a precompiled bundle (see template_bundle)
+        self.matcher = TemplateMatcher(workers=match_workers, bundle_dir=template_bundle_dir)
+        # frame_slots > 0: write the BGR/gray frames into a ring of preallocated buffers
+        # instead of allocating them per frame; results then carry a "frame_lease"
+        self.frame_ring: Optional[FrameRing] = FrameRing({"frame": (0, 0, 3), "gray": (0, 0)}, slots=frame_slots) if frame_slots > 0 else None
+        # change_detection: targets whose ROI did not change since their last match reuse
+        # its detections instead of being matched again (see change_detector)
+        self.change_detector: Optional[ChangeDetector] = ChangeDetector() if change_detection else None
+        # Area of the screen the targets in scope can be found in (capture pipelines may crop to it)
+        self.capture_crop = CaptureCrop()
 
     def process_frame(self, frame_bgra):
+        """
+        Convert and match one BGRA frame.
+
+        With a frame ring, "frame" and "gray" in the result live in a ring slot and
+        the result's "frame_lease" holds one reference to it, owned by the caller:
+        release it once the result is handed off (VisionFeed.publish retains its own).
+
+        "timings" maps stage names ("bgr", "gray", "match", "match:<label>",
+        "overlay", "ocr") to their duration in ms (see PerformanceMonitor.record_latencies).
+        """
+        return self.analyze(self.preprocess(frame_bgra))
+
+    def preprocess(self, frame_bgra, origin: Tuple[int, int] = (0, 0), frame_size: Optional[Tuple[int, int]] = None) -> dict:
+        """
+        First half of process_frame(): the BGR and gray conversions (a partial result).
+
+        ``frame_bgra`` may be a crop of the full frame (see capture_crop): ``origin`` is
+        its top-left corner and ``frame_size`` the full (width, height).
+        """
+        t0 = time.perf_counter()
+        lease = None
+        if self.frame_ring is not None:
+            h, w = frame_bgra.shape[:2]
+            self.frame_ring.ensure_shape({"frame": (h, w, 3), "gray": (h, w)})
+            lease = self.frame_ring.acquire()
+            frame = cv2.cvtColor(frame_bgra, cv2.COLOR_BGRA2BGR, dst=lease["frame"])
+            t1 = time.perf_counter()
+            gray = cv2.cvtColor(frame_bgra, cv2.COLOR_BGRA2GRAY, dst=lease["gray"])
+            # Consumers share the slot (feed, nodes, preview); they only get read-only views
+            frame, gray = lease.view("frame"), lease.view("gray")
+        else:
+            frame = cv2.cvtColor(frame_bgra, cv2.COLOR_BGRA2BGR)
+            t1 = time.perf_counter()
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        t2 = time.perf_counter()
+        return {
+            "frame": frame,
+            "gray": gray,
+            "frame_lease": lease,
+            "frame_origin": tuple(origin),
+            "frame_size": tuple(frame_size) if frame_size else (frame.shape[1], frame.shape[0]),
+            "latency_ms": (t2 - t0) * 1000.0,
+            # Stage -> ms for PerformanceMonitor.record_latencies()
+            "timings": {"bgr": (t1 - t0) * 1000.0, "gray": (t2 - t1) * 1000.0},
+        }
+
+    def analyze(self, result: dict) -> dict:
+        """
+        Second half of process_frame(): matching, overlays and OCR on a preprocess() result (completed in place).
+
+        Overlays are returned as rectangles, not drawn: the frame is what nodes test pixels on.
+        """
         t0 = time.perf_counter()
-        frame = cv2.cvtColor(frame_bgra, cv2.COLOR_BGRA2BGR)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        found_targets = self.matcher.match(gray)
+        gray = result["gray"]
+        ox, oy = result.get("frame_origin", (0, 0))
+        changes = self.change_detector
+        if changes is not None:
+            changes.update(gray)
+        found_targets = self.matcher.match(gray, origin=(ox, oy), frame_size=result.get("frame_size"), changes=changes)
+        t1 = time.perf_counter()
         overlays = []
         for det in found_targets:
+            # Detections and overlays are in full-frame pixels; the frame may be a crop
             x1, y1, x2, y2 = det["bbox"]
-            color = (0, 255, 0)
-            overlays.append((x1, y1, x2, y2, color))
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            overlays.append((x1, y1, x2, y2, (0, 255, 0)))
+        t2 = time.perf_counter()
+        timings = result.setdefault("timings", {})
+        timings["match"] = (t1 - t0) * 1000.0
+        for label, ms in self.matcher.last_match_ms.items():
+            timings[f"match:{label}"] = ms
+        timings["overlay"] = (t2 - t1) * 1000.0
         ocr_text = ""
         if self.ocr_engine:
             ocr_text = self.ocr_engine(gray)
-        latency = (time.perf_counter() - t0) * 1000.0
-        return {
-            "frame": frame,
-            "gray": gray,
-            "latency_ms": latency,
+            timings["ocr"] = (time.perf_counter() - t2) * 1000.0
+        result.update({
+            "latency_ms": result.get("latency_ms", 0.0) + (time.perf_counter() - t0) * 1000.0,
             "found_targets": found_targets,
+            "tracks": self.matcher.tracks(),
             "overlays": overlays,
             "ocr_text": ocr_text,
-        }
+        })
+        return result
+
+    def allocation_stats(self) -> dict:
+        """Frame buffer allocation counters of the frame ring (empty without one)"""
+        return self.frame_ring.stats() if self.frame_ring is not None else {}
+
+    def change_stats(self) -> dict:
+        """Change detection counters: frames, unchanged frames, targets matched/reused, match ms saved (empty when off)"""
+        if self.change_detector is None:
+            return {}
+        return {**self.change_detector.stats(), **self.matcher.reuse_stats()}
 
     def find_color(self, frame_bgr, hsv_min=None, hsv_max=None, bgr_min=None, bgr_max=None):
         import numpy as np
@@ -58,3 +145,29 @@ class ImageProcessor:
                 x2, y2 = int(xs.max()), int(ys.max())
                 boxes.append((x1, y1, x2, y2))
         return boxes
+
+
+# Frames in flight in the vision pipeline stages and queues, plus the feed's
+# latest result, the running node and the preview
+SHARED_FRAME_SLOTS = 2 * DEFAULT_RING_SLOTS
+
+_shared_processor: Optional[ImageProcessor] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_image_processor() -> ImageProcessor:
+    """
+    Return the process-wide ImageProcessor (the shared vision service).
+
+    The shared instance owns the loaded templates (through its TemplateMatcher)
+    and the color search routines. The capture path and AutomationController
+    both use it, so node execution never rebuilds a matcher or re-reads
+    template files from disk. Its templates are memory-mapped from the
+    project's template bundle, which is rebuilt whenever a template changes.
+    """
+    global _shared_processor
+    if _shared_processor is None:
+        with _shared_lock:
+            if _shared_processor is None:
+                _shared_processor = ImageProcessor(template_bundle_dir=default_bundle_dir(), frame_slots=SHARED_FRAME_SLOTS, change_detection=True)
+    return _shared_processor
@@ -0,0 +1,449 @@
+"""
+Node handler registry.
+
+Every node type (VisualScript nodes and legacy ActionSequence actions alike) is
+executed by a handler looked up here once, when the script is compiled:
+
+    handler(controller, node, vision_result, should_cancel_callback) -> (ok, branch_slot)
+
+``node`` is a CompiledNode with coerced params; ``branch_slot`` names the branch
+param to follow (e.g. "next_true") or is None for the default connection.
+
+Custom node types can be registered from plugins, either directly with
+register_node_handler(), lazily by dotted path with register_lazy_node_handler(),
+or through the ``game_automation.node_handlers`` entry point group, which is only
+scanned the first time an unknown node type is requested.
+"""
+import time
+import threading
+import importlib
+from typing import Any, Callable, Dict, Optional, Tuple
+from .script_plan import BRANCH_PARAMS, LABEL_PARAMS, PARAM_SPECS, CompiledNode
+from .capture_crop import region_to_pixels
+
+NodeHandler = Callable[[Any, CompiledNode, dict, Optional[Callable[[], bool]]], Tuple[bool, Optional[str]]]
+
+ENTRY_POINT_GROUP = "game_automation.node_handlers"
+
+_HANDLERS: Dict[str, NodeHandler] = {}
+_LAZY_HANDLERS: Dict[str, str] = {}  # node type -> "package.module:attribute"
+_NON_VISION_TYPES: set = set()  # Node types that never read the vision result
+_entry_points_loaded = False
+_registry_lock = threading.Lock()
+_registry_version = 0  # Bumped on every registration so cached plans rebind handlers
+
+
+def registry_version() -> int:
+    return _registry_version
+
+
+def register_node_handler(node_type: str, handler: Optional[NodeHandler] = None, params: Optional[Dict[str, Tuple[Callable[[Any], Any], Any]]] = None, branches: Optional[Tuple[str, ...]] = None, uses_vision: bool = True, label_params: Optional[Tuple[str, ...]] = None):
+    """
+    Register ``handler`` for ``node_type``. Can also be used as a decorator.
+
+    Args:
+        node_type: Node type string used in VisualNode.type / Action.type
+        handler: Handler callable (omit to use as ``@register_node_handler("type")``)
+        params: Optional typed param spec (key -> (coercer, default)) applied at compile time
+        branches: Optional branch param keys (e.g. ("next_true", "next_false"))
+        uses_vision: False if the handler never reads the vision result, so the engine
+            does not wait for a fresh frame before running it
+        label_params: Optional param keys holding the template labels the node reads;
+            without them a vision-reading node keeps every template active while it can run
+    """
+    def _register(fn: NodeHandler) -> NodeHandler:
+        global _registry_version
+        with _registry_lock:
+            _registry_version += 1
+            _HANDLERS[node_type] = fn
+            _LAZY_HANDLERS.pop(node_type, None)
+            if params is not None:
+                PARAM_SPECS[node_type] = dict(params)
+            if branches is not None:
+                BRANCH_PARAMS[node_type] = tuple(branches)
+            if label_params is not None:
+                LABEL_PARAMS[node_type] = tuple(label_params)
+            if uses_vision:
+                _NON_VISION_TYPES.discard(node_type)
+            else:
+                _NON_VISION_TYPES.add(node_type)
+        return fn
+    if handler is None:
+        return _register
+    return _register(handler)
+
+
+def register_lazy_node_handler(node_type: str, target: str, params: Optional[Dict[str, Tuple[Callable[[Any], Any], Any]]] = None, branches: Optional[Tuple[str, ...]] = None, label_params: Optional[Tuple[str, ...]] = None):
+    """
+    Register a handler by dotted path ("package.module:function"); it is imported on first use.
+    """
+    global _registry_version
+    with _registry_lock:
+        _registry_version += 1
+        _LAZY_HANDLERS[node_type] = target
+        if params is not None:
+            PARAM_SPECS[node_type] = dict(params)
+        if branches is not None:
+            BRANCH_PARAMS[node_type] = tuple(branches)
+        if label_params is not None:
+            LABEL_PARAMS[node_type] = tuple(label_params)
+
+
+def _import_target(target: str) -> NodeHandler:
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr) if attr else module
+
+
+def _load_entry_points():
+    """Collect handler entry points once; they are imported lazily like dotted paths"""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    try:
+        from importlib.metadata import entry_points
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            if ep.name not in _HANDLERS and ep.name not in _LAZY_HANDLERS:
+                _LAZY_HANDLERS[ep.name] = ep.value
+    except Exception as e:
+        print(f"[node_handlers] Failed to scan entry points: {e}")
+
+
+def get_node_handler(node_type: str) -> Optional[NodeHandler]:
+    """Resolve the handler for ``node_type`` (importing lazy/plugin handlers on demand)"""
+    handler = _HANDLERS.get(node_type)
+    if handler is not None:
+        return handler
+    if node_type not in _LAZY_HANDLERS:
+        _load_entry_points()
+    target = _LAZY_HANDLERS.get(node_type)
+    if target is None:
+        return None
+    try:
+        handler = _import_target(target)
+    except Exception as e:
+        print(f"[node_handlers] Failed to load handler for '{node_type}' from {target}: {e}")
+        return None
+    with _registry_lock:
+        _HANDLERS[node_type] = handler
+        _LAZY_HANDLERS.pop(node_type, None)
+    return handler
+
+
+def handler_uses_vision(node_type: str) -> bool:
+    """Whether nodes of ``node_type`` read the vision result (unknown/plugin types are assumed to)"""
+    return node_type not in _NON_VISION_TYPES
+
+
+def registered_node_types() -> list[str]:
+    """All node types with an eager or lazy handler"""
+    _load_entry_points()
+    return sorted(set(_HANDLERS) | set(_LAZY_HANDLERS))
+
+
+# ----- Built-in handlers -----
+
+_pyautogui_module = None
+
+
+def _pyautogui():
+    """Import pyautogui once (it needs a display, so it is not imported at module load)"""
+    global _pyautogui_module
+    if _pyautogui_module is None:
+        import pyautogui
+        _pyautogui_module = pyautogui
+    return _pyautogui_module
+
+
+def _cancelled(should_cancel_callback: Optional[Callable[[], bool]]) -> bool:
+    return bool(should_cancel_callback and should_cancel_callback())
+
+
+def _find_detection(vision_result: dict, label: str) -> Optional[dict]:
+    return next((d for d in vision_result.get("found_targets", []) if d.get("label") == label), None)
+
+
+def _click_bbox(controller, bbox, params: dict):
+    x1, y1, x2, y2 = bbox
+    cx = int((x1 + x2) / 2 * controller.scale_factor)
+    cy = int((y1 + y2) / 2 * controller.scale_factor)
+    gui = _pyautogui()
+    gui.moveTo(cx, cy, duration=params["duration"])
+    gui.click(button=params["button"])
+    controller.note_input()
+
+
+def _find_color_boxes(controller, frame_bgr, params: dict):
+    return controller.image_processor.find_color(
+        frame_bgr,
+        hsv_min=params.get("hsv_min"),
+        hsv_max=params.get("hsv_max"),
+        bgr_min=params.get("bgr_min"),
+        bgr_max=params.get("bgr_max"),
+    )
+
+
+def _search_color(controller, vision_result: dict, params: dict) -> Optional[list]:
+    """
+    Color search in the frame, limited to the optional "roi" param (fractions of the
+    full frame). Boxes are in full-frame pixels even if the frame is a capture crop;
+    None if there is no frame.
+    """
+    frame_bgr = vision_result.get("frame")
+    if frame_bgr is None:
+        return None
+    ox, oy = vision_result.get("frame_origin", (0, 0))
+    h, w = frame_bgr.shape[:2]
+    roi = params.get("roi")
+    if roi:
+        full_w, full_h = vision_result.get("frame_size") or (w, h)
+        x1, y1, x2, y2 = region_to_pixels(roi, full_w, full_h)
+        x1, y1 = max(0, x1 - ox), max(0, y1 - oy)
+        x2, y2 = min(w, x2 - ox), min(h, y2 - oy)
+        if x2 <= x1 or y2 <= y1:
+            return []
+        frame_bgr = frame_bgr[y1:y2, x1:x2]
+        ox, oy = ox + x1, oy + y1
+    boxes = _find_color_boxes(controller, frame_bgr, params)
+    if ox or oy:
+        boxes = [(x1 + ox, y1 + oy, x2 + ox, y2 + oy) for x1, y1, x2, y2 in boxes]
+    return boxes
+
+
+@register_node_handler("sleep", uses_vision=False)
+def exec_sleep(controller, node: CompiledNode, vision_result: dict, should_cancel_callback=None):
+    # Interruptible wait: returns early (as a failure) as soon as the run is cancelled
+    if not controller.wait(node.params["seconds"]):
+        return False, None
+    return True, None
+
+
+@register_node_handler("key", uses_vision=False)
+def exec_key(controller, node: CompiledNode, vision_result: dict, should_cancel_callback=None):
+    try:
+        # Check cancellation before key press
+        if _cancelled(should_cancel_callback):
+            return False, None
+        gui = _pyautogui()
+        key = node.params["key"]
+        if node.sequence:
+            # Legacy ActionSequence path has always sent explicit down/up events
+            gui.keyDown(key)
+            gui.keyUp(key)
+        else:
+            gui.press(key)
+        controller.note_input()
+        # Check cancellation after key press
+        if _cancelled(should_cancel_callback):
+            return False, None
+        return True, None
+    except Exception:
+        return False, None
+
+
+@register_node_handler("click")
+def exec_click(controller, node: CompiledNode, vision_result: dict, should_cancel_callback=None):
+    try:
+        p = node.params
+        if p["mode"] == "label":
+            det = _find_detection(vision_result, p["label"])
+            if det:
+                _click_bbox(controller, det["bbox"], p)
+                return True, None
+        elif p["mode"] == "bbox":
+            _click_bbox(controller, p.get("bbox", [0, 0, 0, 0]), p)
+            return True, None
+        elif p["mode"] == "instance":
+            # Instance selected by the enclosing find_all node
+            det = controller.current_instance
+            if det:
+                _click_bbox(controller, det["bbox"], p)
+                return True, None
+        return False, None
+    except Exception:
+        return False, None
+
+
+@register_node_handler("find_color")
+def exec_find_color(controller, node: CompiledNode, vision_result: dict, should_cancel_callback=None):
+    try:
+        # Check cancellation before starting image processing
+        if _cancelled(should_cancel_callback):
+            return False, None
+        boxes = _search_color(controller, vision_result, node.params)
+        if boxes is None:
+            return False, None
+        # Check cancellation after image processing completes
+        if _cancelled(should_cancel_callback):
+            return False, None
+        if boxes and node.params["click"]:
+            _click_bbox(controller, boxes[0], node.params)
+        return bool(boxes), None
+    except Exception:
+        return False, None
+
+
+@register_node_handler("condition")
+def exec_condition(controller, node: CompiledNode, vision_result: dict, should_cancel_callback=None):
+    try:
+        result = False
+        p = node.params
+        if p["mode"] == "label":
+            det = _find_detection(vision_result, p["label"])
+            if det:
+                result = det.get("confidence", 0.0) >= p["min_confidence"]
+        elif p["mode"] == "color":
+            # Check cancellation before starting image processing
+            if _cancelled(should_cancel_callback):
+                return False, None
+            boxes = _search_color(controller, vision_result, p)
+            # Check cancellation after image processing completes
+            if _cancelled(should_cancel_callback):
+                return False, None
+            result = bool(boxes)
+        return result, ("next_true" if result else "next_false")
+    except Exception:
+        return False, None
+
+
+@register_node_handler("loop", uses_vision=False)
+def exec_loop(controller, node: CompiledNode, vision_result: dict, should_cancel_callback=None):
+    count = node.params["count"]
+    executed = controller._loop_counters.get(node.id, 0)
+    if executed < count:
+        controller._loop_counters[node.id] = executed + 1
+        return True, "next_body"
+    controller._loop_counters.pop(node.id, None)
+    return True, "next_after"
+
+
+@register_node_handler("find_all")
+def exec_find_all(controller, node: CompiledNode, vision_result: dict, should_cancel_callback=None):
+    """
+    Iterate over every detected instance of a label.
+
+    The first visit snapshots the matching detections; each visit then selects
+    the next one as controller.current_instance and takes ``next_body``. Once
+    all instances were visited it takes ``next_after`` (failing if none were found).
+    """
+    p = node.params
+    state = controller._instance_iterators.get(node.id)
+    if state is None:
+        instances = [d for d in vision_result.get("found_targets", [])
+                     if d.get("label") == p["label"] and d.get("confidence", 0.0) >= p["min_confidence"]]
+        if p["order"] == "position":
+            # Reading order: top to bottom, then left to right
+            instances.sort(key=lambda d: (d["bbox"][1], d["bbox"][0]))
+        if p["max_count"] > 0:
+            instances = instances[:p["max_count"]]
+        state = controller._instance_iterators[node.id] = [instances, 0]
+    instances, index = state
+    if index < len(instances):
+        state[1] = index + 1
+        controller.current_instance = instances[index]
+        return True, "next_body"
+    controller._instance_iterators.pop(node.id, None)
+    controller.current_instance = None
+    return bool(instances), "next_after"
+
+
+@register_node_handler("find_image")
+def exec_find_image(controller, node: CompiledNode, vision_result: dict, should_cancel_callback=None):
+    template_name = node.params["template_name"]
+    if not template_name:
+        return False, None
+    # Check found_targets from vision_result
+    for det in vision_result.get("found_targets", []):
+        if det.get("label") == template_name and det.get("confidence", 0.0) >= node.params["confidence"]:
+            return True, None
+    return False, None
+
+
+@register_node_handler("verify_image_color")
+def exec_verify_image_color(controller, node: CompiledNode, vision_result: dict, should_cancel_callback=None):
+    try:
+        # Check cancellation before starting verification
+        if _cancelled(should_cancel_callback):
+            return False, None
+        p = node.params
+        template_name = p["template_name"]
+        if not template_name:
+            return False, None
+
+        # Find the template in found_targets
+        det = _find_detection(vision_result, template_name)
+        if not det:
+            return False, None
+
+        # Check point is the bbox center shifted by the configured offset
+        x1, y1, x2, y2 = det["bbox"]
+        check_x = int((x1 + x2) / 2) + p["offset_x"]
+        check_y = int((y1 + y2) / 2) + p["offset_y"]
+
+        frame_bgr = vision_result.get("frame")
+        if frame_bgr is None:
+            return False, None
+        # The frame may be a capture crop; the check point is in full-frame pixels
+        ox, oy = vision_result.get("frame_origin", (0, 0))
+        check_x -= ox
+        check_y -= oy
+        h, w = frame_bgr.shape[:2]
+        if check_x < 0 or check_x >= w or check_y < 0 or check_y >= h:
+            return False, None
+
+        # Square ROI around the check point; radius is half the side length (default 5px)
+        radius = p["radius"]
+        roi_size = max(1, int(radius) if radius > 0 else 5)
+        roi = frame_bgr[max(0, check_y - roi_size):min(h, check_y + roi_size), max(0, check_x - roi_size):min(w, check_x + roi_size)]
+        if roi.size == 0:
+            return False, None
+
+        # Check cancellation before image processing
+        if _cancelled(should_cancel_callback):
+            return False, None
+        boxes = _find_color_boxes(controller, roi, p)
+        # Check cancellation after image processing completes
+        if _cancelled(should_cancel_callback):
+            return False, None
+        return bool(boxes), None
+    except Exception:
+        return False, None
+
+
+def _wait_condition_met(controller, params: dict, vision_result: dict) -> bool:
+    if params["mode"] == "color":
+        present = bool(_search_color(controller, vision_result, params))
+    else:
+        det = _find_detection(vision_result, params["label"])
+        present = det is not None and det.get("confidence", 0.0) >= params["min_confidence"]
+    return present if params["until"] != "disappear" else not present
+
+
+@register_node_handler("wait_for")
+def exec_wait_for(controller, node: CompiledNode, vision_result: dict, should_cancel_callback=None):
+    """
+    Block until a label appears/disappears or a color predicate holds.
+
+    Wakes on each newly published frame (no fixed polling delay when the run is
+    fed by a VisionFeed). Succeeds along the default connection; on timeout it
+    takes ``next_timeout`` (or ends the run if that branch is unset).
+    """
+    p = node.params
+    deadline = time.monotonic() + p["timeout"]
+    current = vision_result
+    while True:
+        if _cancelled(should_cancel_callback):
+            return False, None
+        try:
+            if current and _wait_condition_met(controller, p, current):
+                return True, None
+        except Exception:
+            return False, None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False, "next_timeout"
+        # Moves the node's frame hold from ``current`` to the newer result (only one frame stays pinned)
+        newer = controller.next_vision_result(current, remaining)
+        if newer is not None:
+            current = newer
@@ -0,0 +1,79 @@
+"""
+Streaming execution statistics per node and per node type.
+
+AutomationController records the duration of every node it executes here
+(from the node's vision read to the end of its handler). Memory is constant
+per node whatever the run length: each node and type keeps a StreamingStats
+(count, total, mean/std, min/max, p50/p95/p99) instead of a list of durations.
+
+report() may be called from any thread while the script runs, and the
+statistics of the last run stay available after it ends or is cancelled (they
+are reset when the next run starts).
+"""
+import time
+import threading
+from typing import Dict, Optional
+from .performance_monitor import StreamingStats
+
+
+class NodeStatistics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, StreamingStats] = {}
+        self._node_types: Dict[str, str] = {}
+        self._types: Dict[str, StreamingStats] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancelled = False
+
+    def start(self):
+        """Forget the previous run"""
+        with self._lock:
+            self._nodes.clear()
+            self._node_types.clear()
+            self._types.clear()
+            self.started_at = time.time()
+            self.finished_at = None
+            self.cancelled = False
+
+    def finish(self, cancelled: bool = False):
+        with self._lock:
+            self.finished_at = time.time()
+            self.cancelled = cancelled
+
+    def record(self, node_id: str, node_type: str, ms: float):
+        with self._lock:
+            stats = self._nodes.get(node_id)
+            if stats is None:
+                stats = self._nodes[node_id] = StreamingStats()
+                self._node_types[node_id] = node_type
+            stats.add(ms)
+            type_stats = self._types.get(node_type)
+            if type_stats is None:
+                type_stats = self._types[node_type] = StreamingStats()
+            type_stats.add(ms)
+
+    def node(self, node_id: str) -> Dict[str, float]:
+        with self._lock:
+            stats = self._nodes.get(node_id)
+            return stats.summary() if stats is not None else StreamingStats().summary()
+
+    def report(self) -> dict:
+        """
+        {"total_duration" (s), "total_nodes_executed", "running", "cancelled",
+        "nodes": {node_id: summary + "type"}, "types": {node_type: summary}};
+        summaries are StreamingStats.summary() in ms
+        """
+        with self._lock:
+            nodes = {nid: dict(stats.summary(), type=self._node_types[nid]) for nid, stats in self._nodes.items()}
+            types = {node_type: stats.summary() for node_type, stats in self._types.items()}
+            started, finished, cancelled = self.started_at, self.finished_at, self.cancelled
+        end = finished if finished is not None else time.time()
+        return {
+            "total_duration": end - started if started is not None else 0.0,
+            "total_nodes_executed": sum(n["count"] for n in nodes.values()),
+            "running": started is not None and finished is None,
+            "cancelled": cancelled,
+            "nodes": nodes,
+            "types": types,
+        }
@@ -1,12 +1,174 @@
+import math
 import time
+import threading
 from collections import deque
+import os
+from typing import Callable, Dict, List, Optional
+import numpy as np
 import psutil
 
+# Latency histograms: bucket bounds grow geometrically from LATENCY_MIN_MS, so a
+# quantile is exact to within one bucket (~5%) from 10 us to ~4 minutes
+# (0.01 * 1.05 ** 349 ms); longer durations fall into the last bucket
+LATENCY_MIN_MS = 0.01
+LATENCY_BUCKET_GROWTH = 1.05
+LATENCY_BUCKETS = 350
+# Counts are kept per LATENCY_SLICE_SECONDS slice for the last LATENCY_WINDOW_SECONDS;
+# any window up to that length is the sum of its most recent slices
+LATENCY_SLICE_SECONDS = 1.0
+LATENCY_WINDOW_SECONDS = 60.0
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+
+# Process/thread resource sampling (see PerformanceMonitor.start_resource_sampling())
+RESOURCE_SAMPLE_INTERVAL = 1.0
+RESOURCE_HISTORY_SECONDS = 60.0
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory sliding-window latency histogram.
+
+    record() is O(1) and allocates nothing; memory is slices x buckets counters
+    whatever the sample rate.
+    """
+
+    _log_growth = math.log(LATENCY_BUCKET_GROWTH)
+
+    def __init__(self, window_seconds: float = LATENCY_WINDOW_SECONDS, slice_seconds: float = LATENCY_SLICE_SECONDS):
+        self.slice_seconds = slice_seconds
+        self.slices = max(1, int(math.ceil(window_seconds / slice_seconds)))
+        self._counts = np.zeros((self.slices, LATENCY_BUCKETS), dtype=np.int64)
+        self._sums = np.zeros(self.slices, dtype=np.float64)
+        self._maxima = np.zeros(self.slices, dtype=np.float64)
+        # Absolute slice number held by each row (-1: empty)
+        self._slice_ids = np.full(self.slices, -1, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def bucket(cls, ms: float) -> int:
+        if ms <= LATENCY_MIN_MS:
+            return 0
+        return min(LATENCY_BUCKETS - 1, int(math.log(ms / LATENCY_MIN_MS) / cls._log_growth) + 1)
+
+    @staticmethod
+    def bucket_upper_ms(index: int) -> float:
+        return LATENCY_MIN_MS * LATENCY_BUCKET_GROWTH ** index
+
+    def record(self, ms: float, ts: Optional[float] = None):
+        ts = time.monotonic() if ts is None else ts
+        slice_id = int(ts // self.slice_seconds)
+        row = slice_id % self.slices
+        index = self.bucket(ms)
+        with self._lock:
+            if self._slice_ids[row] != slice_id:
+                # The row held a slice that has left the window
+                self._slice_ids[row] = slice_id
+                self._counts[row] = 0
+                self._sums[row] = 0.0
+                self._maxima[row] = 0.0
+            self._counts[row, index] += 1
+            self._sums[row] += ms
+            if ms > self._maxima[row]:
+                self._maxima[row] = ms
+
+    def stats(self, window: Optional[float] = None, ts: Optional[float] = None) -> Dict[str, float]:
+        """count, mean, p50/p95/p99 (bucket upper bounds, capped at max) and max over the last ``window`` seconds"""
+        ts = time.monotonic() if ts is None else ts
+        current = int(ts // self.slice_seconds)
+        slices = self.slices if window is None else max(1, min(self.slices, int(math.ceil(window / self.slice_seconds))))
+        with self._lock:
+            live = (self._slice_ids > current - slices) & (self._slice_ids <= current)
+            counts = self._counts[live].sum(axis=0)
+            total = float(self._sums[live].sum())
+            peak = float(self._maxima[live].max()) if live.any() else 0.0
+        n = int(counts.sum())
+        result = {"count": n, "mean": total / n if n else 0.0, "max": peak}
+        cumulative = np.cumsum(counts)
+        for q in LATENCY_QUANTILES:
+            key = f"p{int(q * 100)}"
+            if not n:
+                result[key] = 0.0
+                continue
+            index = int(np.searchsorted(cumulative, q * n))
+            result[key] = min(peak, self.bucket_upper_ms(index))
+        return result
+
+
+class StreamingStats:
+    """
+    Constant-memory running statistics of a stream of durations (ms): count,
+    total, Welford mean/variance, min/max and quantiles from a cumulative
+    LatencyHistogram-style bucket array (within one bucket, ~5%).
+    Not thread-safe; callers serialize add().
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._counts = np.zeros(LATENCY_BUCKETS, dtype=np.int64)
+
+    def add(self, ms: float):
+        self.count += 1
+        self.total += ms
+        delta = ms - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (ms - self.mean)
+        if ms < self.min:
+            self.min = ms
+        if ms > self.max:
+            self.max = ms
+        self._counts[LatencyHistogram.bucket(ms)] += 1
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (0 with fewer than two values)"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self._counts), q * self.count))
+        return max(self.min, min(self.max, LatencyHistogram.bucket_upper_ms(index)))
+
+    def summary(self) -> Dict[str, float]:
+        result = {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "std": math.sqrt(self.variance),
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+        }
+        for q in LATENCY_QUANTILES:
+            result[f"p{int(q * 100)}"] = self.quantile(q)
+        return result
+
 
 class PerformanceMonitor:
     def __init__(self, window_seconds: float = 1.0):
         self.window = window_seconds
         self.timestamps = deque()
+        # (timestamp, cumulative allocated bytes) samples for allocation_rate()
+        self.alloc_samples = deque()
+        # (timestamp, ImageProcessor.change_stats()) samples for change_detection()
+        self.change_samples = deque()
+        # Stage name -> LatencyHistogram (see record_latency())
+        self._latencies: Dict[str, LatencyHistogram] = {}
+        self._latency_lock = threading.Lock()
+        # Process label -> (pid, thread_names() -> {native thread id: name} or None)
+        self._watched: Dict[str, tuple] = {"main": (os.getpid(), self._own_thread_names)}
+        self._processes: Dict[str, psutil.Process] = {}
+        # (label, native thread id) -> (cpu seconds, monotonic time) of the previous sample
+        self._thread_cpu: Dict[tuple, tuple] = {}
+        self.resource_samples = deque()
+        self._resource_history = RESOURCE_HISTORY_SECONDS
+        self._resource_lock = threading.Lock()
+        self._resource_thread: Optional[threading.Thread] = None
+        self._resource_stop = threading.Event()
 
     def tick(self, ts: float):
         self.timestamps.append(ts)
@@ -23,7 +185,188 @@ class PerformanceMonitor:
             return 0.0
         return (n - 1) / duration
 
+    def sample_allocations(self, ts: float, allocated_bytes: int):
+        """Record a cumulative allocated-bytes counter (e.g. FrameRing.stats()["allocated_bytes"]) at ``ts``"""
+        self.alloc_samples.append((ts, allocated_bytes))
+        cutoff = ts - self.window
+        while len(self.alloc_samples) > 2 and self.alloc_samples[1][0] <= cutoff:
+            self.alloc_samples.popleft()
+
+    def allocation_rate(self) -> float:
+        """Bytes allocated per second over the window (0 in steady state with preallocated buffers)"""
+        if len(self.alloc_samples) <= 1:
+            return 0.0
+        (t0, b0), (t1, b1) = self.alloc_samples[0], self.alloc_samples[-1]
+        if t1 <= t0:
+            return 0.0
+        return (b1 - b0) / (t1 - t0)
+
+    def sample_change_stats(self, ts: float, stats: dict):
+        """Record the cumulative change-detection counters (ImageProcessor.change_stats()) at ``ts``"""
+        if not stats:
+            return
+        self.change_samples.append((ts, dict(stats)))
+        cutoff = ts - self.window
+        while len(self.change_samples) > 2 and self.change_samples[1][0] <= cutoff:
+            self.change_samples.popleft()
+
+    def change_detection(self) -> dict:
+        """
+        Change detection over the window: share of unchanged frames, share of target
+        matches answered from a previous frame (hit rate), and match CPU ms saved per second.
+        """
+        result = {"unchanged_rate": 0.0, "hit_rate": 0.0, "saved_ms_per_s": 0.0}
+        if len(self.change_samples) <= 1:
+            return result
+        (t0, a), (t1, b) = self.change_samples[0], self.change_samples[-1]
+        frames = b["frames"] - a["frames"]
+        reused = b["reused"] - a["reused"]
+        lookups = reused + b["matched"] - a["matched"]
+        if frames > 0:
+            result["unchanged_rate"] = (b["unchanged_frames"] - a["unchanged_frames"]) / frames
+        if lookups > 0:
+            result["hit_rate"] = reused / lookups
+        if t1 > t0:
+            result["saved_ms_per_s"] = (b["saved_ms"] - a["saved_ms"]) / (t1 - t0)
+        return result
+
+    def record_latency(self, stage: str, ms: float, ts: Optional[float] = None):
+        """
+        Add one duration of ``stage`` (e.g. "grab", "match:Label", "paint", "node:click")
+        to its histogram; thread-safe. ``ts`` is a time.monotonic() timestamp (default: now).
+        """
+        hist = self._latencies.get(stage)
+        if hist is None:
+            with self._latency_lock:
+                hist = self._latencies.setdefault(stage, LatencyHistogram())
+        hist.record(ms, ts)
+
+    def record_latencies(self, timings: Dict[str, float], ts: Optional[float] = None):
+        """record_latency() for every stage -> ms entry (e.g. a vision result's "timings")"""
+        for stage, ms in timings.items():
+            self.record_latency(stage, ms, ts)
+
+    def latency(self, stage: str, window: Optional[float] = None, ts: Optional[float] = None) -> Dict[str, float]:
+        """Latency summary of ``stage`` over the ``window`` seconds before ``ts`` (default: the whole retained window, now)"""
+        hist = self._latencies.get(stage)
+        if hist is None:
+            return {"count": 0, "mean": 0.0, "max": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+        return hist.stats(window, ts)
+
+    def latency_stats(self, window: Optional[float] = None, ts: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """latency() of every recorded stage"""
+        with self._latency_lock:
+            stages = sorted(self._latencies)
+        return {stage: self.latency(stage, window, ts) for stage in stages}
+
+    @staticmethod
+    def _own_thread_names() -> Dict[int, str]:
+        return {t.native_id: t.name for t in threading.enumerate() if t.native_id is not None}
+
+    def watch_process(self, label: str, pid: int, thread_names: Optional[Callable[[], Dict[int, str]]] = None):
+        """
+        Also sample process ``pid`` under ``label`` (e.g. the vision child process);
+        ``thread_names`` maps its native thread ids to names (unnamed threads are summed as "other")
+        """
+        with self._resource_lock:
+            self._watched[label] = (pid, thread_names)
+            self._processes.pop(label, None)
+
+    def unwatch_process(self, label: str):
+        with self._resource_lock:
+            self._watched.pop(label, None)
+            self._processes.pop(label, None)
+            self._thread_cpu = {k: v for k, v in self._thread_cpu.items() if k[0] != label}
+
+    def _sample_process(self, label: str, pid: int, thread_names, now: float) -> dict:
+        proc = self._processes.get(label)
+        if proc is None or proc.pid != pid:
+            proc = self._processes[label] = psutil.Process(pid)
+        with proc.oneshot():
+            # cpu_percent() measures since the previous call (0.0 on the first one)
+            result = {
+                "pid": pid,
+                "rss": proc.memory_info().rss,
+                "cpu_percent": proc.cpu_percent(interval=None),
+                "num_threads": proc.num_threads(),
+                "threads": {},
+            }
+            threads = proc.threads()
+        names = thread_names() if thread_names is not None else {}
+        for t in threads:
+            cpu_time = t.user_time + t.system_time
+            key = (label, t.id)
+            previous = self._thread_cpu.get(key)
+            self._thread_cpu[key] = (cpu_time, now)
+            percent = (cpu_time - previous[0]) / (now - previous[1]) * 100.0 if previous and now > previous[1] else 0.0
+            name = names.get(t.id, "other")
+            entry = result["threads"].setdefault(name, {"cpu_time": 0.0, "cpu_percent": 0.0, "count": 0})
+            entry["cpu_time"] += cpu_time
+            entry["cpu_percent"] += percent
+            entry["count"] += 1
+        return result
+
+    def sample_resources(self, ts: Optional[float] = None) -> dict:
+        """
+        Sample RSS, CPU%, thread count and per-thread CPU time/CPU% of every watched
+        process now, append it to ``resource_samples`` and return it
+        """
+        ts = time.time() if ts is None else ts
+        now = time.monotonic()
+        processes = {}
+        with self._resource_lock:
+            for label, (pid, thread_names) in list(self._watched.items()):
+                try:
+                    processes[label] = self._sample_process(label, pid, thread_names, now)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    self._processes.pop(label, None)
+            sample = {"timestamp": ts, "processes": processes}
+            self.resource_samples.append(sample)
+            cutoff = ts - self._resource_history
+            while self.resource_samples and self.resource_samples[0]["timestamp"] < cutoff:
+                self.resource_samples.popleft()
+        return sample
+
+    def start_resource_sampling(self, interval: float = RESOURCE_SAMPLE_INTERVAL, history_seconds: float = RESOURCE_HISTORY_SECONDS):
+        """Call sample_resources() every ``interval`` seconds on a daemon thread, keeping ``history_seconds`` of samples"""
+        if self._resource_thread is not None and self._resource_thread.is_alive():
+            return
+        self._resource_history = history_seconds
+        self._resource_stop.clear()
+
+        def run():
+            while not self._resource_stop.is_set():
+                try:
+                    self.sample_resources()
+                except Exception as e:
+                    print(f"[PerformanceMonitor] resource sampling failed: {e}")
+                self._resource_stop.wait(interval)
+
+        self._resource_thread = threading.Thread(target=run, name="ResourceSampler", daemon=True)
+        self._resource_thread.start()
+
+    def stop_resource_sampling(self):
+        self._resource_stop.set()
+        thread, self._resource_thread = self._resource_thread, None
+        if thread is not None:
+            thread.join(1.0)
+
+    def process_resources(self) -> dict:
+        """Latest resource sample ({} before the first one)"""
+        with self._resource_lock:
+            return self.resource_samples[-1] if self.resource_samples else {}
+
+    def resource_history(self, seconds: Optional[float] = None) -> List[dict]:
+        """Resource samples of the last ``seconds`` (default: the whole history), oldest first"""
+        with self._resource_lock:
+            samples = list(self.resource_samples)
+        if seconds is None or not samples:
+            return samples
+        cutoff = samples[-1]["timestamp"] - seconds
+        return [s for s in samples if s["timestamp"] >= cutoff]
+
     def resources(self):
+        """System-wide CPU and memory usage (see process_resources() for this process)"""
         mem = psutil.virtual_memory()
         cpu_percent = psutil.cpu_percent(interval=None)
         return {
@@ -1,34 +1,110 @@
 import time
 import threading
-import mss
-import numpy as np
+from typing import Callable, Optional, Tuple
+from .capture_backends import CaptureBackend, MssBackend, PACING_FAST, PACING_REALTIME
+from .frame_ring import FrameLease, FrameRing
+from .tracer import get_tracer
 
 
 class ScreenCaptureWorker(threading.Thread):
-    def __init__(self, region, fps=60, callback=None):
-        super().__init__(daemon=True)
+    def __init__(self, region=None, fps=60, callback=None, backend: Optional[CaptureBackend] = None, pacing: str = PACING_REALTIME, on_finished=None, frame_slots: int = 0, crop: Optional[Callable[[int, int], Optional[Tuple[int, int, int, int]]]] = None):
+        """
+        Args:
+            region: Screen region for the default mss backend (None: primary monitor)
+            fps: Capture rate for live capture, and for replay sources without a native frame rate
+            callback: callback(frame_bgra, timestamp) for every frame
+            backend: Frame source (default: live mss capture of ``region``)
+            pacing: "realtime" paces frames at the source rate, "fast" delivers them back to back
+            on_finished: Called once a finite replay source is exhausted
+            frame_slots: Capture into a ring of this many preallocated buffers (0: a new
+                array per frame). The callback then gets a read-only view that is only
+                valid during the call. To keep it longer, retain ``current_lease``
+                (the frame's FrameLease, set while the callback runs).
+            crop: crop(width, height) -> (x_min, y_min, x_max, y_max) or None, called
+                before every grab with the full frame size; only that rectangle is
+                captured (see capture_crop). ``current_origin`` holds the crop's
+                top-left corner while the callback runs.
+
+        ``current_grab_ms`` holds the time the backend took to deliver the frame
+        (for stage latency statistics) while the callback runs.
+        """
+        super().__init__(daemon=True, name="ScreenCapture")
+        if pacing not in (PACING_REALTIME, PACING_FAST):
+            raise ValueError(f"Unknown pacing '{pacing}'")
+        self.backend = backend if backend is not None else MssBackend(region=region)
         self.region = region
         self.fps = fps
+        self.pacing = pacing
         self.callback = callback
+        self.on_finished = on_finished
+        self.frames_captured = 0
+        self.frame_slots = frame_slots
+        self.frame_ring: Optional[FrameRing] = None
+        self.current_lease: Optional[FrameLease] = None
+        self.crop = crop
+        self.current_origin: Tuple[int, int] = (0, 0)
+        self.current_grab_ms = 0.0
         self._running = threading.Event()
         self._running.set()
-        self._mss = None
 
     def run(self):
-        frame_interval = 1.0 / self.fps
-        with mss.mss() as sct:
+        backend = self.backend
+        # Live capture always runs at the configured rate; "fast" only applies to replay
+        pace = backend.live or self.pacing == PACING_REALTIME
+        frame_interval = 1.0 / (backend.fps or self.fps)
+        exhausted = False
+        ring = None
+        region = backend.region
+        full_size = (region["width"], region["height"])
+        if self.frame_slots > 0:
+            ring = self.frame_ring = FrameRing({"bgra": (region["height"], region["width"], 4)}, slots=self.frame_slots)
+        with backend:
             while self._running.is_set():
                 start = time.perf_counter()
-                img = sct.grab(self.region)
-                frame = np.array(img)
+                # Stamp the frame before grabbing so "captured after T" guarantees post-T pixels
                 ts = time.time()
-                if self.callback:
-                    self.callback(frame, ts)
-                elapsed = time.perf_counter() - start
-                sleep_time = frame_interval - elapsed
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                crop = self.crop(*full_size) if self.crop is not None else None
+                grab_start = time.perf_counter()
+                if ring is None:
+                    lease = None
+                    frame = backend.grab()
+                    if crop is not None and frame is not None:
+                        frame = frame[crop[1]:crop[3], crop[0]:crop[2]]
+                else:
+                    lease = ring.acquire()
+                    if crop is None:
+                        frame = backend.grab_into(lease["bgra"])
+                    else:
+                        frame = backend.grab_crop_into(lease["bgra"], crop)
+                    if frame is not None and frame is not lease["bgra"]:
+                        # Source or crop size changed: deliver this frame as-is, capture into resized slots from now on
+                        ring.ensure_shape({"bgra": frame.shape})
+                        lease.release()
+                        lease = None
+                if frame is None:
+                    if lease is not None:
+                        lease.release()
+                    exhausted = True
+                    break
+                grab_end = time.perf_counter()
+                self.current_grab_ms = (grab_end - grab_start) * 1000.0
+                get_tracer().complete("grab", "capture", grab_start, grab_end)
+                self.frames_captured += 1
+                self.current_lease = lease
+                self.current_origin = (crop[0], crop[1]) if crop is not None else (0, 0)
+                try:
+                    if self.callback:
+                        self.callback(lease.view("bgra") if lease is not None else frame, ts)
+                finally:
+                    self.current_lease = None
+                    if lease is not None:
+                        lease.release()
+                if pace:
+                    sleep_time = frame_interval - (time.perf_counter() - start)
+                    if sleep_time > 0:
+                        time.sleep(sleep_time)
+        if exhausted and self.on_finished:
+            self.on_finished()
 
     def stop(self):
         self._running.clear()
-
@@ -0,0 +1,364 @@
+"""
+Compiled execution plans for VisualScript.
+
+A VisualScript is an editor-friendly structure: nodes live in a list, successors
+are split between ``connections`` and per-type ``next_*`` params, and params are
+raw JSON values. compile_script() turns it into an ExecutionPlan once, so the
+engine can look nodes up in O(1), follow pre-resolved successor slots and read
+params that are already coerced to their runtime types.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+from .actions import Action, VisualScript, VisualNode
+
+
+# Branch params per node type: slot name -> param key holding the target node ID
+BRANCH_PARAMS: Dict[str, Tuple[str, ...]] = {
+    "condition": ("next_true", "next_false"),
+    "loop": ("next_body", "next_after"),
+    "wait_for": ("next_timeout",),
+    "find_all": ("next_body", "next_after"),
+}
+
+# Node types that re-enter their body branch, so revisiting them (and the first
+# body node) is not treated as a cycle
+LOOP_NODE_TYPES = {"loop", "find_all"}
+
+# Branch slots that never fall back to the default connection: if the branch is
+# unset, taking it ends the run (e.g. a wait_for timeout must not continue down
+# the success path)
+STRICT_BRANCHES = {"next_timeout"}
+
+# Params holding template labels read by each node type. Vision-reading types
+# missing from this table (e.g. plugins) are assumed to read any label.
+LABEL_PARAMS: Dict[str, Tuple[str, ...]] = {
+    "click": ("label",),
+    "condition": ("label",),
+    "wait_for": ("label",),
+    "find_all": ("label",),
+    "find_image": ("template_name",),
+    "verify_image_color": ("template_name",),
+    "find_color": (),
+}
+
+# Node types that search raw frame pixels for a color: type -> the "mode" value that
+# selects the color search (None: always). Their optional "roi" param
+# ([x_min, y_min, x_max, y_max] as fractions of the frame) limits the search;
+# without it they need the whole frame.
+COLOR_SEARCH_MODES: Dict[str, Optional[str]] = {
+    "find_color": None,
+    "condition": "color",
+    "wait_for": "color",
+}
+
+# "mode" values in which a vision-reading node type ignores the vision result (e.g. a
+# click at a fixed bbox or at the instance selected by find_all); the engine then does
+# not wait for a fresh frame before running it
+VISION_FREE_MODES: Dict[str, Tuple[str, ...]] = {
+    "click": ("bbox", "instance"),
+}
+
+# Typed params per node type: key -> (coercer, default)
+PARAM_SPECS: Dict[str, Dict[str, Tuple[Callable[[Any], Any], Any]]] = {
+    "sleep": {"seconds": (float, 0.2)},
+    "key": {"key": (str, "space")},
+    "click": {"mode": (str, "label"), "label": (str, ""), "button": (str, "left"), "duration": (float, 0.0)},
+    "find_color": {"click": (bool, False), "button": (str, "left"), "duration": (float, 0.0)},
+    "condition": {"mode": (str, "label"), "label": (str, ""), "min_confidence": (float, 0.0)},
+    "loop": {"count": (int, 0)},
+    "find_image": {"template_name": (str, ""), "confidence": (float, 0.8)},
+    "verify_image_color": {"template_name": (str, ""), "offset_x": (int, 0), "offset_y": (int, 0), "radius": (float, 0.0)},
+    "wait_for": {"mode": (str, "label"), "label": (str, ""), "until": (str, "appear"), "min_confidence": (float, 0.0), "timeout": (float, 10.0)},
+    "find_all": {"label": (str, ""), "min_confidence": (float, 0.0), "max_count": (int, 0), "order": (str, "position")},
+}
+
+# Legacy ActionSequence actions share the handlers but historically used different defaults
+SEQUENCE_PARAM_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "sleep": {"seconds": 0.0},
+    "click": {"mode": "bbox"},
+    "find_color": {"click": True},
+}
+
+
+def coerce_params(node_type: str, raw: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Return a copy of ``raw`` with the typed params of ``node_type`` coerced and defaulted.
+
+    Params without a spec (e.g. hsv_min/hsv_max lists) are passed through unchanged.
+    ``defaults`` overrides the spec defaults for missing keys.
+    Raises ValueError/TypeError when a typed param cannot be converted.
+    """
+    params = dict(raw)
+    for key, (coerce, default) in PARAM_SPECS.get(node_type, {}).items():
+        if defaults and key in defaults:
+            default = defaults[key]
+        params[key] = coerce(raw.get(key, default))
+    return params
+
+
+@dataclass
+class CompiledNode:
+    id: str
+    type: str
+    node: VisualNode
+    params: Dict[str, Any]
+    next_id: Optional[str] = None  # Default successor from script.connections
+    branches: Dict[str, Optional[str]] = field(default_factory=dict)  # slot (param key) -> node ID
+    handler: Optional[Callable] = None
+    error: Optional[str] = None  # Set when params failed validation
+    sequence: bool = False  # Compiled from a legacy ActionSequence action
+    uses_vision: bool = True  # Handler reads the vision result (engine may wait for a fresh frame)
+    labels: Optional[FrozenSet[str]] = frozenset()  # Template labels the node reads (None: any label)
+    regions: Optional[FrozenSet[Tuple[float, ...]]] = frozenset()  # Frame regions searched for colors (None: whole frame)
+    reach: Optional[int] = 0  # Pixels read beyond a detection's bbox (None: unbounded)
+
+    def successor(self, slot: Optional[str]) -> Optional[str]:
+        """Resolve a handler-selected branch slot, falling back to the default connection"""
+        if slot:
+            target = self.branches.get(slot)
+            if target:
+                return target
+            if slot in STRICT_BRANCHES:
+                return None
+        return self.next_id
+
+
+@dataclass
+class ExecutionPlan:
+    script: VisualScript
+    fingerprint: str
+    nodes: Dict[str, CompiledNode]
+    entry_id: Optional[str]
+    issues: List[Tuple[str, str]] = field(default_factory=list)  # (node_id, description)
+    handlers_version: int = 0  # Handler registry version the plan was bound against
+    _scope_cache: Dict[Tuple[str, Optional[str], Optional[int]], Any] = field(default_factory=dict, repr=False)
+
+    def get(self, nid: Optional[str]) -> Optional[CompiledNode]:
+        if not nid:
+            return None
+        return self.nodes.get(nid)
+
+    def _reachable(self, start_id: Optional[str], max_steps: Optional[int]) -> List[CompiledNode]:
+        if start_id is None:
+            return list(self.nodes.values())
+        reachable = []
+        seen = {start_id}
+        frontier = [start_id]
+        depth = 0
+        while frontier:
+            next_frontier = []
+            for nid in frontier:
+                cn = self.nodes.get(nid)
+                if cn is None:
+                    continue
+                reachable.append(cn)
+                if max_steps is not None and depth >= max_steps:
+                    continue
+                for target in [cn.next_id, *cn.branches.values()]:
+                    if target and target not in seen:
+                        seen.add(target)
+                        next_frontier.append(target)
+            frontier = next_frontier
+            depth += 1
+        return reachable
+
+    def _union(self, attr: str, start_id: Optional[str], max_steps: Optional[int]) -> Optional[FrozenSet]:
+        """Union of a per-node set over the reachable nodes (None if any node's is None), cached"""
+        key = (attr, start_id, max_steps if start_id else None)
+        if key in self._scope_cache:
+            return self._scope_cache[key]
+        items = set()
+        result: Optional[FrozenSet] = None
+        for cn in self._reachable(start_id, max_steps):
+            values = getattr(cn, attr)
+            if values is None:
+                break
+            items.update(values)
+        else:
+            result = frozenset(items)
+        self._scope_cache[key] = result
+        return result
+
+    def referenced_labels(self, start_id: Optional[str] = None, max_steps: Optional[int] = None) -> Optional[FrozenSet[str]]:
+        """
+        Template labels the script can read.
+
+        Args:
+            start_id: Only consider nodes reachable from this node (None: every node)
+            max_steps: Limit reachability to this many transitions from ``start_id``
+
+        Returns:
+            The label set, or None if a reachable node may read any label.
+        """
+        return self._union("labels", start_id, max_steps)
+
+    def referenced_regions(self, start_id: Optional[str] = None, max_steps: Optional[int] = None) -> Optional[FrozenSet[Tuple[float, ...]]]:
+        """
+        Frame regions the script searches for colors (arguments as for referenced_labels()).
+
+        Returns:
+            The set of fractional regions, or None if a reachable node may read the whole frame.
+        """
+        return self._union("regions", start_id, max_steps)
+
+    def referenced_reach(self, start_id: Optional[str] = None, max_steps: Optional[int] = None) -> Optional[int]:
+        """
+        Largest distance (px) beyond a detection's bbox the script reads pixels at
+        (arguments as for referenced_labels()); None if a reachable node's is unbounded.
+        """
+        key = ("reach", start_id, max_steps if start_id else None)
+        if key in self._scope_cache:
+            return self._scope_cache[key]
+        result: Optional[int] = 0
+        for cn in self._reachable(start_id, max_steps):
+            if cn.reach is None:
+                result = None
+                break
+            result = max(result, cn.reach)
+        self._scope_cache[key] = result
+        return result
+
+
+def script_fingerprint(script: VisualScript) -> str:
+    """Cheap structural fingerprint used to invalidate cached plans when a script is edited"""
+    data = {
+        "nodes": [(n.id, n.type, n.params) for n in script.nodes],
+        "connections": script.connections,
+    }
+    return json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def node_labels(node_type: str, params: Dict[str, Any], uses_vision: bool = True) -> Optional[FrozenSet[str]]:
+    """Template labels a node reads (None if unknown, i.e. it may read any label)"""
+    if not uses_vision:
+        return frozenset()
+    keys = LABEL_PARAMS.get(node_type)
+    if keys is None:
+        return None
+    return frozenset(str(params[k]) for k in keys if params.get(k))
+
+
+def node_regions(node_type: str, params: Dict[str, Any], uses_vision: bool = True) -> Optional[FrozenSet[Tuple[float, ...]]]:
+    """Frame regions a node searches for colors (None if it may read the whole frame)"""
+    if not uses_vision:
+        return frozenset()
+    if node_type not in LABEL_PARAMS:
+        # Unknown vision-reading type (e.g. a plugin): may read any pixel
+        return None
+    if node_type not in COLOR_SEARCH_MODES:
+        return frozenset()
+    mode = COLOR_SEARCH_MODES[node_type]
+    if mode is not None and params.get("mode") != mode:
+        return frozenset()
+    try:
+        roi = tuple(float(v) for v in params.get("roi") or ())
+    except (TypeError, ValueError):
+        roi = ()
+    if len(roi) < 4:
+        return None
+    return frozenset([roi[:4]])
+
+
+def node_reach(node_type: str, params: Dict[str, Any], uses_vision: bool = True) -> Optional[int]:
+    """Pixels beyond a detection's bbox a node reads (None if unbounded)"""
+    if not uses_vision or node_type != "verify_image_color":
+        return 0
+    # Samples a square of half-size radius (5 px by default) at (offset_x, offset_y) from
+    # the detection's center, which lies inside the bbox
+    try:
+        radius = float(params.get("radius") or 0.0)
+        offset = max(abs(int(params.get("offset_x") or 0)), abs(int(params.get("offset_y") or 0)))
+    except (TypeError, ValueError):
+        return None
+    return offset + (int(radius) if radius > 0 else 5)
+
+
+def compile_script(script: VisualScript, resolve_handler: Callable[[str], Optional[Callable]], fingerprint: Optional[str] = None, handlers_version: int = 0, uses_vision: Optional[Callable[[str], bool]] = None) -> ExecutionPlan:
+    """
+    Compile ``script`` into an ExecutionPlan.
+
+    Args:
+        script: The VisualScript to compile
+        resolve_handler: Returns the handler for a node type (or None if unknown)
+        fingerprint: Precomputed script_fingerprint(script), if the caller already has it
+        handlers_version: Handler registry version, stored so callers can detect stale bindings
+        uses_vision: Returns whether a node type reads the vision result (default: all do)
+
+    Returns:
+        ExecutionPlan with the node table, resolved successors, coerced params,
+        bound handlers and any validation issues found while compiling.
+    """
+    nodes: Dict[str, CompiledNode] = {}
+    issues: List[Tuple[str, str]] = []
+    for node in script.nodes:
+        if node.id in nodes:
+            # Keep first occurrence (matches the previous linear-scan lookup)
+            issues.append((node.id, "duplicate node ID"))
+            continue
+        error = None
+        try:
+            params = coerce_params(node.type, node.params)
+        except (TypeError, ValueError) as e:
+            params = dict(node.params)
+            error = f"invalid params: {e}"
+            issues.append((node.id, error))
+        handler = resolve_handler(node.type)
+        if handler is None:
+            issues.append((node.id, f"unknown node type '{node.type}'"))
+        branches = {key: (node.params.get(key) or None) for key in BRANCH_PARAMS.get(node.type, ())}
+        node_uses_vision = uses_vision(node.type) if uses_vision else True
+        if params.get("mode") in VISION_FREE_MODES.get(node.type, ()):
+            node_uses_vision = False
+        nodes[node.id] = CompiledNode(
+            id=node.id,
+            type=node.type,
+            node=node,
+            params=params,
+            next_id=script.connections.get(node.id) or None,
+            branches=branches,
+            handler=handler,
+            error=error,
+            uses_vision=node_uses_vision,
+            labels=node_labels(node.type, params, node_uses_vision),
+            regions=node_regions(node.type, params, node_uses_vision),
+            reach=node_reach(node.type, params, node_uses_vision),
+        )
+    # Report dangling successors; execution still stops on them at runtime
+    for cn in nodes.values():
+        for target in [cn.next_id, *cn.branches.values()]:
+            if target and target not in nodes:
+                issues.append((cn.id, f"successor '{target}' does not exist"))
+    entry_id = script.nodes[0].id if script.nodes else None
+    return ExecutionPlan(
+        script=script,
+        fingerprint=fingerprint if fingerprint is not None else script_fingerprint(script),
+        nodes=nodes,
+        entry_id=entry_id,
+        issues=issues,
+        handlers_version=handlers_version,
+    )
+
+
+def compile_action(action: Action, resolve_handler: Callable[[str], Optional[Callable]], index: int = 0) -> CompiledNode:
+    """
+    Compile a legacy ActionSequence action into a CompiledNode so it can run on the node handlers.
+
+    Actions have no IDs or successors; the node ID is derived from the action index.
+    """
+    error = None
+    try:
+        params = coerce_params(action.type, action.params, SEQUENCE_PARAM_DEFAULTS.get(action.type))
+    except (TypeError, ValueError) as e:
+        params = dict(action.params)
+        error = f"invalid params: {e}"
+    node = VisualNode(id=f"action_{index}", type=action.type, params=action.params)
+    return CompiledNode(
+        id=node.id,
+        type=action.type,
+        node=node,
+        params=params,
+        handler=resolve_handler(action.type),
+        error=error,
+        sequence=True,
+    )
@@ -1,8 +1,171 @@
 import os
 import json
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Optional, Tuple
 from .path_utils import to_absolute_path, get_base_dir
 
-TARGET_DEFINITIONS = {
+
+@dataclass(frozen=True)
+class TargetRecord:
+    """Frozen, typed copy of one TARGET_DEFINITIONS entry"""
+    label: str
+    template: str  # Absolute template path
+    method: str = "tm"
+    threshold: float = 0.85
+    roi: Tuple[float, float, float, float] = (0.0, 0.0, 1.0, 1.0)
+    max_instances: int = 1
+    track: bool = True
+    pyramid_levels: Optional[int] = None
+    nms_iou: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, label: str, cfg: Mapping[str, Any]) -> "TargetRecord":
+        roi = cfg.get("roi") or (0.0, 0.0, 1.0, 1.0)
+        levels = cfg.get("pyramid_levels")
+        nms_iou = cfg.get("nms_iou")
+        return cls(
+            label=label,
+            template=to_absolute_path(cfg.get("template", "")),
+            method=str(cfg.get("method", "tm")),
+            threshold=float(cfg.get("threshold", 0.85)),
+            roi=tuple(float(v) for v in roi[:4]),
+            max_instances=int(cfg.get("max_instances", 1)),
+            track=bool(cfg.get("track", True)),
+            pyramid_levels=None if levels is None else int(levels),
+            nms_iou=None if nms_iou is None else float(nms_iou),
+        )
+
+    def pixel_roi(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        """ROI in pixels (x_min, y_min, x_max, y_max), clipped to the frame"""
+        x_min = max(0, int(self.roi[0] * width))
+        y_min = max(0, int(self.roi[1] * height))
+        x_max = min(width, int(self.roi[2] * width))
+        y_max = min(height, int(self.roi[3] * height))
+        return x_min, y_min, x_max, y_max
+
+
+@dataclass(frozen=True)
+class TargetSnapshot:
+    """
+    Immutable view of the target registry at one revision.
+
+    Readers take a snapshot once (e.g. per frame) and use it without locks or
+    copies; pixel ROIs are computed once per frame size and cached here.
+    """
+    version: int
+    records: Tuple[TargetRecord, ...]
+    _pixel_rois: Dict[Tuple[int, int], Tuple[Tuple[int, int, int, int], ...]] = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def build(cls, definitions: Mapping[str, Mapping[str, Any]], version: int) -> "TargetSnapshot":
+        records = []
+        for label, cfg in list(definitions.items()):
+            try:
+                records.append(TargetRecord.from_config(label, cfg))
+            except (AttributeError, TypeError, ValueError) as e:
+                print(f"[targets] Ignoring invalid target definition '{label}': {e}")
+        return cls(version=version, records=tuple(records))
+
+    def pixel_rois(self, width: int, height: int) -> Tuple[Tuple[int, int, int, int], ...]:
+        """Pixel ROIs aligned with ``records`` for a frame of the given size"""
+        rois = self._pixel_rois.get((width, height))
+        if rois is None:
+            rois = tuple(rec.pixel_roi(width, height) for rec in self.records)
+            self._pixel_rois[(width, height)] = rois
+        return rois
+
+
+class TargetRegistry(dict):
+    """
+    Copy-on-write target registry.
+
+    Behaves like the plain dict TARGET_DEFINITIONS always was, but every mutation
+    bumps a revision, and snapshot() publishes a TargetSnapshot of frozen records
+    that is rebuilt at most once per revision. Readers never lock or copy on the
+    hot path; writers that change many entries should use replace_all() so the
+    change becomes visible in a single step.
+
+    Entries are copied when a snapshot is built: editing a nested config dict in
+    place is not seen until the entry is reassigned.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.RLock()
+        self._revision = 0
+        self._snapshot: Optional[TargetSnapshot] = None
+
+    def _mutated(self):
+        self._revision += 1
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self._mutated()
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+            self._mutated()
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._mutated()
+
+    def update(self, *args, **kwargs):
+        with self._lock:
+            super().update(*args, **kwargs)
+            self._mutated()
+
+    def pop(self, *args):
+        with self._lock:
+            value = super().pop(*args)
+            self._mutated()
+            return value
+
+    def popitem(self):
+        with self._lock:
+            item = super().popitem()
+            self._mutated()
+            return item
+
+    def setdefault(self, key, default=None):
+        with self._lock:
+            if key in self:
+                return self[key]
+            self[key] = default
+            return default
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def replace_all(self, definitions: Mapping[str, Mapping[str, Any]]):
+        """Atomically replace every definition (one revision bump)"""
+        with self._lock:
+            super().clear()
+            super().update(definitions)
+            self._mutated()
+
+    @property
+    def revision(self) -> int:
+        return self._revision
+
+    def snapshot(self) -> TargetSnapshot:
+        snap = self._snapshot
+        if snap is not None and snap.version == self._revision:
+            return snap
+        with self._lock:
+            snap = self._snapshot
+            if snap is None or snap.version != self._revision:
+                snap = TargetSnapshot.build(self, self._revision)
+                self._snapshot = snap
+            return snap
+
+
+TARGET_DEFINITIONS = TargetRegistry({
     "DAILY_BOOK_BUTTON": {
         "template": "game_automation/templates/daily_book_button.png",
         "method": "tm",
@@ -33,7 +196,7 @@ TARGET_DEFINITIONS = {
         "threshold": 0.86,
         "roi": [0.25, 0.72, 0.75, 0.93]
     },
-}
+})
 
 # Convert all built-in target template paths to absolute paths
 # This ensures cv2.imread() can correctly load the template images
@@ -46,6 +209,14 @@ _BUILTIN_TARGETS = set(TARGET_DEFINITIONS.keys())
 
 TARGETS_VERSION = 0
 
+
+def current_snapshot() -> TargetSnapshot:
+    """Snapshot of the current TARGET_DEFINITIONS (works even if it was replaced by a plain dict)"""
+    definitions = TARGET_DEFINITIONS
+    if isinstance(definitions, TargetRegistry):
+        return definitions.snapshot()
+    return TargetSnapshot.build(definitions, TARGETS_VERSION)
+
 def _load_resources_json():
     try:
         file_path = os.path.join(get_base_dir(), "resources.json")
@@ -95,6 +266,8 @@ def reload_targets_from_resources(override: bool = False, default_threshold: flo
     """
     global TARGETS_VERSION
     mapping = _load_resources_json()
+    # Edit a copy and publish it in one swap, so readers never see a half-applied reload
+    updated = dict(TARGET_DEFINITIONS)
     
     # Build set of keys that should be retained
     # Include all keys from resources.json plus built-in targets
@@ -111,14 +284,16 @@ def reload_targets_from_resources(override: bool = False, default_threshold: flo
             abs_path = to_absolute_path(path)
             
             # Check if target already exists
-            if name in TARGET_DEFINITIONS:
+            if name in updated:
                 # If override is True, always update
                 # If override is False, only update if the path has changed (to sync with resources.json)
-                existing_path = TARGET_DEFINITIONS[name].get("template", "")
+                existing_path = updated[name].get("template", "")
                 if override or existing_path != abs_path:
-                    # Update existing target (preserve method, threshold, roi if they exist, otherwise use defaults)
-                    existing_cfg = TARGET_DEFINITIONS[name]
-                    TARGET_DEFINITIONS[name] = {
+                    # Update existing target (preserve method, threshold, roi and any method options
+                    # such as pyramid_levels if they exist, otherwise use defaults)
+                    existing_cfg = updated[name]
+                    updated[name] = {
+                        **existing_cfg,
                         "template": abs_path,
                         "method": existing_cfg.get("method", "tm"),
                         "threshold": existing_cfg.get("threshold", default_threshold),
@@ -127,7 +302,7 @@ def reload_targets_from_resources(override: bool = False, default_threshold: flo
                     changed = True
             else:
                 # Create new target
-                TARGET_DEFINITIONS[name] = {
+                updated[name] = {
                     "template": abs_path,
                     "method": "tm",
                     "threshold": default_threshold,
@@ -137,7 +312,7 @@ def reload_targets_from_resources(override: bool = False, default_threshold: flo
     
     # Prune targets that are not in resources.json (if prune_missing is True)
     if prune_missing:
-        keys_to_remove = [key for key in TARGET_DEFINITIONS.keys() if key not in keys_to_keep]
+        keys_to_remove = [key for key in updated.keys() if key not in keys_to_keep]
         if keys_to_remove:
             # Get caller information for debugging
             import inspect
@@ -155,10 +330,11 @@ def reload_targets_from_resources(override: bool = False, default_threshold: flo
             print(f"[targets] Note: Non-persisted, programmatically added targets are unsupported and will be removed.")
             print(f"[targets] To preserve targets, add them to resources.json via ResourceSidebar.persist()")
         for key in keys_to_remove:
-            del TARGET_DEFINITIONS[key]
+            del updated[key]
             changed = True
     
     if changed:
+        TARGET_DEFINITIONS.replace_all(updated)
         TARGETS_VERSION += 1
     return changed
 
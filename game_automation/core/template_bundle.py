@@ -0,0 +1,162 @@
+"""
+Precompiled, memory-mapped template bundle.
+
+Decoding hundreds of PNGs with cv2 dominates cold start. A bundle stores every
+template as a raw grayscale array (plus its downscaled pyramid levels) in one
+binary blob, keyed by content digest, with a small JSON index:
+
+    <bundle dir>/templates.json              index (format, blob name, entries, sources)
+    <bundle dir>/templates-<id>.bin          raw uint8 arrays, each 64-byte aligned
+
+``sources`` maps each template path to the (mtime_ns, size, digest) it had when
+the bundle was built, so a loader can find a template's arrays from a stat()
+alone, without opening the PNG. Entries that no longer match are simply misses;
+TemplateMatcher then decodes the PNG and rebuilds the bundle in the background.
+
+Each build writes a new blob file and replaces the index atomically, so a
+bundle that is still memory-mapped (e.g. by another process) is never modified.
+"""
+import os
+import json
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from .path_utils import get_base_dir
+
+BUNDLE_FORMAT = 1
+BUNDLE_DIR_NAME = ".template_cache"
+INDEX_NAME = "templates.json"
+_ALIGN = 64
+
+# (abs path, mtime_ns, size, content digest, grayscale template)
+BundleSource = Tuple[str, int, int, str, np.ndarray]
+
+
+def default_bundle_dir() -> str:
+    return os.path.join(get_base_dir(), BUNDLE_DIR_NAME)
+
+
+class TemplateBundle:
+    def __init__(self, bundle_dir: str, index: dict, blob: np.ndarray):
+        self.bundle_dir = bundle_dir
+        self._entries: Dict[str, dict] = index.get("entries", {})
+        self._sources: Dict[str, list] = index.get("sources", {})
+        self._blob = blob
+
+    @classmethod
+    def load(cls, bundle_dir: Optional[str] = None) -> Optional["TemplateBundle"]:
+        """Memory-map the bundle in ``bundle_dir``; None if missing, unreadable or of another format"""
+        bundle_dir = bundle_dir or default_bundle_dir()
+        try:
+            with open(os.path.join(bundle_dir, INDEX_NAME), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("format") != BUNDLE_FORMAT:
+                return None
+            blob_path = os.path.join(bundle_dir, index["blob"])
+            if os.path.getsize(blob_path) == 0:
+                blob = np.zeros(0, dtype=np.uint8)
+            else:
+                blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+            return cls(bundle_dir, index, blob)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, path: str, mtime_ns: int, size: int) -> Optional[str]:
+        """Content digest of ``path`` if the bundle was built from the file in its current state"""
+        source = self._sources.get(path)
+        if source and source[0] == mtime_ns and source[1] == size and source[2] in self._entries:
+            return source[2]
+        return None
+
+    def covers(self, sources: Iterable[Tuple[str, int, int, str]]) -> bool:
+        """True if the bundle was built from exactly these (path, mtime_ns, size, digest) files"""
+        current = {path: [mtime_ns, size, digest] for path, mtime_ns, size, digest in sources}
+        return current == self._sources and all(digest in self._entries for _, _, digest in current.values())
+
+    def _view(self, offset: int, shape) -> np.ndarray:
+        h, w = shape
+        return self._blob[offset:offset + h * w].reshape(h, w)
+
+    def template(self, digest: str) -> Optional[np.ndarray]:
+        """Read-only, memory-mapped template array for ``digest``"""
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        return self._view(entry["offset"], entry["shape"])
+
+    def pyramid(self, digest: str) -> List[np.ndarray]:
+        """Precomputed downscaled levels for ``digest`` (level 1 first)"""
+        entry = self._entries.get(digest)
+        if entry is None:
+            return []
+        return [self._view(offset, shape) for offset, shape in entry.get("levels", [])]
+
+
+def write_bundle(sources: Iterable[BundleSource], bundle_dir: Optional[str] = None, pyramid: Optional[Callable[[np.ndarray], List[np.ndarray]]] = None) -> Optional[TemplateBundle]:
+    """
+    Build a bundle from already-decoded templates and publish it atomically.
+
+    Args:
+        sources: (abs path, mtime_ns, size, digest, grayscale array) per template file
+        bundle_dir: Target directory (default: <project root>/.template_cache)
+        pyramid: Returns the downscaled levels to store for a template (default: none)
+
+    Returns:
+        The freshly written bundle (memory-mapped), or None if it could not be written.
+    """
+    bundle_dir = bundle_dir or default_bundle_dir()
+    entries: Dict[str, dict] = {}
+    source_index: Dict[str, list] = {}
+    chunks: List[np.ndarray] = []
+    offset = 0
+
+    def _append(arr: np.ndarray) -> int:
+        nonlocal offset
+        start = offset
+        data = np.ascontiguousarray(arr, dtype=np.uint8).ravel()
+        chunks.append(data)
+        offset += data.size
+        pad = (-offset) % _ALIGN
+        if pad:
+            chunks.append(np.zeros(pad, dtype=np.uint8))
+            offset += pad
+        return start
+
+    for path, mtime_ns, size, digest, img in sources:
+        source_index[path] = [int(mtime_ns), int(size), digest]
+        if digest in entries or img is None or img.ndim != 2:
+            continue
+        entry = {"offset": _append(img), "shape": list(img.shape[:2]), "levels": []}
+        for level in (pyramid(img) if pyramid else []):
+            entry["levels"].append([_append(level), list(level.shape[:2])])
+        entries[digest] = entry
+
+    blob_name = f"templates-{uuid.uuid4().hex[:12]}.bin"
+    index = {"format": BUNDLE_FORMAT, "blob": blob_name, "entries": entries, "sources": source_index}
+    try:
+        os.makedirs(bundle_dir, exist_ok=True)
+        with open(os.path.join(bundle_dir, blob_name), "wb") as f:
+            for chunk in chunks:
+                f.write(chunk.tobytes())
+        tmp_index = os.path.join(bundle_dir, f"{INDEX_NAME}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_index, os.path.join(bundle_dir, INDEX_NAME))
+    except OSError as e:
+        print(f"[template_bundle] Failed to write bundle to {bundle_dir}: {e}")
+        return None
+    _remove_stale_blobs(bundle_dir, keep=blob_name)
+    return TemplateBundle.load(bundle_dir)
+
+
+def _remove_stale_blobs(bundle_dir: str, keep: str):
+    for name in os.listdir(bundle_dir):
+        if name.startswith("templates-") and name.endswith(".bin") and name != keep:
+            try:
+                os.remove(os.path.join(bundle_dir, name))
+            except OSError:
+                # Still mapped elsewhere (e.g. on Windows); removed by a later build
+                pass
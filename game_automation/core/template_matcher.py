@@ -1,83 +1,689 @@
-from typing import Dict, List, Tuple, Any
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Any
 import cv2
 import numpy as np
 from . import targets
-from .path_utils import to_absolute_path
+from .targets import TargetRecord
+from .change_detector import ChangeDetector
+from .template_bundle import TemplateBundle, write_bundle
+from .tracer import get_tracer
 
 
 Detection = Dict[str, Any]
 
+# "pyramid" method: templates are never downscaled below this many pixels per side
+PYRAMID_MIN_TEMPLATE_SIDE = 8
+PYRAMID_MAX_LEVELS = 3
+# Extra full-resolution pixels searched around the upscaled coarse hit
+PYRAMID_REFINE_MARGIN = 4
+# Coarse scores are lower than full-resolution ones; skip refinement only when the
+# coarse peak is this far below the target threshold
+PYRAMID_COARSE_SLACK = 0.25
+
+# Tracking: pixels searched around the last hit before falling back to the full ROI
+TRACK_SEARCH_MARGIN = 16
+# Frames between forced full-ROI sweeps while a label is being tracked
+TRACK_SWEEP_INTERVAL = 10
+
+# Multi-instance targets ("max_instances" > 1): default IoU above which a weaker peak
+# is suppressed as a duplicate of a stronger one
+NMS_IOU_THRESHOLD = 0.3
+
+# Weight of the newest sample in each label's running match-time estimate
+MATCH_TIME_SMOOTHING = 0.2
+
+# Reloads that need to read more template files than this run on a background
+# thread; matching keeps using the previous templates until the new set is swapped in
+BACKGROUND_RELOAD_MIN = 8
+
+# OpenCV's thread count is process-wide, so matchers with a worker pool share one
+# setting: id(matcher) -> pool size, and the value saved before the first pool
+_cv_threads_lock = threading.Lock()
+_cv_thread_claims: Dict[int, int] = {}
+_cv_threads_before: Optional[int] = None
+
+
+def _claim_cv_threads(owner: int, workers: int):
+    """
+    Record that ``owner`` matches on ``workers`` pool threads (0: none) and limit
+    OpenCV to cpu_count // (all pool threads); the saved setting is restored once
+    no matcher has a pool.
+    """
+    global _cv_threads_before
+    with _cv_threads_lock:
+        if workers:
+            if not _cv_thread_claims:
+                _cv_threads_before = cv2.getNumThreads()
+            _cv_thread_claims[owner] = workers
+        elif _cv_thread_claims.pop(owner, None) is None:
+            return
+        if _cv_thread_claims:
+            cv2.setNumThreads(max(1, (os.cpu_count() or 1) // sum(_cv_thread_claims.values())))
+        elif _cv_threads_before is not None:
+            cv2.setNumThreads(_cv_threads_before)
+            _cv_threads_before = None
+
+
+@dataclass(frozen=True)
+class TrackState:
+    label: str
+    bbox: Tuple[int, int, int, int]  # Last detected bbox (frame pixels)
+    confidence: float  # Confidence of the last detection
+    age: int = 0  # Frames since the label was last detected (0: seen in the latest frame)
+    hits: int = 1  # Consecutive frames the label was detected
+    sweep_age: int = 0  # Frames since the last full-ROI search
+    frame_index: int = 0  # Matcher frame counter at the last update
+
 
 class TemplateMatcher:
-    def __init__(self):
+    def __init__(self, workers: int = 0, bundle_dir: Optional[str] = None):
         self.templates: Dict[str, np.ndarray] = {}
         self.template_sizes: Dict[str, Tuple[int, int]] = {}
         self._targets_version_loaded: int = -1
+        # Labels to match; None matches every loaded template
+        self._active_labels: Optional[FrozenSet[str]] = None
+        # label -> (full-resolution template, [level 1, level 2, ...] downscaled templates)
+        self._pyramids: Dict[str, Tuple[np.ndarray, List[np.ndarray]]] = {}
+        # Optional worker pool for matching templates concurrently (cv2 releases the GIL)
+        self._workers = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # Per-label track state; matching first searches near the last hit
+        self.tracking_enabled: bool = True
+        self._tracks: Dict[str, TrackState] = {}
+        # Guards _tracks and _pyramids, which pool workers update while other threads read them
+        self._state_lock = threading.Lock()
+        self._frame_index = 0
+        # (shape, origin, full frame size) of the last matched frame; tracks reset when it changes
+        self._frame_geometry: Optional[Tuple] = None
+        self._origin: Tuple[int, int] = (0, 0)
+        # Change-detection reuse: label -> (record, template, frame seq matched at, detections),
+        # plus counters and a running estimate of each label's match time
+        self._reusable: Dict[str, Tuple[TargetRecord, np.ndarray, int, List[Detection]]] = {}
+        self._match_ms: Dict[str, float] = {}
+        self.targets_matched = 0
+        self.targets_reused = 0
+        self.saved_ms = 0.0
+        # label -> match time (ms) of the targets actually matched in the last match() call
+        self.last_match_ms: Dict[str, float] = {}
+        # Incremental reload state: label -> (abs path, mtime_ns, size, content digest),
+        # and decoded templates by content digest
+        self._sources: Dict[str, Tuple[str, int, int, str]] = {}
+        self._by_digest: Dict[str, np.ndarray] = {}
+        self._reload_lock = threading.Lock()
+        self._reload_thread: Optional[threading.Thread] = None
+        self.last_reload_stats: Dict[str, int] = {}
+        # Optional precompiled template bundle (see template_bundle); templates found in it
+        # are memory-mapped instead of decoded, and it is rebuilt after any decode
+        self._bundle_dir = bundle_dir
+        self._bundle: Optional[TemplateBundle] = TemplateBundle.load(bundle_dir) if bundle_dir else None
+        self._bundle_lock = threading.Lock()
+        self._bundle_thread: Optional[threading.Thread] = None
+        self._bundle_pending = False
+        # The initial load always completes before the matcher is used
+        self._allow_background_reload = False
         self._load_templates()
+        self._allow_background_reload = True
+        self.set_workers(workers)
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    def set_workers(self, workers: int):
+        """
+        Match templates on a pool of ``workers`` threads (0 or 1: serial on the caller's thread).
+
+        While any matcher's pool is active, OpenCV's own threading is limited to
+        cpu_count // (pool threads of all matchers) so the pools and cv2's internal
+        parallelism don't oversubscribe the cores; the previous setting is restored
+        when the last pool is turned off. Results keep TARGET_DEFINITIONS order either way.
+        """
+        workers = max(0, int(workers))
+        if workers == 1:
+            workers = 0
+        with self._pool_lock:
+            if workers == self._workers:
+                return
+            old_pool = self._pool
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="TemplateMatcher") if workers else None
+            self._workers = workers
+            _claim_cv_threads(id(self), workers)
+        if old_pool is not None:
+            old_pool.shutdown(wait=False)
+
+    def get_track(self, label: str) -> Optional[TrackState]:
+        """Track state of ``label`` (None if it has never been detected)"""
+        return self._tracks.get(label)
+
+    def tracks(self) -> Dict[str, TrackState]:
+        """Snapshot of every label's track state (bboxes in full-frame pixels)"""
+        ox, oy = self._origin
+        with self._state_lock:
+            tracks = dict(self._tracks)
+        if not (ox or oy):
+            return tracks
+        return {label: replace(track, bbox=_offset_bbox(track.bbox, ox, oy)) for label, track in tracks.items()}
+
+    def reset_tracks(self):
+        with self._state_lock:
+            self._tracks = {}
+
+    def _set_track(self, label: str, track: TrackState):
+        with self._state_lock:
+            self._tracks[label] = track
+
+    def close(self):
+        """Stop the worker pool (if any) and restore OpenCV's thread setting"""
+        self.set_workers(0)
+
+    @property
+    def active_labels(self) -> Optional[FrozenSet[str]]:
+        return self._active_labels
+
+    def set_active_labels(self, labels: Optional[Iterable[str]]):
+        """
+        Restrict matching to ``labels`` (None re-enables every template).
+
+        Templates outside the active set are skipped entirely in match(), so a
+        running script only pays for the labels it can actually read.
+        """
+        self._active_labels = None if labels is None else frozenset(labels)
 
     def _load_templates(self):
-        self.templates.clear()
-        self.template_sizes.clear()
-        # Create a snapshot to avoid "dictionary changed size during iteration" error
-        # when TARGET_DEFINITIONS is modified in another thread
-        target_items = list(targets.TARGET_DEFINITIONS.items())
-        for label, cfg in target_items:
-            path = cfg["template"]
-            # Ensure path is absolute (cv2.imread needs absolute paths)
-            abs_path = to_absolute_path(path)
-            img = cv2.imread(abs_path, cv2.IMREAD_GRAYSCALE)
-            if img is None:
+        """
+        Bring the loaded templates in line with TARGET_DEFINITIONS.
+
+        Only templates whose file changed (path, mtime or size) are re-read, and a
+        re-read file whose content digest is already loaded is not decoded again.
+        With a template bundle, a changed file the bundle was built from is mapped
+        from the bundle (with its pyramid levels) instead of being read at all.
+        Unchanged templates keep their arrays (and cached pyramids/tracks). When
+        many files must be read, the reload runs on a background thread and the
+        new template set is swapped in atomically once complete.
+        """
+        with self._reload_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                # The running reload re-checks TARGETS_VERSION before it finishes
+                return
+            # Version first: an edit landing after it bumps the version again and is reloaded next time
+            version = getattr(targets, "TARGETS_VERSION", 0)
+            records = targets.current_snapshot().records
+            if self._allow_background_reload and len(self._stale_labels(records)) > BACKGROUND_RELOAD_MIN:
+                self._reload_thread = threading.Thread(target=self._background_reload, name="TemplateReload", daemon=True)
+                self._reload_thread.start()
+                return
+            # Few files: reload here, under the lock so a background reload cannot start meanwhile
+            self._reload(records, version)
+
+    def wait_for_reload(self, timeout: Optional[float] = None) -> bool:
+        """Block until a running background reload finishes; returns False on timeout"""
+        thread = self._reload_thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def _background_reload(self):
+        while True:
+            version = getattr(targets, "TARGETS_VERSION", 0)
+            try:
+                self._reload(targets.current_snapshot().records, version)
+            except Exception as e:
+                print(f"[TemplateMatcher] Background template reload failed: {e}")
+                return
+            if getattr(targets, "TARGETS_VERSION", 0) == version:
+                return
+
+    @staticmethod
+    def _file_key(record: TargetRecord) -> Optional[Tuple[str, int, int]]:
+        try:
+            st = os.stat(record.template)
+        except (OSError, ValueError):
+            return None
+        return record.template, st.st_mtime_ns, st.st_size
+
+    def _stale_labels(self, records: Iterable[TargetRecord]) -> List[str]:
+        """Labels whose template file must be (re-)read"""
+        stale = []
+        for record in records:
+            key = self._file_key(record)
+            source = self._sources.get(record.label)
+            if key is not None and (source is None or source[:3] != key or record.label not in self.templates):
+                if self._bundle is None or self._bundle.lookup(*key) is None:
+                    stale.append(record.label)
+        return stale
+
+    def _read_template(self, abs_path: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        try:
+            with open(abs_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None, None
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        img = self._by_digest.get(digest)
+        if img is None:
+            img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        return digest, img
+
+    def _reload(self, records: Iterable[TargetRecord], version: int):
+        old_templates = self.templates
+        old_sources = self._sources
+        templates: Dict[str, np.ndarray] = {}
+        sizes: Dict[str, Tuple[int, int]] = {}
+        sources: Dict[str, Tuple[str, int, int, str]] = {}
+        by_digest: Dict[str, np.ndarray] = {}
+        mapped_pyramids: Dict[str, Tuple[np.ndarray, List[np.ndarray]]] = {}
+        bundle = self._bundle
+        read = mapped = 0
+        for record in records:
+            label = record.label
+            key = self._file_key(record)
+            if key is None:
                 continue
-            self.templates[label] = img
+            source = old_sources.get(label)
+            bundled = bundle.lookup(*key) if bundle is not None else None
+            if source is not None and source[:3] == key and label in old_templates:
+                digest, img = source[3], old_templates[label]
+            elif bundled is not None:
+                mapped += 1
+                digest = bundled
+                img = by_digest.get(digest)
+                if img is None:
+                    img = bundle.template(digest)
+                    mapped_pyramids[label] = (img, bundle.pyramid(digest))
+            else:
+                read += 1
+                digest, img = self._read_template(key[0])
+                if img is None:
+                    continue
+            templates[label] = img
             h, w = img.shape[:2]
-            self.template_sizes[label] = (w, h)
-        self._targets_version_loaded = getattr(targets, "TARGETS_VERSION", 0)
+            sizes[label] = (w, h)
+            sources[label] = (*key, digest)
+            by_digest[digest] = img
+        changed = {label for label, img in old_templates.items() if templates.get(label) is not img}
+        # Publish complete dicts in one step; match() snapshots self.templates once per frame
+        self.template_sizes = sizes
+        self.templates = templates
+        self._sources = sources
+        self._by_digest = by_digest
+        with self._state_lock:
+            pyramids = {label: cached for label, cached in self._pyramids.items() if label not in changed}
+            pyramids.update(mapped_pyramids)
+            self._pyramids = pyramids
+            if changed:
+                self._tracks = {label: track for label, track in self._tracks.items() if label not in changed}
+        self._targets_version_loaded = version
+        self.last_reload_stats = {
+            "read": read,
+            "mapped": mapped,
+            "reused": len(templates) - read - mapped,
+            "removed": len(set(old_templates) - set(templates)),
+        }
+        if self._bundle_dir and (bundle is None or not bundle.covers(sources.values())):
+            self._schedule_bundle_build()
+
+    def _schedule_bundle_build(self):
+        with self._bundle_lock:
+            if self._bundle_thread is not None and self._bundle_thread.is_alive():
+                # The running build picks up the newer template set before it exits
+                self._bundle_pending = True
+                return
+            self._bundle_pending = False
+            self._bundle_thread = threading.Thread(target=self._bundle_worker, name="TemplateBundle", daemon=True)
+            self._bundle_thread.start()
+
+    def _bundle_worker(self):
+        while True:
+            try:
+                self.write_bundle()
+            except Exception as e:
+                print(f"[TemplateMatcher] Template bundle build failed: {e}")
+                return
+            with self._bundle_lock:
+                if not self._bundle_pending:
+                    return
+                self._bundle_pending = False
 
-    def match(self, gray_frame: np.ndarray) -> List[Detection]:
+    def wait_for_bundle(self, timeout: Optional[float] = None) -> bool:
+        """Block until a running bundle build finishes; returns False on timeout"""
+        thread = self._bundle_thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    @property
+    def bundle(self) -> Optional[TemplateBundle]:
+        """The template bundle built from exactly the loaded template files (None if there is none)"""
+        bundle = self._bundle
+        if bundle is None or not bundle.covers(self._sources.values()):
+            return None
+        return bundle
+
+    def write_bundle(self) -> Optional[TemplateBundle]:
+        """
+        Write the currently loaded templates (and their pyramid levels) to the
+        template bundle so the next start maps them instead of decoding PNGs.
+        """
+        if not self._bundle_dir:
+            return None
+        templates = self.templates
+        entries = [(path, mtime_ns, size, digest, templates[label])
+                   for label, (path, mtime_ns, size, digest) in self._sources.items() if label in templates]
+        bundle = write_bundle(entries, self._bundle_dir, build_pyramid)
+        if bundle is not None:
+            self._bundle = bundle
+        return bundle
+
+    def match(self, gray_frame: np.ndarray, origin: Tuple[int, int] = (0, 0), frame_size: Optional[Tuple[int, int]] = None, changes: Optional[ChangeDetector] = None) -> List[Detection]:
+        """
+        Match the active targets in ``gray_frame``.
+
+        Args:
+            gray_frame: Gray frame, or a crop of the full frame (see capture_crop)
+            origin: Position (x, y) of the crop's top-left corner in the full frame
+            frame_size: Full frame (width, height); ROIs are relative to it (default: the frame's own size)
+            changes: ChangeDetector already updated with ``gray_frame``; targets whose ROI did
+                not change since they were last matched reuse their previous detections
+
+        Returns:
+            Detections with bboxes in full-frame pixels.
+        """
         detections: List[Detection] = []
-        H, W = gray_frame.shape[:2]
         try:
             if self._targets_version_loaded != getattr(targets, "TARGETS_VERSION", 0):
                 self._load_templates()
         except Exception:
             pass
 
-        # Create a snapshot to avoid "dictionary changed size during iteration" error
-        # when TARGET_DEFINITIONS is modified in another thread (e.g., when
-        # templates are added/removed via reload_targets_from_resources)
-        target_items = list(targets.TARGET_DEFINITIONS.items())
-        for label, cfg in target_items:
-            if label not in self.templates:
-                continue
+        # Lock-free, immutable view of the targets; pixel ROIs are cached per frame size
+        snapshot = targets.current_snapshot()
+        H, W = gray_frame.shape[:2]
+        ox, oy = origin
+        full_w, full_h = frame_size or (W, H)
+        pixel_rois = snapshot.pixel_rois(full_w, full_h)
+        if (ox, oy, full_w, full_h) != (0, 0, W, H):
+            # Cropped frame: match in crop pixels, ROIs clipped to the crop
+            pixel_rois = tuple((max(0, x1 - ox), max(0, y1 - oy), min(W, x2 - ox), min(H, y2 - oy)) for x1, y1, x2, y2 in pixel_rois)
+        geometry = (gray_frame.shape, ox, oy, full_w, full_h)
+        if geometry != self._frame_geometry:
+            # Tracked bboxes are meaningless at another resolution or crop
+            self._frame_geometry = geometry
+            self._origin = (ox, oy)
+            self.reset_tracks()
+            self._reusable = {}
+        self._frame_index += 1
+        active = self._active_labels
+        templates = self.templates
+        jobs = [(record, roi, templates[record.label]) for record, roi in zip(snapshot.records, pixel_rois)
+                if record.label in templates and (active is None or record.label in active)]
+        reused: Dict[str, List[Detection]] = {}
+        if changes is not None:
+            reused = self._reusable_detections(jobs, changes)
+            if reused:
+                jobs = [job for job in jobs if job[0].label not in reused]
+        seq = changes.seq if changes is not None else 0
+        pool = self._pool
+        if pool is not None and len(jobs) > 1:
+            # map() yields in submission order, so results stay deterministic
+            results = pool.map(lambda job: self._timed_match(job[0], job[1], gray_frame, job[2]), jobs)
+        else:
+            results = (self._timed_match(record, roi, gray_frame, tmpl) for record, roi, tmpl in jobs)
+        # Workers only return their results; the bookkeeping happens here, on the calling thread
+        matched: Dict[str, List[Detection]] = {}
+        last_match_ms: Dict[str, float] = {}
+        for (record, roi, tmpl), (dets, ms) in zip(jobs, results):
+            label = record.label
+            matched[label] = dets
+            last_match_ms[label] = ms
+            previous = self._match_ms.get(label)
+            self._match_ms[label] = ms if previous is None else previous + MATCH_TIME_SMOOTHING * (ms - previous)
+            if seq:
+                self._reusable[label] = (record, tmpl, seq, dets)
+        self.targets_matched += len(matched)
+        self.last_match_ms = last_match_ms
+        for record in snapshot.records:
+            dets = matched.get(record.label)
+            if dets is None:
+                dets = reused.get(record.label)
+            if dets:
+                detections.extend(dets)
+        if ox or oy:
+            detections = [dict(det, bbox=_offset_bbox(det["bbox"], ox, oy)) for det in detections]
+        return detections
 
-            tmpl = self.templates[label]
-            tw, th = self.template_sizes[label]
-
-            roi = cfg.get("roi", [0.0, 0.0, 1.0, 1.0])
-            x_min = int(roi[0] * W)
-            y_min = int(roi[1] * H)
-            x_max = int(roi[2] * W)
-            y_max = int(roi[3] * H)
-
-            x_min = max(0, x_min)
-            y_min = max(0, y_min)
-            x_max = min(W, x_max)
-            y_max = min(H, y_max)
-            if x_max - x_min < tw or y_max - y_min < th:
+    def _reusable_detections(self, jobs, changes: ChangeDetector) -> Dict[str, List[Detection]]:
+        """Previous detections of the targets in ``jobs`` whose ROI did not change since they were matched"""
+        reused = {}
+        frame_index = self._frame_index
+        for record, roi, tmpl in jobs:
+            entry = self._reusable.get(record.label)
+            # Records of an unchanged registry are the same objects; equal ones (e.g. a plain dict registry) qualify too
+            if entry is None or (entry[0] is not record and entry[0] != record) or entry[1] is not tmpl or changes.changed_since(roi, entry[2]):
                 continue
+            reused[record.label] = entry[3]
+            track = self._tracks.get(record.label)
+            if track is not None and track.frame_index == frame_index - 1:
+                # Carry the track forward as if the label had been matched in this frame
+                self._set_track(record.label, replace(track, frame_index=frame_index))
+        self.targets_reused += len(reused)
+        self.saved_ms += sum(self._match_ms.get(label, 0.0) for label in reused)
+        return reused
+
+    def _timed_match(self, record: TargetRecord, roi: Tuple[int, int, int, int], gray_frame: np.ndarray, tmpl: np.ndarray) -> Tuple[List[Detection], float]:
+        """(detections, match time in ms) of one target; may run on a pool worker"""
+        t0 = time.perf_counter()
+        dets = self._match_target(record, roi, gray_frame, tmpl)
+        t1 = time.perf_counter()
+        get_tracer().complete(f"match:{record.label}", "matcher", t0, t1)
+        return dets, (t1 - t0) * 1000.0
+
+    def reuse_stats(self) -> Dict[str, float]:
+        """Targets matched vs. reused through change detection, and the estimated match time saved"""
+        return {"matched": self.targets_matched, "reused": self.targets_reused, "saved_ms": self.saved_ms}
 
-            roi_img = gray_frame[y_min:y_max, x_min:x_max]
+    def _match_target(self, record: TargetRecord, roi: Tuple[int, int, int, int], gray_frame: np.ndarray, tmpl: np.ndarray) -> List[Detection]:
+        """
+        Match one target inside its ROI.
+
+        Returns the best detection above threshold, or for targets with
+        ``max_instances`` > 1 up to that many non-overlapping detections
+        (strongest first, each tagged with its ``instance`` rank).
+        """
+        label = record.label
+        th, tw = tmpl.shape[:2]
+        x_min, y_min, x_max, y_max = roi
+        if x_max - x_min < tw or y_max - y_min < th:
+            return []
+
+        threshold = record.threshold
+        if record.max_instances > 1:
+            return self._match_instances(record, tmpl, gray_frame[y_min:y_max, x_min:x_max], (x_min, y_min))
+        frame_index = self._frame_index
+        track = self._tracks.get(label) if self.tracking_enabled and record.track else None
+        if track is not None and track.frame_index == frame_index - 1 and track.age == 0 and track.sweep_age + 1 < TRACK_SWEEP_INTERVAL:
+            # Seen in the previous frame: search a small window around the last hit first
+            bx1, by1, bx2, by2 = track.bbox
+            wx1 = max(x_min, bx1 - TRACK_SEARCH_MARGIN)
+            wy1 = max(y_min, by1 - TRACK_SEARCH_MARGIN)
+            wx2 = min(x_max, bx2 + TRACK_SEARCH_MARGIN)
+            wy2 = min(y_max, by2 + TRACK_SEARCH_MARGIN)
+            if wx2 - wx1 >= tw and wy2 - wy1 >= th:
+                res = cv2.matchTemplate(gray_frame[wy1:wy2, wx1:wx2], tmpl, cv2.TM_CCOEFF_NORMED)
+                _, max_val, _, max_loc = cv2.minMaxLoc(res)
+                if max_val >= threshold:
+                    det = self._detection(label, (max_loc[0] + wx1, max_loc[1] + wy1), tw, th, max_val)
+                    self._set_track(label, replace(track, bbox=det["bbox"], confidence=det["confidence"], hits=track.hits + 1, sweep_age=track.sweep_age + 1, frame_index=frame_index))
+                    return [det]
+
+        roi_img = gray_frame[y_min:y_max, x_min:x_max]
+        if record.method == "pyramid":
+            max_val, max_loc = self._match_pyramid(label, tmpl, roi_img, record.pyramid_levels, threshold)
+        else:
             res = cv2.matchTemplate(roi_img, tmpl, cv2.TM_CCOEFF_NORMED)
             min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
 
-            threshold = cfg.get("threshold", 0.85)
-            if max_val >= threshold:
-                top_left = (max_loc[0] + x_min, max_loc[1] + y_min)
-                bottom_right = (top_left[0] + tw, top_left[1] + th)
-                detections.append({
-                    "label": label,
-                    "bbox": (top_left[0], top_left[1], bottom_right[0], bottom_right[1]),
-                    "confidence": float(max_val),
-                })
+        if max_val < threshold:
+            if track is not None:
+                self._set_track(label, replace(track, age=track.age + 1, hits=0, sweep_age=0, frame_index=frame_index))
+            return []
+        det = self._detection(label, (max_loc[0] + x_min, max_loc[1] + y_min), tw, th, max_val)
+        if self.tracking_enabled:
+            previous = self._tracks.get(label)
+            hits = previous.hits + 1 if previous is not None and previous.age == 0 and previous.frame_index == frame_index - 1 else 1
+            self._set_track(label, TrackState(label=label, bbox=det["bbox"], confidence=det["confidence"], hits=hits, frame_index=frame_index))
+        return [det]
+
+    def _match_instances(self, record: TargetRecord, tmpl: np.ndarray, roi_img: np.ndarray, origin: Tuple[int, int]) -> List[Detection]:
+        """Every instance of a multi-instance target in its ROI (always a full-resolution scan)"""
+        label = record.label
+        th, tw = tmpl.shape[:2]
+        res = cv2.matchTemplate(roi_img, tmpl, cv2.TM_CCOEFF_NORMED)
+        nms_iou = record.nms_iou if record.nms_iou is not None else NMS_IOU_THRESHOLD
+        peaks = extract_peaks(res, record.threshold, tw, th, record.max_instances, nms_iou)
+        detections = []
+        for rank, (x, y, score) in enumerate(peaks):
+            det = self._detection(label, (x + origin[0], y + origin[1]), tw, th, score)
+            det["instance"] = rank
+            detections.append(det)
+        if self.tracking_enabled and detections:
+            # Track the strongest instance so the label still has a stable position
+            best = detections[0]
+            self._set_track(label, TrackState(label=label, bbox=best["bbox"], confidence=best["confidence"], frame_index=self._frame_index))
         return detections
 
+    @staticmethod
+    def _detection(label: str, top_left: Tuple[int, int], tw: int, th: int, score: float) -> Detection:
+        return {
+            "label": label,
+            "bbox": (top_left[0], top_left[1], top_left[0] + tw, top_left[1] + th),
+            "confidence": float(score),
+        }
+
+    def _template_pyramid(self, label: str, levels: Optional[int], tmpl: Optional[np.ndarray] = None) -> List[np.ndarray]:
+        """Downscaled templates for ``label`` (cached until the template changes)"""
+        if tmpl is None:
+            tmpl = self.templates[label]
+        cached = self._pyramids.get(label)
+        if cached is None or cached[0] is not tmpl:
+            cached = (tmpl, build_pyramid(tmpl))
+            with self._state_lock:
+                self._pyramids[label] = cached
+        pyramid = cached[1]
+        if levels is not None:
+            pyramid = pyramid[:max(0, int(levels))]
+        return pyramid
+
+    def _match_pyramid(self, label: str, tmpl: np.ndarray, roi_img: np.ndarray, levels: Optional[int], threshold: float) -> Tuple[float, Tuple[int, int]]:
+        """
+        Coarse-to-fine match: locate the peak at the coarsest pyramid level, then
+        re-run TM_CCOEFF_NORMED at full resolution in a small window around it.
+
+        The returned score is always the full-resolution one, so the target's
+        threshold means the same thing as with the "tm" method.
+        """
+        th, tw = tmpl.shape[:2]
+        pyramid = self._template_pyramid(label, levels, tmpl)
+        # Stop early when the ROI gets too small for the coarse template
+        roi_levels = [roi_img]
+        for level_tmpl in pyramid:
+            down = cv2.pyrDown(roi_levels[-1])
+            if down.shape[0] < level_tmpl.shape[0] or down.shape[1] < level_tmpl.shape[1]:
+                break
+            roi_levels.append(down)
+        level = len(roi_levels) - 1
+        if level == 0:
+            res = cv2.matchTemplate(roi_img, tmpl, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+            return max_val, max_loc
+
+        res = cv2.matchTemplate(roi_levels[level], pyramid[level - 1], cv2.TM_CCOEFF_NORMED)
+        _, coarse_val, _, coarse_loc = cv2.minMaxLoc(res)
+        if coarse_val < threshold - PYRAMID_COARSE_SLACK:
+            return coarse_val, (coarse_loc[0] << level, coarse_loc[1] << level)
+
+        scale = 1 << level
+        margin = scale + PYRAMID_REFINE_MARGIN
+        rh, rw = roi_img.shape[:2]
+        x0 = max(0, coarse_loc[0] * scale - margin)
+        y0 = max(0, coarse_loc[1] * scale - margin)
+        x1 = min(rw, coarse_loc[0] * scale + tw + margin)
+        y1 = min(rh, coarse_loc[1] * scale + th + margin)
+        window = roi_img[y0:y1, x0:x1]
+        res = cv2.matchTemplate(window, tmpl, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        return max_val, (max_loc[0] + x0, max_loc[1] + y0)
+
+
+def _offset_bbox(bbox: Tuple[int, int, int, int], dx: int, dy: int) -> Tuple[int, int, int, int]:
+    x1, y1, x2, y2 = bbox
+    return (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+
+
+def build_pyramid(tmpl: np.ndarray) -> List[np.ndarray]:
+    """Downscaled levels of ``tmpl`` for the "pyramid" method (level 1 first)"""
+    pyramid: List[np.ndarray] = []
+    level_img = tmpl
+    while len(pyramid) < PYRAMID_MAX_LEVELS and min(level_img.shape[:2]) // 2 >= PYRAMID_MIN_TEMPLATE_SIDE:
+        level_img = cv2.pyrDown(level_img)
+        pyramid.append(level_img)
+    return pyramid
+
+
+def extract_peaks(res: np.ndarray, threshold: float, tw: int, th: int, max_instances: int, iou_threshold: float = NMS_IOU_THRESHOLD) -> List[Tuple[int, int, float]]:
+    """
+    Extract up to ``max_instances`` non-overlapping peaks from a matchTemplate response map.
+
+    Candidates are the 3x3 local maxima at or above ``threshold``: the threshold
+    mask and its coordinates come from OpenCV, and the local-maximum test only
+    looks at the 8 neighbours of those candidates, so the cost stays close to a
+    single pass over the map even at 4K. Greedy NMS then keeps the strongest
+    candidate and suppresses every weaker one whose ``tw`` x ``th`` box
+    overlaps it by more than ``iou_threshold``, vectorized over all remaining
+    candidates per kept peak.
+
+    Returns:
+        List of (x, y, score) top-left positions in ``res`` coordinates, strongest first.
+    """
+    if max_instances <= 0:
+        return []
+    res = np.ascontiguousarray(res, dtype=np.float32)
+    mask = cv2.compare(res, float(threshold), cv2.CMP_GE)
+    if cv2.countNonZero(mask) == 0:
+        return []
+    coords = cv2.findNonZero(mask).reshape(-1, 2)
+    xs, ys = coords[:, 0].astype(np.int64), coords[:, 1].astype(np.int64)
+    scores = res[ys, xs]
+    h, w = res.shape[:2]
+    is_peak = np.ones(len(scores), dtype=bool)
+    for dy in (-1, 0, 1):
+        ny = np.clip(ys + dy, 0, h - 1)
+        for dx in (-1, 0, 1):
+            if dx or dy:
+                is_peak &= scores >= res[ny, np.clip(xs + dx, 0, w - 1)]
+    xs, ys, scores = xs[is_peak], ys[is_peak], scores[is_peak]
+    order = np.argsort(-scores, kind="stable")
+    xs, ys, scores = xs[order], ys[order], scores[order]
+
+    area = float(tw * th)
+    suppressed = np.zeros(len(scores), dtype=bool)
+    peaks: List[Tuple[int, int, float]] = []
+    for i in range(len(scores)):
+        if suppressed[i]:
+            continue
+        peaks.append((int(xs[i]), int(ys[i]), float(scores[i])))
+        if len(peaks) >= max_instances:
+            break
+        # Boxes share the template size, so the intersection only depends on the offsets
+        ix = np.clip(tw - np.abs(xs[i + 1:] - xs[i]), 0, None)
+        iy = np.clip(th - np.abs(ys[i + 1:] - ys[i]), 0, None)
+        inter = (ix * iy).astype(np.float64)
+        suppressed[i + 1:] |= inter / (2.0 * area - inter) > iou_threshold
+    return peaks
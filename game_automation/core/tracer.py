@@ -0,0 +1,162 @@
+"""
+Lightweight span tracing with Chrome trace / Perfetto export.
+
+The capture worker, the pipeline stages, the matcher, the script engine and
+the UI record spans (name, category, start, duration, thread) into a bounded
+ring buffer: a flight recorder that always holds the last TRACE_CAPACITY spans.
+dump() writes them as Chrome trace JSON ("X" complete events plus thread name
+metadata), which chrome://tracing and https://ui.perfetto.dev open directly, so
+overlapping stages, stalls and GIL contention show up on one timeline.
+
+Times are time.perf_counter() values, which share one clock across processes;
+spans recorded by the vision child process are forwarded with its stats and
+merged here under the child's pid (see vision_process).
+
+Recording a span costs one tuple append; with ``enabled = False`` it is a
+single attribute check.
+
+The optional "trace" section of resources.json configures the UI:
+``{"enabled": true, "dump_on_script_end": false, "dir": "traces"}``.
+"""
+import os
+import json
+import time
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+from .path_utils import get_base_dir
+
+# Spans kept in the ring buffer
+TRACE_CAPACITY = 65536
+
+# (pid, tid, name, category, start, duration, args)
+Span = Tuple[int, int, str, str, float, float, Optional[dict]]
+
+
+class _SpanContext:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: Optional[dict]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.complete(self.name, self.cat, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class Tracer:
+    def __init__(self, capacity: int = TRACE_CAPACITY, enabled: bool = True):
+        self.enabled = enabled
+        self.pid = os.getpid()
+        self._spans = deque(maxlen=max(1, int(capacity)))
+        # (pid, tid) -> thread name, for the trace's metadata events
+        self._thread_names: Dict[Tuple[int, int], str] = {}
+
+    @property
+    def capacity(self) -> int:
+        return self._spans.maxlen
+
+    def complete(self, name: str, cat: str, start: float, end: float, args: Optional[dict] = None):
+        """Record a span from ``start`` to ``end`` (time.perf_counter() seconds) on the calling thread"""
+        if not self.enabled:
+            return
+        tid = threading.get_ident()
+        key = (self.pid, tid)
+        if key not in self._thread_names:
+            self._thread_names[key] = threading.current_thread().name
+        # deque.append is atomic; no lock on the hot path
+        self._spans.append((self.pid, tid, name, cat, start, end - start, args))
+
+    def span(self, name: str, cat: str = "", args: Optional[dict] = None):
+        """Context manager recording the duration of its block"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _SpanContext(self, name, cat, args)
+
+    def drain(self) -> Tuple[List[Span], Dict[Tuple[int, int], str]]:
+        """Remove and return every recorded span plus the thread names (for forwarding to another process)"""
+        spans = []
+        while True:
+            try:
+                spans.append(self._spans.popleft())
+            except IndexError:
+                break
+        return spans, dict(self._thread_names)
+
+    def merge(self, spans: Iterable[Span], thread_names: Optional[Dict[Tuple[int, int], str]] = None):
+        """Add spans recorded by another tracer (e.g. the vision child process)"""
+        if thread_names:
+            self._thread_names.update(thread_names)
+        self._spans.extend(spans)
+
+    def clear(self):
+        self._spans.clear()
+
+    def events(self) -> List[dict]:
+        """The recorded spans as Chrome trace events (microseconds), oldest first"""
+        spans = list(self._spans)
+        events = []
+        seen = set()
+        for pid, tid, name, cat, start, duration, args in spans:
+            if (pid, tid) not in seen:
+                seen.add((pid, tid))
+                events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                               "args": {"name": self._thread_names.get((pid, tid), str(tid))}})
+            event = {"name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": start * 1e6, "dur": duration * 1e6}
+            if args:
+                event["args"] = args
+            events.append(event)
+        return events
+
+    def dump(self, path: str) -> int:
+        """Write the ring buffer to ``path`` as Chrome trace JSON; returns the number of spans written"""
+        events = self.events()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return sum(1 for e in events if e["ph"] == "X")
+
+
+def load_trace_config() -> dict:
+    """The "trace" section of resources.json (empty: tracing on, dumped only on demand)"""
+    try:
+        with open(os.path.join(get_base_dir(), "resources.json"), "r", encoding="utf-8") as f:
+            config = json.load(f).get("trace", {})
+        return config if isinstance(config, dict) else {}
+    except Exception:
+        return {}
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
@@ -0,0 +1,92 @@
+"""
+Frame-arrival notification for vision results.
+
+The capture path publishes every processed frame into a VisionFeed. Each
+published result is stamped with a monotonically increasing ``seq`` and the
+capture ``timestamp``, and waiters can block until a result newer than a given
+sequence number or capture time arrives.
+"""
+import time
+import threading
+from typing import Callable, Optional
+
+
+class VisionFeed:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._latest: dict = {}
+        self._seq = 0
+
+    def publish(self, result: dict, timestamp: Optional[float] = None) -> int:
+        """
+        Publish a vision result and wake every waiter.
+
+        Args:
+            result: Vision result dict (as returned by ImageProcessor.process_frame)
+            timestamp: Capture time of the frame (time.time() clock); defaults to now
+
+        Returns:
+            The sequence number assigned to the result.
+        """
+        lease = result.get("frame_lease")
+        if lease is not None:
+            # The latest result keeps its ring slot alive until it is superseded
+            lease.retain()
+        with self._cond:
+            self._seq += 1
+            result["seq"] = self._seq
+            result["timestamp"] = timestamp if timestamp is not None else time.time()
+            previous = self._latest
+            self._latest = result
+            self._cond.notify_all()
+            seq = self._seq
+        previous_lease = previous.get("frame_lease") if previous else None
+        if previous_lease is not None:
+            previous_lease.release()
+        return seq
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the latest published result (0 if none yet)"""
+        return self._seq
+
+    def latest(self) -> dict:
+        return self._latest
+
+    def __call__(self) -> dict:
+        # Lets a feed be passed anywhere a get_vision_result callable is expected
+        return self._latest
+
+    def wake_waiters(self):
+        """Wake all waiters so they re-check their abort condition (e.g. on cancel)"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait_for_result(self, after_seq: Optional[int] = None, after_time: Optional[float] = None, timeout: Optional[float] = None, should_abort: Optional[Callable[[], bool]] = None) -> Optional[dict]:
+        """
+        Block until a result newer than ``after_seq`` and captured at or after ``after_time`` is published.
+
+        Args:
+            after_seq: Only accept results with a larger sequence number
+            after_time: Only accept results whose capture timestamp is >= this time
+            timeout: Maximum seconds to wait (None waits indefinitely)
+            should_abort: Checked on every wake-up; waiting stops when it returns True
+
+        Returns:
+            The matching result, or None on timeout/abort.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                res = self._latest
+                if res and (after_seq is None or res.get("seq", 0) > after_seq) and (after_time is None or res.get("timestamp", 0.0) >= after_time):
+                    return res
+                if should_abort and should_abort():
+                    return None
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
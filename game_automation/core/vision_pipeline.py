@@ -0,0 +1,283 @@
+"""
+Staged vision pipeline: capture -> preprocess -> match -> publish.
+
+Every stage runs on its own thread and hands frames to the next one through a
+bounded StageQueue with a latest-wins policy: when a stage is still busy and
+its queue is full, the oldest queued frame is dropped (and its frame-ring
+leases released) instead of blocking the producer. A slow matcher therefore
+lowers the published frame rate but never stalls capture, and the frame it
+picks up next is always the newest one.
+
+For offline throughput measurements the queues can instead block the producer
+(``backpressure="block"``), so a fast replay processes every recorded frame.
+
+Each stage counts processed and dropped frames, its throughput and busy time,
+and the depth of its input queue (see VisionPipeline.stats()).
+"""
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+from .capture_backends import CaptureBackend, PACING_REALTIME
+from .capture_crop import CaptureCrop
+from .frame_ring import DEFAULT_RING_SLOTS
+from .performance_monitor import PerformanceMonitor
+from .screen_capture import ScreenCaptureWorker
+from .tracer import get_tracer
+
+# Frames a stage's input queue holds before the oldest is dropped
+DEFAULT_QUEUE_SIZE = 1
+BACKPRESSURE_DROP = "drop"
+BACKPRESSURE_BLOCK = "block"
+# How often idle stage threads re-check whether the pipeline was stopped
+STAGE_POLL_INTERVAL = 0.1
+
+
+class StageQueue:
+    def __init__(self, maxsize: int = DEFAULT_QUEUE_SIZE, on_drop: Optional[Callable[[Any], None]] = None, block: bool = False):
+        self.maxsize = max(1, int(maxsize))
+        self.on_drop = on_drop
+        # True: put() waits for space instead of dropping the oldest item
+        self.block = block
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put(self, item) -> bool:
+        """Queue ``item``, dropping the oldest item if full; returns False if something was dropped (or closed)"""
+        dropped = None
+        with self._cond:
+            while self.block and len(self._items) >= self.maxsize and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                dropped = item
+            else:
+                if len(self._items) >= self.maxsize:
+                    dropped = self._items.popleft()
+                    self.dropped += 1
+                self._items.append(item)
+                self.max_depth = max(self.max_depth, len(self._items))
+                self._cond.notify()
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+        return dropped is None
+
+    def get(self, timeout: Optional[float] = None):
+        """Oldest queued item, or None on timeout or once closed"""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items and not self._closed:
+                item = self._items.popleft()
+                self._cond.notify_all()
+                return item
+            return None
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    def close(self):
+        """Stop accepting items, wake the consumer and drop everything still queued"""
+        with self._cond:
+            self._closed = True
+            items = list(self._items)
+            self._items.clear()
+            self._cond.notify_all()
+        if self.on_drop:
+            for item in items:
+                self.on_drop(item)
+
+
+class PipelineStage(threading.Thread):
+    def __init__(self, name: str, work: Callable[[Any], Any], inbox: StageQueue, outbox: Optional[StageQueue] = None):
+        """
+        Args:
+            name: Stage name (also the thread name)
+            work: Processes one item; its return value is queued to ``outbox`` (None: nothing)
+            inbox: Input queue
+            outbox: Queue of the next stage (None for the last stage)
+        """
+        super().__init__(daemon=True, name=f"Vision-{name}")
+        self.stage_name = name
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._throughput = PerformanceMonitor(window_seconds=1.0)
+        self._running = threading.Event()
+        self._running.set()
+
+    def run(self):
+        while self._running.is_set():
+            item = self.inbox.get(timeout=STAGE_POLL_INTERVAL)
+            if item is None:
+                continue
+            t0 = time.perf_counter()
+            try:
+                out = self.work(item)
+            except Exception as e:
+                self.errors += 1
+                print(f"[VisionPipeline] {self.stage_name} stage failed: {e}")
+                out = None
+            t1 = time.perf_counter()
+            self.busy_seconds += t1 - t0
+            get_tracer().complete(self.stage_name, "pipeline", t0, t1)
+            self.processed += 1
+            self._throughput.tick(time.time())
+            if out is not None and self.outbox is not None:
+                self.outbox.put(out)
+
+    def stop(self):
+        self._running.clear()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "processed": self.processed,
+            "dropped": self.inbox.dropped,
+            "errors": self.errors,
+            "queue_depth": self.inbox.depth,
+            "max_queue_depth": self.inbox.max_depth,
+            "fps": self._throughput.fps(),
+            "avg_ms": self.busy_seconds / self.processed * 1000.0 if self.processed else 0.0,
+        }
+
+
+def _release_capture(item):
+    lease = item[2]
+    if lease is not None:
+        lease.release()
+
+
+def _release_result(item):
+    lease = item[0].get("frame_lease")
+    if lease is not None:
+        lease.release()
+
+
+class VisionPipeline:
+    """
+    Runs capture, preprocess, match and publish as separate threads.
+
+    Args:
+        processor: ImageProcessor (preprocess() and analyze() are the middle stages)
+        publish: publish(result, capture_timestamp) on the publish thread. The
+            pipeline releases its reference to result["frame_lease"] afterwards;
+            publish() retains it if it keeps the frame (VisionFeed.publish does).
+        backend: Frame source (default: live mss capture)
+        fps: Capture rate (see ScreenCaptureWorker)
+        pacing: Replay pacing (see ScreenCaptureWorker)
+        queue_size: Capacity of each stage's input queue
+        backpressure: "drop" (latest wins, capture never waits) or "block" (lossless, for benchmarks)
+        frame_slots: Capture ring size
+        on_finished: Called when a finite replay source is exhausted
+        crop: CaptureCrop limiting capture to the area the targets in scope can be found in (None: full frames)
+    """
+
+    def __init__(self, processor, publish: Callable[[dict, float], None], backend: Optional[CaptureBackend] = None, fps: float = 60, pacing: str = PACING_REALTIME, queue_size: int = DEFAULT_QUEUE_SIZE, backpressure: str = BACKPRESSURE_DROP, frame_slots: int = DEFAULT_RING_SLOTS, on_finished: Optional[Callable[[], None]] = None, crop: Optional[CaptureCrop] = None):
+        self.processor = processor
+        self.publish = publish
+        self._capture_fps = PerformanceMonitor(window_seconds=1.0)
+        if backpressure not in (BACKPRESSURE_DROP, BACKPRESSURE_BLOCK):
+            raise ValueError(f"Unknown backpressure policy '{backpressure}'")
+        block = backpressure == BACKPRESSURE_BLOCK
+        self.preprocess_queue = StageQueue(queue_size, on_drop=_release_capture, block=block)
+        self.match_queue = StageQueue(queue_size, on_drop=_release_result, block=block)
+        self.publish_queue = StageQueue(queue_size, on_drop=_release_result, block=block)
+        self.capture = ScreenCaptureWorker(fps=fps, callback=self._on_capture, backend=backend, pacing=pacing, on_finished=on_finished, frame_slots=frame_slots, crop=crop.region if crop is not None else None)
+        self.stages = [
+            PipelineStage("preprocess", self._preprocess, self.preprocess_queue, self.match_queue),
+            PipelineStage("match", self._match, self.match_queue, self.publish_queue),
+            PipelineStage("publish", self._publish, self.publish_queue),
+        ]
+
+    @property
+    def frame_ring(self):
+        """Capture frame ring (None until capture starts)"""
+        return self.capture.frame_ring
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        self.capture.start()
+
+    def is_alive(self) -> bool:
+        return self.capture.is_alive() or any(stage.is_alive() for stage in self.stages)
+
+    def stop(self):
+        self.capture.stop()
+        for stage in self.stages:
+            stage.stop()
+        # Closing drops (and releases) whatever is still queued
+        for queue in (self.preprocess_queue, self.match_queue, self.publish_queue):
+            queue.close()
+
+    def join(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in [self.capture, *self.stages]:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if thread.is_alive():
+                thread.join(remaining)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until capture has finished and every queued frame was published (for replay runs)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            busy = self.capture.is_alive() or any(q.depth for q in (self.preprocess_queue, self.match_queue, self.publish_queue))
+            published = self.stages[-1].processed
+            dropped = sum(stage.inbox.dropped for stage in self.stages)
+            if not busy and published + dropped + self.stages[0].errors + self.stages[1].errors >= self.capture.frames_captured:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+
+    # --- stage work (each on its own thread) ---
+
+    def _on_capture(self, frame_bgra, ts: float):
+        # Capture thread: never blocks (unless backpressure is "block"); the preprocess queue drops its oldest frame instead
+        lease = self.capture.current_lease
+        if lease is not None and not lease.retain():
+            return
+        self._capture_fps.tick(ts)
+        region = self.capture.backend.region
+        self.preprocess_queue.put((frame_bgra, ts, lease, self.capture.current_origin, (region["width"], region["height"]), self.capture.current_grab_ms, self.capture.frames_captured))
+
+    def _preprocess(self, item):
+        frame_bgra, ts, lease, origin, frame_size, grab_ms, capture_seq = item
+        try:
+            result = self.processor.preprocess(frame_bgra, origin=origin, frame_size=frame_size)
+            result.setdefault("timings", {})["grab"] = grab_ms
+            # Capture-side frame number: gaps between published results are dropped frames
+            result["capture_seq"] = capture_seq
+            return result, ts
+        finally:
+            if lease is not None:
+                lease.release()
+
+    def _match(self, item):
+        result, ts = item
+        try:
+            return self.processor.analyze(result), ts
+        except Exception:
+            _release_result(item)
+            raise
+
+    def _publish(self, item):
+        result, ts = item
+        try:
+            self.publish(result, ts)
+        finally:
+            _release_result(item)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage counters: processed/dropped frames, fps, mean busy ms and input queue depth"""
+        capture = self.capture
+        stats = {"capture": {"processed": capture.frames_captured, "dropped": 0, "errors": 0, "queue_depth": 0, "max_queue_depth": 0, "fps": self._capture_fps.fps(), "avg_ms": 0.0}}
+        for stage in self.stages:
+            stats[stage.stage_name] = stage.stats()
+        return stats
@@ -0,0 +1,366 @@
+"""
+Vision pipeline in a child process, with frames in shared memory.
+
+In process mode the capture worker, the image processor and its template
+matcher run in a separate process (VisionProcess), so Qt rendering and the
+script runner no longer compete with detection for the GIL.
+
+The processed BGR and gray frames are written into a
+``multiprocessing.shared_memory`` block split into fixed ring slots. Only
+small metadata (slot index, capture timestamp, detections, tracks, stage
+counters) crosses the pipe. The parent turns each message into a normal vision
+result whose "frame" and "gray" are numpy views of the shared slot, plus a
+"frame_lease". When the parent's last reference to that lease is released, the
+slot index is sent back and the child may reuse the slot.
+
+The parent forwards target definition changes (TARGETS_VERSION), the
+active label set of its own matcher and the scope of its capture crop, so
+scripts and the template sidebar behave as with the in-process VisionPipeline.
+A cropped frame uses the start of its slot, and its shape is sent along.
+"""
+import time
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from . import targets
+from .capture_backends import PACING_REALTIME, create_capture_backend
+from .capture_crop import CaptureCrop
+from .frame_ring import FrameLease, FrameRing, fit_planes
+from .image_processor import SHARED_FRAME_SLOTS, ImageProcessor
+from .tracer import get_tracer
+from .vision_pipeline import BACKPRESSURE_DROP, DEFAULT_QUEUE_SIZE, VisionPipeline
+
+# Seconds between stage-counter updates sent by the child
+STATS_INTERVAL = 0.5
+# How often the parent's receiver re-checks targets and active labels while idle
+CONTROL_POLL_INTERVAL = 0.1
+
+
+def slot_views(buf, height: int, width: int, slots: int) -> List[Dict[str, np.ndarray]]:
+    """Per-slot {"frame": BGR, "gray": gray} numpy views of a shared buffer"""
+    frame_bytes = height * width * 3
+    slot_bytes = frame_bytes + height * width
+    views = []
+    for i in range(slots):
+        offset = i * slot_bytes
+        views.append({
+            "frame": np.ndarray((height, width, 3), dtype=np.uint8, buffer=buf, offset=offset),
+            "gray": np.ndarray((height, width), dtype=np.uint8, buffer=buf, offset=offset + frame_bytes),
+        })
+    return views
+
+
+def _definitions() -> Dict[str, dict]:
+    return {label: dict(cfg) for label, cfg in targets.TARGET_DEFINITIONS.items()}
+
+
+def _apply_definitions(definitions: Dict[str, dict]):
+    registry = targets.TARGET_DEFINITIONS
+    if hasattr(registry, "replace_all"):
+        registry.replace_all(definitions)
+    else:
+        registry.clear()
+        registry.update(definitions)
+    targets.TARGETS_VERSION = getattr(targets, "TARGETS_VERSION", 0) + 1
+
+
+def _child_main(conn, shm_name: str, height: int, width: int, slots: int, capture_config: dict, region: Dict[str, int], definitions: Dict[str, dict], options: dict):
+    """Entry point of the vision process (must stay importable for the spawn start method)"""
+    # Spawned children share the parent's resource tracker; the parent unlinks the block
+    shm = shared_memory.SharedMemory(name=shm_name)
+    get_tracer().enabled = options.get("trace", True)
+    _apply_definitions(definitions)
+    processor = ImageProcessor(match_workers=options.get("match_workers", 0), template_bundle_dir=options.get("template_bundle_dir"), change_detection=options.get("change_detection", False))
+    processor.matcher.set_active_labels(options.get("active_labels"))
+    processor.frame_ring = FrameRing({"frame": (height, width, 3), "gray": (height, width)}, buffers=slot_views(shm.buf, height, width, slots))
+    crop_scope = options.get("crop")
+    if crop_scope is not None:
+        processor.capture_crop.set_scope(*crop_scope)
+
+    send_lock = threading.Lock()
+    held: Dict[int, FrameLease] = {}
+    last_stats = [0.0]
+    unshared = [0]
+
+    def send(msg):
+        with send_lock:
+            try:
+                conn.send(msg)
+            except (OSError, EOFError):
+                pass
+
+    def publish(res, ts):
+        lease = res.get("frame_lease")
+        if lease is None or lease.slot < 0:
+            # Every shared slot is still held by the parent; this frame cannot be shared
+            unshared[0] += 1
+            return
+        lease.retain()
+        held[lease.slot] = lease
+        send(("frame", lease.slot, ts, res["gray"].shape, {
+            "frame_origin": res["frame_origin"],
+            "frame_size": res["frame_size"],
+            "found_targets": res["found_targets"],
+            "tracks": res["tracks"],
+            "overlays": res["overlays"],
+            "ocr_text": res["ocr_text"],
+            "latency_ms": res["latency_ms"],
+            "timings": res.get("timings", {}),
+            "capture_seq": res.get("capture_seq"),
+        }))
+        now = time.monotonic()
+        if now - last_stats[0] >= STATS_INTERVAL:
+            last_stats[0] = now
+            send_stats()
+
+    pipeline = None
+
+    def send_stats():
+        if pipeline is not None:
+            stats = pipeline.stats()
+            stats["transport"] = {"unshared": unshared[0], "held_by_parent": len(held), **processor.frame_ring.stats()}
+            stats["changes"] = processor.change_stats()
+            # Native thread id -> name, for the parent's per-thread CPU accounting
+            stats["threads"] = {t.native_id: t.name for t in threading.enumerate() if t.native_id is not None}
+            send(("stats", stats))
+            # Spans recorded here are merged into the parent's tracer
+            spans, thread_names = get_tracer().drain()
+            if spans:
+                send(("trace", spans, thread_names))
+
+    def finished():
+        # Called on the capture thread, which wait_idle() waits for
+        pipeline.wait_idle()
+        send_stats()
+        send(("finished",))
+
+    pipeline = VisionPipeline(
+        processor, publish,
+        backend=create_capture_backend(capture_config, region),
+        fps=options.get("fps", 60),
+        pacing=options.get("pacing", PACING_REALTIME),
+        queue_size=options.get("queue_size", DEFAULT_QUEUE_SIZE),
+        backpressure=options.get("backpressure", BACKPRESSURE_DROP),
+        on_finished=lambda: threading.Thread(target=finished, daemon=True).start(),
+        crop=processor.capture_crop if crop_scope is not None else None,
+    )
+    pipeline.start()
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = msg[0]
+            if kind == "release":
+                lease = held.pop(msg[1], None)
+                if lease is not None:
+                    lease.release()
+            elif kind == "targets":
+                _apply_definitions(msg[1])
+            elif kind == "labels":
+                processor.matcher.set_active_labels(msg[1])
+            elif kind == "crop":
+                processor.capture_crop.set_scope(*msg[1:])
+            elif kind == "stop":
+                break
+    finally:
+        pipeline.stop()
+        pipeline.join(1.0)
+        held.clear()
+        processor.frame_ring = None
+        try:
+            shm.close()
+        except BufferError:
+            pass
+
+
+class _SharedSlots:
+    """Parent-side owner of shared slot leases: recycling a lease hands the slot back to the child"""
+
+    def __init__(self, send: Callable[[tuple], None]):
+        self._lock = threading.Lock()
+        self._send = send
+
+    def _recycle(self, lease: FrameLease):
+        self._send(("release", lease.slot))
+
+
+class VisionProcess:
+    """
+    Runs the VisionPipeline (capture, preprocess, match) in a child process.
+
+    Offers the same start/stop/join/is_alive/stats interface as VisionPipeline;
+    ``publish(result, capture_timestamp)`` is called on a receiver thread of
+    this process with zero-copy views of the shared frame.
+
+    Args:
+        processor: This process's ImageProcessor; its matcher's active labels are
+            forwarded to the child (it does not match frames itself)
+        publish: Same contract as for VisionPipeline
+        capture_config: Capture config dict (see capture_backends)
+        region: Capture region; fixes the shared frame size
+        slots: Shared ring slots
+        match_workers, template_bundle_dir, change_detection: Passed to the child's ImageProcessor
+        fps, pacing, queue_size, backpressure, on_finished: As for VisionPipeline
+        crop: As for VisionPipeline; its scope is forwarded to the child, which crops the capture
+    """
+
+    def __init__(self, processor, publish: Callable[[dict, float], None], capture_config: dict, region: Dict[str, int], fps: float = 60, pacing: str = PACING_REALTIME, queue_size: int = DEFAULT_QUEUE_SIZE, backpressure: str = BACKPRESSURE_DROP, slots: int = SHARED_FRAME_SLOTS, match_workers: int = 0, template_bundle_dir: Optional[str] = None, change_detection: bool = False, on_finished: Optional[Callable[[], None]] = None, crop: Optional[CaptureCrop] = None):
+        self.processor = processor
+        self.publish = publish
+        self.capture_config = dict(capture_config or {})
+        self.region = dict(region)
+        self.slots = max(2, int(slots))
+        self.on_finished = on_finished
+        self.crop = crop
+        self._options = {
+            "fps": fps, "pacing": pacing, "queue_size": queue_size, "backpressure": backpressure,
+            "match_workers": match_workers, "template_bundle_dir": template_bundle_dir,
+            "change_detection": change_detection,
+        }
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._views: List[Dict[str, np.ndarray]] = []
+        self._process = None
+        self._conn = None
+        self._send_lock = threading.Lock()
+        self._receiver: Optional[threading.Thread] = None
+        self._running = threading.Event()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._targets_version = None
+        self._labels = None
+        self._crop_scope = None
+        self.frames_received = 0
+
+    @property
+    def frame_ring(self):
+        # Frames live in shared memory allocated once at start; nothing to report per frame
+        return None
+
+    def start(self):
+        height, width = int(self.region["height"]), int(self.region["width"])
+        size = self.slots * height * width * 4
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._views = slot_views(self._shm.buf, height, width, self.slots)
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._targets_version = getattr(targets, "TARGETS_VERSION", 0)
+        matcher = getattr(self.processor, "matcher", None)
+        self._labels = matcher.active_labels if matcher is not None else None
+        self._crop_scope = self.crop.scope() if self.crop is not None else None
+        options = dict(self._options, active_labels=self._labels, trace=get_tracer().enabled, crop=self._crop_scope)
+        self._process = ctx.Process(
+            target=_child_main, name="VisionProcess", daemon=True,
+            args=(child_conn, self._shm.name, height, width, self.slots, self.capture_config, self.region, _definitions(), options),
+        )
+        self._process.start()
+        child_conn.close()
+        self._running.set()
+        self._receiver = threading.Thread(target=self._receive, name="VisionProcess-receiver", daemon=True)
+        self._receiver.start()
+
+    def _send(self, msg):
+        with self._send_lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.send(msg)
+            except (OSError, EOFError, ValueError):
+                pass
+
+    def _sync_controls(self):
+        version = getattr(targets, "TARGETS_VERSION", 0)
+        if version != self._targets_version:
+            self._targets_version = version
+            self._send(("targets", _definitions()))
+        matcher = getattr(self.processor, "matcher", None)
+        labels = matcher.active_labels if matcher is not None else None
+        if labels != self._labels:
+            self._labels = labels
+            self._send(("labels", labels))
+        if self.crop is not None:
+            scope = self.crop.scope()
+            if scope != self._crop_scope:
+                self._crop_scope = scope
+                self._send(("crop",) + scope)
+
+    def _receive(self):
+        remote = _SharedSlots(self._send)
+        conn = self._conn
+        while self._running.is_set():
+            self._sync_controls()
+            try:
+                if not conn.poll(CONTROL_POLL_INTERVAL):
+                    continue
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = msg[0]
+            if kind == "frame":
+                _, slot, ts, (h, w), meta = msg
+                planes = self._views[slot]
+                if planes["gray"].shape != (h, w):
+                    planes = fit_planes(planes, {"frame": (h, w, 3), "gray": (h, w)})
+                lease = FrameLease(remote, slot, planes)
+                result = {"frame": lease.view("frame"), "gray": lease.view("gray"), "frame_lease": lease}
+                result.update(meta)
+                self.frames_received += 1
+                try:
+                    with get_tracer().span("publish", "pipeline"):
+                        self.publish(result, ts)
+                except Exception as e:
+                    print(f"[VisionProcess] publish failed: {e}")
+                finally:
+                    lease.release()
+            elif kind == "stats":
+                self._stats = msg[1]
+            elif kind == "trace":
+                get_tracer().merge(msg[1], msg[2])
+            elif kind == "finished" and self.on_finished:
+                self.on_finished()
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process is not None else None
+
+    def thread_names(self) -> Dict[int, str]:
+        """Native thread id -> name of the child's threads, as last reported"""
+        return dict(self._stats.get("threads", {}))
+
+    def stop(self):
+        self._send(("stop",))
+        self._running.clear()
+
+    def join(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        remaining = lambda: None if deadline is None else max(0.0, deadline - time.monotonic())
+        if self._receiver is not None:
+            self._receiver.join(remaining())
+        if self._process is not None:
+            self._process.join(remaining())
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join(1.0)
+        with self._send_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        if self._shm is not None and (self._process is None or not self._process.is_alive()):
+            self._shm.unlink()
+            try:
+                self._shm.close()
+            except BufferError:
+                # Results still reference the mapping; it is released with them
+                pass
+            self._shm = None
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Stage counters last reported by the child (empty until the first report)"""
+        stats = dict(self._stats)
+        stats.pop("threads", None)
+        return stats
@@ -0,0 +1,76 @@
+import time
+from PySide6.QtCore import QPointF
+from game_automation.core.actions import VisualScript, VisualNode
+from game_automation.core.action_latency import ActionLatencyTracker
+from game_automation.core.automation import AutomationController
+from game_automation.core.performance_monitor import PerformanceMonitor
+from game_automation.core.vision_feed import VisionFeed
+
+
+class FakePyAutoGUI:
+    def __init__(self):
+        self.clicks = []
+        self.presses = []
+
+    def moveTo(self, x, y, duration=0):
+        pass
+
+    def click(self, button="left"):
+        self.clicks.append(button)
+
+    def press(self, key):
+        self.presses.append(key)
+
+
+def test_summary_per_script_and_node():
+    tracker = ActionLatencyTracker(samples=100)
+    for i in range(1, 101):
+        frame = {"timestamp": 10.0, "seq": i, "capture_seq": i}
+        tracker.record("s", "a" if i % 2 else "b", "click", frame, 10.0 + i / 1000.0, 10.0 + i / 1000.0 + 0.001)
+    tracker.record("other", "x", "key", {"timestamp": 0.0}, 0.0, 0.002)
+    assert tracker.record("s", "a", "click", {}, 1.0, 2.0) is None  # No capture time
+    summary = tracker.summary("s")
+    assert summary["count"] == 100
+    assert abs(summary["total"]["p50"] - 51.5) < 1e-6 and abs(summary["total"]["max"] - 101.0) < 1e-6
+    assert abs(summary["decision_to_input"]["p99"] - 1.0) < 1e-6
+    assert set(summary["nodes"]) == {"a", "b"} and summary["nodes"]["a"]["count"] == 50
+    assert summary["nodes"]["a"]["type"] == "click"
+    assert tracker.scripts() == ["other", "s"]
+    tracker.reset("s")
+    assert tracker.summary("s")["count"] == 0 and tracker.scripts() == ["other"]
+
+
+def test_samples_are_bounded():
+    tracker = ActionLatencyTracker(samples=10)
+    for i in range(50):
+        tracker.record("s", "n", "click", {"timestamp": float(i)}, float(i), float(i) + 0.01)
+    records = tracker.records("s")
+    assert len(records) == 10 and records[0]["capture_time"] == 40.0
+
+
+def test_input_records_frame_it_acted_on(monkeypatch):
+    fake = FakePyAutoGUI()
+    monkeypatch.setattr("pyautogui.moveTo", fake.moveTo)
+    monkeypatch.setattr("pyautogui.click", fake.click)
+    monkeypatch.setattr("pyautogui.press", fake.press)
+    n1 = VisualNode(id="n1", type="click", params={"mode": "label", "label": "A"}, position=QPointF(0, 0))
+    n2 = VisualNode(id="n2", type="key", params={"key": "space"}, position=QPointF(0, 0))
+    script = VisualScript(id="s1", name="demo", nodes=[n1, n2], connections={"n1": "n2"})
+    feed = VisionFeed()
+    captured = time.time() - 0.05
+    feed.publish({"found_targets": [{"label": "A", "bbox": [0, 0, 10, 10]}], "capture_seq": 7}, timestamp=captured)
+    perf = PerformanceMonitor()
+    ac = AutomationController()
+    ac.latency_monitor = perf
+    ac.execute_visual_script(script, feed)
+
+    assert fake.clicks == ["left"] and fake.presses == ["space"]
+    # The key press read no new frame, so only the click is attributed to it
+    records = ac.action_latency.records("demo")
+    assert len(records) == 1
+    entry = records[0]
+    assert (entry["node_id"], entry["frame_seq"], entry["capture_seq"]) == ("n1", 1, 7)
+    assert entry["capture_time"] == captured
+    assert entry["total_ms"] >= 50.0
+    assert abs(entry["capture_to_decision_ms"] + entry["decision_to_input_ms"] - entry["total_ms"]) < 1e-6
+    assert perf.latency("frame_to_input")["count"] == 1
@@ -0,0 +1,93 @@
+import time
+import numpy as np
+from game_automation.core.actions import VisualScript, VisualNode
+from game_automation.core.automation import AutomationController
+from game_automation.core.image_processor import ImageProcessor
+from game_automation.core.node_handlers import get_node_handler, handler_uses_vision
+from game_automation.core.script_plan import compile_script
+from game_automation.core.template_matcher import TemplateMatcher
+
+
+def _compile(script):
+    return compile_script(script, get_node_handler, uses_vision=handler_uses_vision)
+
+
+def _chain_script():
+    nodes = [
+        VisualNode(id="n1", type="click", params={"mode": "label", "label": "A"}),
+        VisualNode(id="n2", type="sleep", params={"seconds": 0}),
+        VisualNode(id="n3", type="condition", params={"mode": "label", "label": "B", "next_true": "n4", "next_false": "n5"}),
+        VisualNode(id="n4", type="find_image", params={"template_name": "C"}),
+        VisualNode(id="n5", type="wait_for", params={"label": "D"}),
+    ]
+    return VisualScript(id="s", name="s", nodes=nodes, connections={"n1": "n2", "n2": "n3"})
+
+
+def test_plan_collects_referenced_labels():
+    plan = _compile(_chain_script())
+    assert plan.referenced_labels() == {"A", "B", "C", "D"}
+    assert plan.referenced_labels("n1", 1) == {"A"}
+    assert plan.referenced_labels("n2", 1) == {"B"}
+    assert plan.referenced_labels("n3", 1) == {"B", "C", "D"}
+    assert plan.referenced_labels("n4") == {"C"}
+
+
+def test_unknown_vision_node_keeps_every_label_active():
+    vs = VisualScript(id="s", name="s", nodes=[VisualNode(id="n1", type="plugin_reader", params={})])
+    assert _compile(vs).referenced_labels() is None
+
+
+def _matcher_with_templates(monkeypatch, count):
+    from game_automation.core import targets
+    tmpl = np.random.default_rng(0).integers(0, 255, (24, 24), dtype=np.uint8)
+    labels = [f"T{i}" for i in range(count)]
+
+    def fake_load_templates(self):
+        self.templates = {label: tmpl for label in labels}
+        self.template_sizes = {label: (24, 24) for label in labels}
+        self._targets_version_loaded = getattr(targets, "TARGETS_VERSION", 0)
+    monkeypatch.setattr(TemplateMatcher, "_load_templates", fake_load_templates, raising=True)
+    targets.TARGET_DEFINITIONS.clear()
+    targets.TARGET_DEFINITIONS.update({label: {"template": "", "threshold": 0.0} for label in labels})
+    return TemplateMatcher(), labels
+
+
+def test_matcher_skips_inactive_labels(monkeypatch):
+    tm, labels = _matcher_with_templates(monkeypatch, 50)
+    frame = np.random.default_rng(1).integers(0, 255, (360, 640), dtype=np.uint8)
+
+    t0 = time.perf_counter()
+    assert len(tm.match(frame)) == 50
+    t_all = time.perf_counter() - t0
+
+    tm.set_active_labels({"T3", "T7"})
+    t0 = time.perf_counter()
+    dets = tm.match(frame)
+    t_active = time.perf_counter() - t0
+    assert sorted(d["label"] for d in dets) == ["T3", "T7"]
+    print(f"match 50 templates: {t_all * 1000:.2f} ms, 2 active: {t_active * 1000:.2f} ms")
+
+    tm.set_active_labels(None)
+    assert len(tm.match(frame)) == 50
+
+
+def test_controller_scopes_matcher_to_running_script(monkeypatch):
+    tm, _ = _matcher_with_templates(monkeypatch, 4)
+    processor = ImageProcessor()
+    processor.matcher = tm
+    ac = AutomationController(image_processor=processor)
+    seen = []
+    ac.on_node_about_to_execute = lambda nid: seen.append((nid, tm.active_labels))
+    vs = VisualScript(id="s", name="s", nodes=[
+        VisualNode(id="n1", type="condition", params={"mode": "label", "label": "T1", "next_true": "n2", "next_false": "n2"}),
+        VisualNode(id="n2", type="find_image", params={"template_name": "T2"}),
+    ])
+    ac.execute_visual_script(vs, {"found_targets": []})
+    assert seen == [("n1", {"T1", "T2"}), ("n2", {"T1", "T2"})]
+
+    seen.clear()
+    ac.active_label_horizon = 0
+    ac.execute_visual_script(vs, {"found_targets": []})
+    # A horizon below one still keeps the next node's labels active
+    assert seen == [("n1", {"T1", "T2"}), ("n2", {"T2"})]
+    assert tm.active_labels is None
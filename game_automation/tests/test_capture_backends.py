@@ -0,0 +1,73 @@
+import time
+import threading
+import numpy as np
+import cv2
+import pytest
+from game_automation.core.capture_backends import (
+    ImageDirectoryBackend, RawDumpBackend, VideoFileBackend, create_capture_backend,
+)
+from game_automation.core.screen_capture import ScreenCaptureWorker
+
+
+def _frames(count, h=48, w=64):
+    return [np.full((h, w, 3), 10 + i * 40, dtype=np.uint8) for i in range(count)]
+
+
+def _replay(backend, pacing="fast", fps=60):
+    frames, done = [], threading.Event()
+    worker = ScreenCaptureWorker(fps=fps, callback=lambda f, ts: frames.append(f), backend=backend, pacing=pacing, on_finished=done.set)
+    t0 = time.perf_counter()
+    worker.start()
+    assert done.wait(5.0)
+    worker.join(1.0)
+    return frames, time.perf_counter() - t0
+
+
+def test_image_directory_replays_in_name_order(tmp_path):
+    for i, img in enumerate(_frames(4)):
+        cv2.imwrite(str(tmp_path / f"frame_{i:03d}.png"), img)
+    backend = create_capture_backend({"backend": "images", "path": str(tmp_path)})
+    assert isinstance(backend, ImageDirectoryBackend)
+    assert backend.region == {"left": 0, "top": 0, "width": 64, "height": 48}
+    frames, _ = _replay(backend)
+    assert [f.shape for f in frames] == [(48, 64, 4)] * 4
+    assert [int(f[0, 0, 0]) for f in frames] == [10, 50, 90, 130]
+
+
+def test_raw_dump_is_memory_mapped_and_loops(tmp_path):
+    path = tmp_path / "dump.raw"
+    np.stack([cv2.cvtColor(f, cv2.COLOR_BGR2BGRA) for f in _frames(3)]).tofile(path)
+    backend = RawDumpBackend(str(path), 64, 48, loop=True)
+    assert len(backend) == 3
+    grabbed = [backend.grab() for _ in range(5)]
+    assert [int(f[0, 0, 0]) for f in grabbed] == [10, 50, 90, 10, 50]
+    assert grabbed[0].flags.writeable
+
+
+def test_video_file_replay(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("no video encoder available")
+    for img in _frames(5):
+        writer.write(img)
+    writer.release()
+    backend = VideoFileBackend(path)
+    assert backend.fps == 30
+    frames, _ = _replay(backend)
+    assert len(frames) == 5 and frames[0].shape == (48, 64, 4)
+
+
+def test_realtime_pacing_follows_source_rate(tmp_path):
+    path = tmp_path / "dump.raw"
+    np.zeros((6, 8, 8, 4), dtype=np.uint8).tofile(path)
+    _, fast = _replay(RawDumpBackend(str(path), 8, 8))
+    _, realtime = _replay(RawDumpBackend(str(path), 8, 8, fps=50), pacing="realtime")
+    assert realtime >= 0.1 > fast
+
+
+def test_invalid_config_is_reported():
+    with pytest.raises(ValueError, match="Unknown capture backend"):
+        create_capture_backend({"backend": "webcam"})
+    with pytest.raises(ValueError, match="requires 'path'"):
+        create_capture_backend({"backend": "images"})
@@ -0,0 +1,118 @@
+import threading
+import numpy as np
+import cv2
+from game_automation.core import targets
+from game_automation.core.actions import VisualScript, VisualNode
+from game_automation.core.capture_backends import RawDumpBackend
+from game_automation.core.capture_crop import CaptureCrop
+from game_automation.core.image_processor import ImageProcessor
+from game_automation.core.node_handlers import _search_color, get_node_handler
+from game_automation.core.script_plan import compile_script
+from game_automation.core.template_matcher import TemplateMatcher
+from game_automation.core.vision_pipeline import VisionPipeline
+
+W, H = 320, 200
+
+
+def _template(tmp_path):
+    rng = np.random.default_rng(5)
+    tmpl = cv2.GaussianBlur(rng.integers(0, 255, (16, 20), dtype=np.uint8), (5, 5), 0)
+    tmpl = cv2.normalize(tmpl, None, 0, 255, cv2.NORM_MINMAX)
+    cv2.imwrite(str(tmp_path / "icon.png"), tmpl)
+    return tmpl
+
+
+def _define(monkeypatch, tmp_path):
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {
+        "Icon": {"template": str(tmp_path / "icon.png"), "threshold": 0.9, "roi": [0.5, 0.7, 1.0, 0.95]},
+        "Other": {"template": str(tmp_path / "icon.png"), "threshold": 0.9, "roi": [0.0, 0.0, 0.25, 0.25]},
+    })
+    monkeypatch.setattr(targets, "TARGETS_VERSION", getattr(targets, "TARGETS_VERSION", 0) + 1)
+
+
+def test_crop_covers_the_rois_in_scope(monkeypatch, tmp_path):
+    _template(tmp_path)
+    _define(monkeypatch, tmp_path)
+    crop = CaptureCrop(margin=8, align=16)
+    assert crop.region(W, H) is None  # Both targets: nothing to crop
+    assert crop.set_scope(["Icon"])
+    # ROI (160, 140, 320, 190), grown by the margin and aligned outwards
+    assert crop.region(W, H) == (144, 128, W, H)
+    assert not crop.set_scope(["Icon"])
+    crop.set_scope(["Icon"], [(0.0, 0.5, 0.1, 0.6)])
+    assert crop.region(W, H) == (0, 80, W, H)
+    crop.set_scope(["Icon"], None)  # A color search over the whole frame
+    assert crop.region(W, H) is None
+    crop.reset()
+    assert crop.region(W, H) is None
+
+
+def test_cropped_match_reports_full_frame_bboxes(monkeypatch, tmp_path):
+    tmpl = _template(tmp_path)
+    _define(monkeypatch, tmp_path)
+    gray = np.full((H, W), 30, dtype=np.uint8)
+    gray[150:166, 200:220] = tmpl
+    full = TemplateMatcher().match(gray)
+    cropped = TemplateMatcher().match(np.ascontiguousarray(gray[128:192, 144:W]), origin=(144, 128), frame_size=(W, H))
+    assert [d["bbox"] for d in full] == [d["bbox"] for d in cropped] == [(200, 150, 220, 166)]
+
+
+def test_pipeline_captures_only_the_crop(monkeypatch, tmp_path):
+    tmpl = _template(tmp_path)
+    _define(monkeypatch, tmp_path)
+    frames = np.zeros((5, H, W, 4), dtype=np.uint8)
+    frames[:, 150:166, 200:220, :3] = tmpl[..., None]
+    frames.tofile(tmp_path / "dump.raw")
+    processor = ImageProcessor(frame_slots=4)
+    processor.capture_crop.set_scope(["Icon"])
+    results, done = [], threading.Event()
+    pipeline = VisionPipeline(processor, lambda res, ts: results.append((res["frame"].shape, res["frame_origin"], res["frame_size"], res["found_targets"])),
+                              backend=RawDumpBackend(str(tmp_path / "dump.raw"), W, H), pacing="fast", backpressure="block", frame_slots=2,
+                              on_finished=done.set, crop=processor.capture_crop)
+    pipeline.start()
+    assert done.wait(5.0) and pipeline.wait_idle(5.0)
+    pipeline.stop()
+    assert len(results) == 5
+    for shape, origin, size, found in results:
+        assert shape == (H - 112, W - 144, 3) and origin == (144, 112) and size == (W, H)
+        assert [d["bbox"] for d in found] == [(200, 150, 220, 166)]
+
+
+def test_plan_regions_and_color_search_in_a_crop():
+    script = VisualScript(id="s", name="s", nodes=[
+        VisualNode(id="a", type="condition", params={"mode": "label", "label": "Icon"}),
+        VisualNode(id="b", type="find_color", params={"roi": [0.5, 0.5, 1.0, 1.0], "bgr_min": [0, 0, 200], "bgr_max": [50, 50, 255]}),
+        VisualNode(id="c", type="wait_for", params={"mode": "color", "bgr_min": [0, 0, 0], "bgr_max": [1, 1, 1]}),
+    ], connections={"a": "b", "b": "c"})
+    plan = compile_script(script, get_node_handler)
+    assert plan.referenced_regions("a", 1) == frozenset({(0.5, 0.5, 1.0, 1.0)})
+    assert plan.referenced_regions() is None
+
+    # A red box at (250, 150) in a frame cropped at (144, 128)
+    frame = np.zeros((64, W - 144, 3), dtype=np.uint8)
+    frame[22:30, 106:116] = (0, 0, 255)
+    vision = {"frame": frame, "frame_origin": (144, 128), "frame_size": (W, H)}
+    processor = ImageProcessor()
+    controller = type("C", (), {"image_processor": processor})()
+    assert _search_color(controller, vision, plan.get("b").params) == [(250, 150, 260, 158)]
+    assert _search_color(controller, vision, {"roi": [0.0, 0.0, 0.5, 0.5], "bgr_min": [0, 0, 200], "bgr_max": [50, 50, 255]}) == []
+
+
+def test_offset_color_check_widens_the_crop(monkeypatch, tmp_path):
+    _template(tmp_path)
+    _define(monkeypatch, tmp_path)
+    check = {"template_name": "Icon", "bgr_min": [0, 0, 200], "bgr_max": [50, 50, 255], "radius": 0}
+    near = VisualNode(id="a", type="verify_image_color", params=dict(check, offset_x=8, offset_y=0))
+    far = VisualNode(id="b", type="verify_image_color", params=dict(check, offset_x=0, offset_y=-40))
+    plan = compile_script(VisualScript(id="s", name="s", nodes=[near, far], connections={"a": "b"}), get_node_handler)
+    assert plan.referenced_regions() == frozenset()
+    # Offset plus the default 5 px check radius
+    assert plan.referenced_reach("a", 0) == 13 and plan.referenced_reach() == 45
+    crop = CaptureCrop()
+    crop.set_scope(plan.referenced_labels(), plan.referenced_regions(), plan.referenced_reach("a", 0))
+    assert crop.region(W, H) == (144, 112, W, H)  # Within the default margin
+    # The check point 40 px above Icon's ROI (y >= 140) is inside the crop
+    crop.set_scope(plan.referenced_labels(), plan.referenced_regions(), plan.referenced_reach())
+    assert crop.region(W, H) == (112, 80, W, H)
+    crop.set_scope(["Icon"], (), None)
+    assert crop.region(W, H) is None
@@ -0,0 +1,94 @@
+import numpy as np
+import cv2
+from game_automation.core import targets
+from game_automation.core.change_detector import ChangeDetector
+from game_automation.core.image_processor import ImageProcessor
+from game_automation.core.performance_monitor import PerformanceMonitor
+
+W, H = 320, 160
+
+
+def _template(tmp_path, name, seed):
+    rng = np.random.default_rng(seed)
+    tmpl = cv2.GaussianBlur(rng.integers(0, 255, (16, 20), dtype=np.uint8), (5, 5), 0)
+    tmpl = cv2.normalize(tmpl, None, 0, 255, cv2.NORM_MINMAX)
+    cv2.imwrite(str(tmp_path / name), tmpl)
+    return tmpl
+
+
+def _setup(monkeypatch, tmp_path):
+    left = _template(tmp_path, "left.png", 1)
+    right = _template(tmp_path, "right.png", 2)
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {
+        "Left": {"template": str(tmp_path / "left.png"), "threshold": 0.9, "roi": [0.0, 0.0, 0.5, 1.0]},
+        "Right": {"template": str(tmp_path / "right.png"), "threshold": 0.9, "roi": [0.5, 0.0, 1.0, 1.0]},
+    })
+    monkeypatch.setattr(targets, "TARGETS_VERSION", getattr(targets, "TARGETS_VERSION", 0) + 1)
+    return left, right
+
+
+def _frame(left, right, left_at=(20, 30), right_at=(200, 60)):
+    gray = np.full((H, W), 40, dtype=np.uint8)
+    gray[left_at[1]:left_at[1] + 16, left_at[0]:left_at[0] + 20] = left
+    gray[right_at[1]:right_at[1] + 16, right_at[0]:right_at[0] + 20] = right
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGRA)
+
+
+def _bboxes(res):
+    return {d["label"]: d["bbox"] for d in res["found_targets"]}
+
+
+def test_detector_marks_changed_cells_only():
+    det = ChangeDetector(cell_size=8)
+    gray = np.zeros((64, 64), dtype=np.uint8)
+    first = det.update(gray)
+    assert det.changed_since((0, 0, 64, 64), first - 1)
+    assert not det.changed_since((0, 0, 64, 64), det.update(gray))
+    gray[40:48, 40:48] = 200
+    det.update(gray)
+    assert det.changed_since((32, 32, 64, 64), first) and not det.changed_since((0, 0, 32, 32), first)
+    assert det.stats() == {"frames": 3, "unchanged_frames": 1}
+
+
+def test_slow_drift_is_eventually_detected():
+    det = ChangeDetector(cell_size=8, threshold=3.0)
+    gray = np.full((16, 16), 100, dtype=np.uint8)
+    seq = det.update(gray)
+    for step in range(1, 5):
+        det.update(gray + step)  # Each frame differs from the last by one level only
+    assert det.changed_since((0, 0, 16, 16), seq)
+
+
+def test_unchanged_rois_reuse_detections(monkeypatch, tmp_path):
+    left, right = _setup(monkeypatch, tmp_path)
+    processor = ImageProcessor(change_detection=True)
+    frame = _frame(left, right)
+    first = _bboxes(processor.process_frame(frame))
+    assert first == {"Left": (20, 30, 40, 46), "Right": (200, 60, 220, 76)}
+    assert _bboxes(processor.process_frame(frame)) == first
+    stats = processor.change_stats()
+    assert stats["matched"] == 2 and stats["reused"] == 2 and stats["unchanged_frames"] == 1
+
+    # Only the right half changed: Left is reused, Right is matched again at its new position
+    moved = _frame(left, right, right_at=(260, 100))
+    assert _bboxes(processor.process_frame(moved)) == {"Left": (20, 30, 40, 46), "Right": (260, 100, 280, 116)}
+    stats = processor.change_stats()
+    assert stats["matched"] == 3 and stats["reused"] == 3
+
+
+def test_target_inactive_during_a_change_is_matched_again(monkeypatch, tmp_path):
+    left, right = _setup(monkeypatch, tmp_path)
+    processor = ImageProcessor(change_detection=True)
+    processor.process_frame(_frame(left, right))
+    processor.matcher.set_active_labels(["Right"])
+    processor.process_frame(_frame(left, right, left_at=(60, 90)))
+    processor.matcher.set_active_labels(None)
+    # Left's ROI changed while it was not matched; its old bbox must not be reused
+    assert _bboxes(processor.process_frame(_frame(left, right, left_at=(60, 90))))["Left"] == (60, 90, 80, 106)
+
+
+def test_performance_monitor_reports_hit_rate():
+    perf = PerformanceMonitor(window_seconds=10.0)
+    perf.sample_change_stats(0.0, {"frames": 10, "unchanged_frames": 2, "matched": 20, "reused": 0, "saved_ms": 0.0})
+    perf.sample_change_stats(2.0, {"frames": 20, "unchanged_frames": 7, "matched": 25, "reused": 15, "saved_ms": 30.0})
+    assert perf.change_detection() == {"unchanged_rate": 0.5, "hit_rate": 0.75, "saved_ms_per_s": 15.0}
@@ -0,0 +1,87 @@
+"""
+Latency tests for event-driven cancellation, pause and step control.
+"""
+import threading
+import time
+from game_automation.core.actions import VisualScript, VisualNode
+from game_automation.core.automation import AutomationController
+
+
+def _run_in_thread(ac, script, **kwargs):
+    t = threading.Thread(target=ac.execute_visual_script, args=(script, {}), kwargs=kwargs, daemon=True)
+    t.start()
+    return t
+
+
+def test_stop_interrupts_long_sleep_quickly():
+    vs = VisualScript(id="s", name="s", nodes=[VisualNode(id="n1", type="sleep", params={"seconds": 10.0})])
+    ac = AutomationController()
+    results = []
+    ac.on_node_executed = lambda nid, ok: results.append((nid, ok))
+    cancel = threading.Event()
+    t = _run_in_thread(ac, vs, cancel_event=cancel)
+    time.sleep(0.05)
+
+    t0 = time.perf_counter()
+    ac.cancel_execution(cancel)
+    t.join(timeout=2.0)
+    stop_to_halt = time.perf_counter() - t0
+
+    assert not t.is_alive()
+    assert results == [("n1", False)]
+    print(f"stop-to-halt for 10 s sleep node: {stop_to_halt * 1000:.3f} ms")
+    assert stop_to_halt < 0.05
+
+
+def test_cancel_before_run_starts_is_honoured():
+    vs = VisualScript(id="s", name="s", nodes=[VisualNode(id="n1", type="sleep", params={"seconds": 10.0})])
+    ac = AutomationController()
+    cancel = threading.Event()
+    ac.cancel_execution(cancel)
+    t0 = time.perf_counter()
+    ac.execute_visual_script(vs, {}, cancel_event=cancel)
+    assert time.perf_counter() - t0 < 0.05
+
+
+def test_step_mode_advances_one_node_per_resume_and_stops_while_waiting():
+    nodes = [VisualNode(id=f"n{i}", type="sleep", params={"seconds": 0}) for i in range(3)]
+    vs = VisualScript(id="s", name="s", nodes=nodes, connections={"n0": "n1", "n1": "n2"})
+    ac = AutomationController()
+    executed = []
+    step_done = threading.Event()
+
+    def _on_executed(nid, ok):
+        executed.append(nid)
+        step_done.set()
+
+    ac.on_node_executed = _on_executed
+    ac.execution_mode = "step"
+    cancel = threading.Event()
+    t = _run_in_thread(ac, vs, cancel_event=cancel)
+
+    time.sleep(0.05)
+    assert executed == []
+    ac.resume_execution()
+    assert step_done.wait(1.0)
+    assert executed == ["n0"]
+
+    # Stop while blocked waiting for the next step
+    time.sleep(0.05)
+    t0 = time.perf_counter()
+    ac.cancel_execution(cancel)
+    t.join(timeout=2.0)
+    assert not t.is_alive()
+    assert time.perf_counter() - t0 < 0.05
+    assert executed == ["n0"]
+
+
+def test_callback_cancellation_still_supported():
+    vs = VisualScript(id="s", name="s", nodes=[VisualNode(id="n1", type="sleep", params={"seconds": 10.0})])
+    ac = AutomationController()
+    flag = {"stop": False}
+    t = threading.Thread(target=ac.execute_visual_script, args=(vs, {}), kwargs={"should_cancel_callback": lambda: flag["stop"]}, daemon=True)
+    t.start()
+    time.sleep(0.05)
+    flag["stop"] = True
+    t.join(timeout=2.0)
+    assert not t.is_alive()
@@ -0,0 +1,208 @@
+import threading
+import tracemalloc
+import numpy as np
+import cv2
+import pytest
+from game_automation.core.automation import AutomationController
+from game_automation.core.capture_backends import RawDumpBackend
+from game_automation.core.frame_ring import FrameRing
+from game_automation.core.image_processor import ImageProcessor
+from game_automation.core.performance_monitor import PerformanceMonitor
+from game_automation.core.screen_capture import ScreenCaptureWorker
+from game_automation.core.vision_feed import VisionFeed
+
+
+def test_slots_are_reused_after_last_release():
+    ring = FrameRing({"frame": (4, 4, 3)}, slots=2)
+    a = ring.acquire()
+    b = ring.acquire()
+    assert a.retain()
+    a.release()
+    b.release()
+    c = ring.acquire()
+    assert c["frame"] is b["frame"]  # a is still referenced
+    a.release()
+    assert not a.alive and not a.retain()
+    assert ring.stats()["allocations"] == 2
+
+
+def test_exhausted_ring_falls_back_to_counted_allocation():
+    ring = FrameRing({"gray": (8, 8)}, slots=1)
+    held = ring.acquire()
+    extra = ring.acquire()
+    assert extra["gray"] is not held["gray"]
+    assert ring.stats()["allocations"] == 2
+    assert ring.stats()["allocated_bytes"] == 2 * 64
+    extra.release()
+    held.release()
+    assert ring.stats()["in_use"] == 0
+
+
+def test_views_are_read_only():
+    ring = FrameRing({"frame": (2, 2)}, slots=1)
+    lease = ring.acquire()
+    assert lease["frame"].flags.writeable
+    assert not lease.view("frame").flags.writeable
+
+
+def test_external_buffers_hold_smaller_frames():
+    buffers = [{"frame": np.zeros((4, 6, 3), dtype=np.uint8)} for _ in range(2)]
+    ring = FrameRing({"frame": (4, 6, 3)}, buffers=buffers)
+    held = ring.acquire()
+    ring.ensure_shape({"frame": (2, 5, 3)})
+    lease = ring.acquire()
+    assert lease.slot == 1 and lease["frame"].shape == (2, 5, 3)
+    assert np.shares_memory(lease["frame"], buffers[1]["frame"])
+    lease.release()
+    # A slot held across the reshape still returns to the ring
+    held.release()
+    assert ring.stats()["in_use"] == 0 and ring.stats()["allocations"] == 0
+    with pytest.raises(ValueError, match="does not fit"):
+        ring.ensure_shape({"frame": (5, 6, 3)})
+
+
+def test_capture_worker_reuses_ring_slots(tmp_path):
+    path = tmp_path / "dump.raw"
+    np.arange(10, dtype=np.uint8).repeat(16 * 16 * 4).tofile(path)
+    seen, done = [], threading.Event()
+
+    def on_frame(frame, ts):
+        assert not frame.flags.writeable
+        seen.append(int(frame[0, 0, 0]))
+    worker = ScreenCaptureWorker(callback=on_frame, backend=RawDumpBackend(str(path), 16, 16), pacing="fast", on_finished=done.set, frame_slots=2)
+    worker.start()
+    assert done.wait(5.0)
+    assert seen == list(range(10))
+    stats = worker.frame_ring.stats()
+    assert stats["acquired"] == 11 and stats["allocations"] == 2 and stats["in_use"] == 0
+
+
+def test_processed_frames_are_read_only_and_free_of_overlays(monkeypatch):
+    from game_automation.core import targets
+    from game_automation.core.template_matcher import TemplateMatcher
+    rng = np.random.default_rng(2)
+    bgra = rng.integers(0, 255, (60, 80, 4), dtype=np.uint8)
+    tmpl = cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY)[20:36, 30:50].copy()
+
+    def fake_load_templates(self):
+        self.templates = {"Icon": tmpl}
+        self.template_sizes = {"Icon": (20, 16)}
+        self._targets_version_loaded = getattr(targets, "TARGETS_VERSION", 0)
+    monkeypatch.setattr(TemplateMatcher, "_load_templates", fake_load_templates)
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {"Icon": {"template": "", "threshold": 0.95}})
+    res = ImageProcessor(frame_slots=2).process_frame(bgra)
+    assert [d["bbox"] for d in res["found_targets"]] == [(30, 20, 50, 36)]
+    assert res["overlays"] == [(30, 20, 50, 36, (0, 255, 0))]
+    # Detections are reported, not drawn: pixel checks see the captured frame
+    assert np.array_equal(res["frame"], cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR))
+    assert not res["frame"].flags.writeable and not res["gray"].flags.writeable
+    res["frame_lease"].release()
+
+
+def test_processed_frames_allocate_nothing_in_steady_state():
+    frame = np.random.default_rng(0).integers(0, 255, (240, 320, 4), dtype=np.uint8)
+    frame_bytes = 240 * 320 * 4
+
+    def grow_per_frame(processor):
+        processor.matcher.set_active_labels([])
+        for _ in range(3):  # Warm up (first frame sizes the ring)
+            processor.process_frame(frame)
+        kept = []
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            for _ in range(20):
+                res = processor.process_frame(frame)
+                if res["frame_lease"] is not None:
+                    res["frame_lease"].release()
+                kept.append(res)  # Results stay referenced, like the latest vision result
+            return (tracemalloc.get_traced_memory()[0] - before) / 20
+        finally:
+            tracemalloc.stop()
+
+    assert grow_per_frame(ImageProcessor()) >= frame_bytes
+    ring_processor = ImageProcessor(frame_slots=4)
+    assert grow_per_frame(ring_processor) < frame_bytes / 50
+    allocated = ring_processor.allocation_stats()["allocated_bytes"]
+
+    perf = PerformanceMonitor(window_seconds=1.0)
+    for i in range(5):
+        ring_processor.process_frame(frame)["frame_lease"].release()
+        perf.sample_allocations(i * 0.1, ring_processor.allocation_stats()["allocated_bytes"])
+    assert ring_processor.allocation_stats()["allocated_bytes"] == allocated
+    assert perf.allocation_rate() == 0.0
+
+
+def test_feed_and_running_node_keep_the_frame_alive():
+    ring = FrameRing({"frame": (2, 2)}, slots=2)
+    feed = VisionFeed()
+
+    def produce():
+        lease = ring.acquire()
+        feed.publish({"frame_lease": lease})
+        lease.release()  # Producer hands off; the feed keeps its own reference
+        return lease
+
+    first = produce()
+    assert first.alive
+    controller = AutomationController()
+    controller._vision_feed = feed
+    res = controller._vision_for_node(feed)
+    assert res["frame_lease"] is first
+    second = produce()
+    produce()  # Both other slots are busy: first is still held by the node
+    assert first.alive and not second.alive
+    controller._release_vision()
+    assert not first.alive
+
+
+def _late_target_scene(tmp_path, count=120, appear_at=60, h=96, w=128):
+    import cv2
+    rng = np.random.default_rng(5)
+    tmpl = cv2.GaussianBlur(rng.integers(0, 255, (20, 24), dtype=np.uint8), (5, 5), 0)
+    tmpl = cv2.normalize(tmpl, None, 0, 255, cv2.NORM_MINMAX)
+    cv2.imwrite(str(tmp_path / "icon.png"), tmpl)
+    frames = np.zeros((count, h, w, 4), dtype=np.uint8)
+    for i in range(count):
+        frames[i, :, :, :3] = i % 200 + 1
+        if i >= appear_at:
+            frames[i, 40:60, 50:74, :3] = tmpl[..., None]
+    path = tmp_path / "dump.raw"
+    frames.tofile(path)
+    return str(path), w, h
+
+
+def test_wait_for_holds_only_the_newest_ring_frame(monkeypatch, tmp_path):
+    from game_automation.core import targets
+    from game_automation.core.actions import VisualScript, VisualNode
+    from game_automation.core.vision_pipeline import VisionPipeline
+    path, w, h = _late_target_scene(tmp_path)
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {"Icon": {"template": str(tmp_path / "icon.png"), "threshold": 0.9}})
+    monkeypatch.setattr(targets, "TARGETS_VERSION", getattr(targets, "TARGETS_VERSION", 0) + 1)
+    processor = ImageProcessor(frame_slots=4)
+    feed = VisionFeed()
+    baseline = []
+
+    def publish(res, ts):
+        if not baseline:
+            # Slots are (re)allocated for the frame size on the first frame
+            baseline.append(processor.allocation_stats()["allocations"])
+        feed.publish(res, timestamp=ts)
+
+    pipeline = VisionPipeline(processor, publish, backend=RawDumpBackend(path, w, h, fps=100), pacing="realtime")
+    n1 = VisualNode(id="n1", type="wait_for", params={"label": "Icon", "timeout": 5.0})
+    vs = VisualScript(id="s", name="s", nodes=[n1])
+    controller = AutomationController(image_processor=processor)
+    results = []
+    controller.on_node_executed = lambda nid, ok: results.append(ok)
+    pipeline.start()
+    try:
+        controller.execute_visual_script(vs, feed)
+    finally:
+        pipeline.stop()
+        pipeline.join(1.0)
+    # The target appears at frame 60; polling the frames before it must not pin ring slots
+    assert results == [True]
+    stats = processor.allocation_stats()
+    assert stats["acquired"] > 60
+    assert stats["allocations"] == baseline[0]
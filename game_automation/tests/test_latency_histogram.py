@@ -0,0 +1,89 @@
+import numpy as np
+import cv2
+from PySide6.QtCore import QPointF
+from game_automation.core import targets
+from game_automation.core.automation import AutomationController
+from game_automation.core.actions import VisualScript, VisualNode
+from game_automation.core.image_processor import ImageProcessor
+from game_automation.core.performance_monitor import LatencyHistogram, PerformanceMonitor, StreamingStats
+
+
+def test_quantiles_within_one_bucket():
+    hist = LatencyHistogram()
+    for ms in range(1, 101):
+        hist.record(float(ms), ts=100.0)
+    stats = hist.stats(ts=100.0)
+    assert stats["count"] == 100 and stats["max"] == 100.0
+    assert abs(stats["mean"] - 50.5) < 1e-9
+    assert 50 <= stats["p50"] <= 50 * 1.05
+    assert 95 <= stats["p95"] <= 95 * 1.05
+    assert 99 <= stats["p99"] <= 100
+
+
+
+def test_quantiles_of_long_durations():
+    # Waits and long nodes: a minute and more stays within one bucket
+    values = [30000.0] * 50 + [90000.0] * 45 + [200000.0] * 5
+    hist = LatencyHistogram()
+    streaming = StreamingStats()
+    for ms in values:
+        hist.record(ms, ts=100.0)
+        streaming.add(ms)
+    for stats in (hist.stats(ts=100.0), streaming.summary()):
+        assert 30000 <= stats["p50"] <= 30000 * 1.05
+        assert 90000 <= stats["p95"] <= 90000 * 1.05
+        assert 200000 * 0.95 <= stats["p99"] <= 200000
+
+
+def test_window_only_counts_recent_slices():
+    hist = LatencyHistogram(window_seconds=10, slice_seconds=1)
+    hist.record(500.0, ts=0.5)
+    hist.record(1.0, ts=8.5)
+    assert hist.stats(ts=9.0)["count"] == 2
+    recent = hist.stats(window=2, ts=9.0)
+    assert recent["count"] == 1 and recent["max"] == 1.0
+    # Slices older than the retained window are dropped (and their rows reused)
+    hist.record(2.0, ts=12.5)
+    stats = hist.stats(ts=12.5)
+    assert stats["count"] == 2 and stats["max"] == 2.0
+
+
+def test_memory_is_fixed():
+    hist = LatencyHistogram(window_seconds=5, slice_seconds=1)
+    counts = hist._counts
+    for i in range(10000):
+        hist.record(i % 700 / 7.0, ts=i / 1000.0)
+    hist.record(1e9, ts=20.0)  # Beyond the last bucket
+    assert hist._counts is counts and counts.shape[0] == 5
+    assert hist.stats(ts=20.0)["max"] == 1e9
+
+
+def test_monitor_collects_stages():
+    perf = PerformanceMonitor()
+    perf.record_latencies({"grab": 2.0, "match:A": 1.0}, ts=5.0)
+    perf.record_latency("grab", 4.0, ts=5.5)
+    stats = perf.latency_stats(ts=6.0)
+    assert list(stats) == ["grab", "match:A"]
+    assert stats["grab"]["count"] == 2 and stats["grab"]["max"] == 4.0
+    assert perf.latency("missing")["count"] == 0
+
+
+def test_vision_result_carries_stage_timings(monkeypatch, tmp_path):
+    tmpl = np.random.default_rng(3).integers(0, 255, (16, 16), dtype=np.uint8)
+    cv2.imwrite(str(tmp_path / "t.png"), tmpl)
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {"T": {"template": str(tmp_path / "t.png"), "threshold": 0.9}})
+    monkeypatch.setattr(targets, "TARGETS_VERSION", getattr(targets, "TARGETS_VERSION", 0) + 1)
+    frame = np.zeros((120, 160, 4), dtype=np.uint8)
+    res = ImageProcessor().process_frame(frame)
+    assert {"bgr", "gray", "match", "match:T", "overlay"} <= set(res["timings"])
+    assert all(ms >= 0 for ms in res["timings"].values())
+
+
+def test_controller_records_node_latency():
+    node = VisualNode(id="n1", type="sleep", params={"seconds": 0.0}, position=QPointF(0, 0))
+    script = VisualScript(id="s1", name="s", nodes=[node], connections={})
+    perf = PerformanceMonitor()
+    controller = AutomationController()
+    controller.latency_monitor = perf
+    controller.execute_visual_script(script, {})
+    assert perf.latency("node:sleep")["count"] == 1
@@ -0,0 +1,117 @@
+import time
+import numpy as np
+from game_automation.core import targets
+from game_automation.core.actions import VisualScript, VisualNode
+from game_automation.core.automation import AutomationController
+from game_automation.core.template_matcher import TemplateMatcher, extract_peaks
+
+
+POSITIONS = [(20, 200), (220, 30), (120, 120), (320, 200), (20, 30)]
+
+
+def _setup(monkeypatch, max_instances):
+    rng = np.random.default_rng(11)
+    tmpl = rng.integers(0, 255, (24, 32), dtype=np.uint8)
+    frame = rng.integers(0, 40, (300, 400), dtype=np.uint8)
+    for x, y in POSITIONS:
+        frame[y:y + 24, x:x + 32] = tmpl
+
+    def fake_load_templates(self):
+        self.templates = {"CARD": tmpl}
+        self.template_sizes = {"CARD": (32, 24)}
+        self._targets_version_loaded = getattr(targets, "TARGETS_VERSION", 0)
+    monkeypatch.setattr(TemplateMatcher, "_load_templates", fake_load_templates, raising=True)
+    targets.TARGET_DEFINITIONS.clear()
+    targets.TARGET_DEFINITIONS.update({"CARD": {"template": "", "threshold": 0.9, "max_instances": max_instances}})
+    return frame
+
+
+def test_reports_every_instance_once(monkeypatch):
+    frame = _setup(monkeypatch, max_instances=10)
+    dets = TemplateMatcher().match(frame)
+    assert sorted(d["bbox"][:2] for d in dets) == sorted(POSITIONS)
+    assert [d["instance"] for d in dets] == list(range(len(POSITIONS)))
+
+    frame = _setup(monkeypatch, max_instances=2)
+    assert len(TemplateMatcher().match(frame)) == 2
+
+
+def test_single_instance_target_unchanged(monkeypatch):
+    frame = _setup(monkeypatch, max_instances=1)
+    (det,) = TemplateMatcher().match(frame)
+    assert "instance" not in det
+
+
+def test_nms_suppresses_overlapping_peaks():
+    res = np.zeros((100, 100), dtype=np.float32)
+    res[10, 10] = 0.95
+    res[12, 13] = 0.93  # Overlaps the stronger peak
+    res[60, 60] = 0.91
+    assert extract_peaks(res, 0.9, 20, 20, 10) == [(10, 10, np.float32(0.95)), (60, 60, np.float32(0.91))]
+
+
+def test_peak_extraction_at_4k_with_hundreds_of_candidates():
+    rng = np.random.default_rng(2)
+    res = rng.uniform(-0.2, 0.5, (2113, 3793)).astype(np.float32)
+    ys = rng.integers(0, res.shape[0], 500)
+    xs = rng.integers(0, res.shape[1], 500)
+    res[ys, xs] = 0.95
+    t0 = time.perf_counter()
+    peaks = extract_peaks(res, 0.85, 48, 48, 500)
+    elapsed = time.perf_counter() - t0
+    print(f"4K peak extraction, 500 candidates: {elapsed * 1000:.2f} ms, {len(peaks)} kept")
+    assert 400 < len(peaks) <= 500
+
+
+def _run(vision, label="CARD"):
+    nodes = [
+        VisualNode(id="all", type="find_all", params={"label": label, "next_body": "click", "next_after": "done"}),
+        VisualNode(id="click", type="click", params={"mode": "instance"}),
+        VisualNode(id="done", type="sleep", params={"seconds": 0}),
+    ]
+    vs = VisualScript(id="s", name="s", nodes=nodes, connections={"click": "all"})
+    ac = AutomationController()
+    results = []
+    ac.on_node_executed = lambda nid, ok: results.append((nid, ok))
+    ac.execute_visual_script(vs, vision)
+    return results
+
+
+def test_find_all_clicks_each_instance_in_reading_order(monkeypatch):
+    moves = []
+    monkeypatch.setattr("pyautogui.moveTo", lambda x, y, duration=0: moves.append((x, y)))
+    monkeypatch.setattr("pyautogui.click", lambda button="left": None)
+    found = [{"label": "CARD", "bbox": (x, y, x + 10, y + 10), "confidence": 0.95, "instance": i}
+             for i, (x, y) in enumerate(POSITIONS)]
+    results = _run({"found_targets": found})
+    assert moves == [(25, 35), (225, 35), (125, 125), (25, 205), (325, 205)]
+    assert results[-2:] == [("all", True), ("done", True)]
+    assert results.count(("click", True)) == len(POSITIONS)
+
+
+def test_find_all_reentries_do_not_wait_for_fresh_frames(monkeypatch):
+    from game_automation.core.vision_feed import VisionFeed
+    monkeypatch.setattr("pyautogui.moveTo", lambda x, y, duration=0: None)
+    monkeypatch.setattr("pyautogui.click", lambda button="left": None)
+    found = [{"label": "CARD", "bbox": (x, y, x + 10, y + 10), "confidence": 0.95, "instance": i}
+             for i, (x, y) in enumerate(POSITIONS)]
+    # No frame arrives after the clicks: every fresh-frame wait would run into its timeout
+    feed = VisionFeed()
+    feed.publish({"found_targets": found}, timestamp=time.time())
+    nodes = [
+        VisualNode(id="all", type="find_all", params={"label": "CARD", "next_body": "click", "next_after": "done"}),
+        VisualNode(id="click", type="click", params={"mode": "instance"}),
+        VisualNode(id="done", type="sleep", params={"seconds": 0}),
+    ]
+    ac = AutomationController()
+    ac.fresh_frame_timeout = 0.2
+    results = []
+    ac.on_node_executed = lambda nid, ok: results.append((nid, ok))
+    start = time.monotonic()
+    ac.execute_visual_script(VisualScript(id="s", name="s", nodes=nodes, connections={"click": "all"}), feed)
+    assert results.count(("click", True)) == len(POSITIONS) and results[-1] == ("done", True)
+    assert time.monotonic() - start < 0.2 * len(POSITIONS) / 2
+
+
+def test_find_all_without_instances_goes_to_after():
+    assert _run({"found_targets": []}) == [("all", False), ("done", True)]
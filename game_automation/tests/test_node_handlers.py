@@ -0,0 +1,50 @@
+import sys
+import types
+from game_automation.core.actions import VisualScript, VisualNode, Action, ActionSequence
+from game_automation.core.automation import AutomationController
+from game_automation.core import node_handlers
+
+
+def test_custom_handler_registration_and_branching():
+    calls = []
+
+    @node_handlers.register_node_handler("test_flag", params={"value": (int, 0)}, branches=("next_yes", "next_no"))
+    def _flag(controller, node, vision_result, should_cancel_callback=None):
+        calls.append(node.params["value"])
+        return True, "next_yes" if node.params["value"] else "next_no"
+
+    n1 = VisualNode(id="n1", type="test_flag", params={"value": "1", "next_yes": "n3", "next_no": "n2"})
+    n2 = VisualNode(id="n2", type="sleep", params={"seconds": 0})
+    n3 = VisualNode(id="n3", type="sleep", params={"seconds": 0})
+    vs = VisualScript(id="s", name="s", nodes=[n1, n2, n3])
+    ac = AutomationController()
+    seen = []
+    ac.on_node_executed = lambda nid, ok: seen.append(nid)
+    ac.execute_visual_script(vs, {})
+    assert calls == [1]
+    assert seen == ["n1", "n3"]
+
+
+def test_lazy_handler_imported_on_first_use(monkeypatch):
+    module = types.ModuleType("_lazy_node_plugin")
+    module.handle = lambda controller, node, vision_result, cancel=None: (True, None)
+    monkeypatch.setitem(sys.modules, "_lazy_node_plugin", module)
+    node_handlers.register_lazy_node_handler("test_lazy", "_lazy_node_plugin:handle")
+    assert "test_lazy" in node_handlers.registered_node_types()
+    assert node_handlers.get_node_handler("test_lazy") is module.handle
+    assert node_handlers.get_node_handler("does_not_exist") is None
+
+
+def test_run_sequence_uses_shared_handlers(monkeypatch):
+    events = []
+    monkeypatch.setattr("pyautogui.keyDown", lambda k: events.append(("down", k)))
+    monkeypatch.setattr("pyautogui.keyUp", lambda k: events.append(("up", k)))
+    monkeypatch.setattr("pyautogui.moveTo", lambda x, y, duration=0: events.append(("move", x, y)))
+    monkeypatch.setattr("pyautogui.click", lambda button="left": events.append(("click", button)))
+    seq = ActionSequence(actions=[
+        Action(type="key", params={"key": "a"}),
+        Action(type="click", params={"mode": "label", "label": "B"}),
+        Action(type="unknown_type", params={}),
+    ])
+    AutomationController().run_sequence(seq, {"found_targets": [{"label": "B", "bbox": [0, 0, 10, 20]}]})
+    assert events == [("down", "a"), ("up", "a"), ("move", 5, 10), ("click", "left")]
@@ -0,0 +1,68 @@
+import time
+import threading
+import numpy as np
+from PySide6.QtCore import QPointF
+from game_automation.core.actions import VisualScript, VisualNode
+from game_automation.core.automation import AutomationController
+from game_automation.core.node_stats import NodeStatistics
+from game_automation.core.performance_monitor import StreamingStats
+
+
+def test_streaming_stats_match_exact_values():
+    values = np.random.default_rng(1).lognormal(mean=2.0, sigma=0.5, size=5000)
+    stats = StreamingStats()
+    counts = stats._counts
+    for v in values:
+        stats.add(float(v))
+    summary = stats.summary()
+    assert stats._counts is counts  # Constant memory
+    assert summary["count"] == 5000
+    assert abs(summary["mean"] - values.mean()) < 1e-9
+    assert abs(summary["std"] - values.std(ddof=1)) < 1e-9
+    assert summary["min"] == values.min() and summary["max"] == values.max()
+    for q in (50, 95, 99):
+        exact = np.percentile(values, q)
+        assert abs(summary[f"p{q}"] - exact) / exact < 0.06
+
+
+def test_empty_and_single_value():
+    assert StreamingStats().summary()["min"] == 0.0
+    stats = StreamingStats()
+    stats.add(3.0)
+    summary = stats.summary()
+    assert summary["std"] == 0.0 and summary["p50"] == summary["p99"] == 3.0
+
+
+def test_per_node_and_type_report():
+    stats = NodeStatistics()
+    stats.start()
+    stats.record("a", "click", 10.0)
+    stats.record("a", "click", 20.0)
+    stats.record("b", "click", 30.0)
+    stats.record("c", "sleep", 5.0)
+    report = stats.report()
+    assert report["running"] and report["total_nodes_executed"] == 4
+    assert report["nodes"]["a"]["count"] == 2 and report["nodes"]["a"]["type"] == "click"
+    assert report["types"]["click"]["count"] == 3 and report["types"]["click"]["total"] == 60.0
+    stats.finish()
+    assert not stats.report()["running"]
+
+
+def test_stats_are_live_and_survive_cancellation():
+    n1 = VisualNode(id="n1", type="sleep", params={"seconds": 0.0}, position=QPointF(0, 0))
+    n2 = VisualNode(id="n2", type="sleep", params={"seconds": 10.0}, position=QPointF(0, 0))
+    vs = VisualScript(id="s1", name="long", nodes=[n1, n2], connections={"n1": "n2"})
+    ac = AutomationController()
+    cancel = threading.Event()
+    t = threading.Thread(target=ac.execute_visual_script, args=(vs, {}), kwargs={"cancel_event": cancel})
+    t.start()
+    deadline = time.monotonic() + 5.0
+    while ac.node_stats.node("n1")["count"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    live = ac.node_stats.report()
+    assert live["running"] and live["nodes"]["n1"]["count"] == 1 and "n2" not in live["nodes"]
+    ac.cancel_execution(cancel)
+    t.join(5.0)
+    report = ac.node_stats.report()
+    assert report["cancelled"] and not report["running"]
+    assert report["nodes"]["n2"]["count"] == 1 and report["types"]["sleep"]["count"] == 2
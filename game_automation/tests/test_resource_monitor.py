@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+from game_automation.core.performance_monitor import PerformanceMonitor
+
+
+def _spin(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_samples_own_process_and_named_threads():
+    perf = PerformanceMonitor()
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin, args=(stop,), name="BusyWorker", daemon=True)
+    worker.start()
+    try:
+        perf.sample_resources()
+        time.sleep(0.2)
+        sample = perf.sample_resources()
+    finally:
+        stop.set()
+        worker.join()
+    main = sample["processes"]["main"]
+    assert main["pid"] == os.getpid() and main["rss"] > 0 and main["num_threads"] >= 2
+    assert "MainThread" in main["threads"]
+    busy = main["threads"]["BusyWorker"]
+    assert busy["cpu_time"] > 0 and busy["cpu_percent"] > 10
+    assert perf.process_resources() is sample
+
+
+def test_history_window_and_watched_processes():
+    perf = PerformanceMonitor()
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        perf.watch_process("child", child.pid)
+        perf.sample_resources(ts=100.0)
+        sample = perf.sample_resources(ts=130.0)
+        assert sample["processes"]["child"]["pid"] == child.pid
+        # Threads of a watched process without a name map are summed as "other"
+        assert set(sample["processes"]["child"]["threads"]) == {"other"}
+        child.kill()
+        child.wait()
+        perf.sample_resources(ts=170.0)
+    finally:
+        if child.poll() is None:
+            child.kill()
+    assert [s["timestamp"] for s in perf.resource_history()] == [130.0, 170.0]
+    assert [s["timestamp"] for s in perf.resource_history(seconds=10)] == [170.0]
+    # A process that exited drops out of the samples
+    assert "child" not in perf.process_resources()["processes"]
+    perf.unwatch_process("child")
+
+
+def test_background_sampling():
+    perf = PerformanceMonitor()
+    perf.start_resource_sampling(interval=0.02)
+    try:
+        deadline = time.monotonic() + 5.0
+        while len(perf.resource_history()) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        perf.stop_resource_sampling()
+    assert len(perf.resource_history()) >= 3
+    assert "ResourceSampler" in perf.process_resources()["processes"]["main"]["threads"]
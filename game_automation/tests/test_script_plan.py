@@ -0,0 +1,52 @@
+from game_automation.core.actions import VisualScript, VisualNode
+from game_automation.core.automation import AutomationController
+from game_automation.core.script_plan import compile_script
+
+
+def _script():
+    n1 = VisualNode(id="n1", type="condition", params={"mode": "label", "label": "A", "min_confidence": "0.5", "next_true": "n2", "next_false": ""})
+    n2 = VisualNode(id="n2", type="sleep", params={"seconds": "0"})
+    n3 = VisualNode(id="n3", type="loop", params={"count": "2", "next_body": "n2", "next_after": "missing"})
+    return VisualScript(id="s", name="s", nodes=[n1, n2, n3], connections={"n1": "n3"})
+
+
+def test_compile_coerces_params_and_resolves_successors():
+    plan = compile_script(_script(), lambda t: (lambda *a: (True, None)))
+    n1 = plan.get("n1")
+    assert n1.params["min_confidence"] == 0.5
+    assert plan.get("n2").params["seconds"] == 0.0
+    assert plan.get("n3").params["count"] == 2
+    assert n1.successor("next_true") == "n2"
+    # Empty branch falls back to the default connection
+    assert n1.successor("next_false") == "n3"
+    assert plan.entry_id == "n1"
+    assert ("n3", "successor 'missing' does not exist") in plan.issues
+
+
+def test_compile_records_invalid_params():
+    vs = VisualScript(id="s", name="s", nodes=[VisualNode(id="n1", type="sleep", params={"seconds": "abc"})])
+    plan = compile_script(vs, lambda t: None)
+    assert plan.get("n1").error
+    assert any(nid == "n1" and "unknown node type" in msg for nid, msg in plan.issues)
+
+
+def test_controller_caches_plan_until_script_changes():
+    ac = AutomationController()
+    vs = _script()
+    plan = ac.compile_script(vs)
+    assert ac.compile_script(vs) is plan
+    assert ac._find_node(vs, "n2") is vs.nodes[1]
+
+    vs.nodes[1].params["seconds"] = 0.1
+    plan2 = ac.compile_script(vs)
+    assert plan2 is not plan
+    assert plan2.get("n2").params["seconds"] == 0.1
+
+
+def test_invalid_params_fail_node_without_raising():
+    vs = VisualScript(id="s", name="s", nodes=[VisualNode(id="n1", type="sleep", params={"seconds": "abc"}), VisualNode(id="n2", type="sleep", params={"seconds": 0})], connections={"n1": "n2"})
+    ac = AutomationController()
+    seen = []
+    ac.on_node_executed = lambda nid, ok: seen.append((nid, ok))
+    ac.execute_visual_script(vs, {})
+    assert seen == [("n1", False), ("n2", True)]
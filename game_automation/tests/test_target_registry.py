@@ -0,0 +1,48 @@
+import dataclasses
+import pytest
+from game_automation.core import targets
+from game_automation.core.targets import TargetRecord, TargetRegistry, TargetSnapshot
+
+
+def test_snapshot_is_reused_until_mutation():
+    reg = TargetRegistry({"A": {"template": "a.png", "threshold": 0.9, "roi": [0.0, 0.5, 1.0, 1.0]}})
+    snap = reg.snapshot()
+    assert reg.snapshot() is snap
+    (rec,) = snap.records
+    assert (rec.label, rec.threshold, rec.roi, rec.method) == ("A", 0.9, (0.0, 0.5, 1.0, 1.0), "tm")
+
+    reg["B"] = {"template": "b.png"}
+    snap2 = reg.snapshot()
+    assert snap2 is not snap and snap2.version > snap.version
+    assert [r.label for r in snap2.records] == ["A", "B"]
+    # The old snapshot is unaffected by later writes
+    assert [r.label for r in snap.records] == ["A"]
+
+
+def test_records_are_frozen_and_pixel_rois_cached_per_size():
+    snap = TargetSnapshot.build({"A": {"template": "", "roi": [0.25, 0.5, 0.75, 1.2]}}, version=1)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        snap.records[0].threshold = 0.1
+    rois = snap.pixel_rois(400, 200)
+    assert rois == ((100, 100, 300, 200),)
+    assert snap.pixel_rois(400, 200) is rois
+    assert snap.pixel_rois(800, 400) == ((200, 200, 600, 400),)
+
+
+def test_replace_all_publishes_in_one_revision():
+    reg = TargetRegistry({"A": {"template": ""}, "B": {"template": ""}})
+    before = reg.revision
+    reg.replace_all({"C": {"template": ""}})
+    assert reg.revision == before + 1
+    assert [r.label for r in reg.snapshot().records] == ["C"]
+
+
+def test_invalid_entries_are_skipped():
+    snap = TargetSnapshot.build({"A": {"template": "", "threshold": "high"}, "B": {"template": ""}}, version=0)
+    assert [r.label for r in snap.records] == ["B"]
+
+
+def test_current_snapshot_accepts_plain_dict(monkeypatch):
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {"A": {"template": ""}})
+    assert [r.label for r in targets.current_snapshot().records] == ["A"]
+    assert isinstance(targets.current_snapshot().records[0], TargetRecord)
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import cv2
+from game_automation.core import targets
+from game_automation.core import template_matcher as tm_module
+from game_automation.core.template_bundle import TemplateBundle
+from game_automation.core.template_matcher import TemplateMatcher
+
+
+def _write(path, seed, size=(40, 48)):
+    # Smooth texture so the downscaled pyramid levels still match
+    noise = np.random.default_rng(seed).integers(0, 255, size, dtype=np.uint8)
+    img = cv2.GaussianBlur(noise, (0, 0), 3)
+    img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
+    cv2.imwrite(str(path), img)
+    return img
+
+
+def _define(monkeypatch, paths):
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {label: {"template": str(p), "threshold": 0.9, "method": "pyramid"} for label, p in paths.items()})
+
+
+def _built(monkeypatch, tmp_path):
+    paths = {f"T{i}": tmp_path / f"t{i}.png" for i in range(3)}
+    images = {label: _write(p, i) for i, (label, p) in enumerate(paths.items())}
+    _define(monkeypatch, paths)
+    bundle_dir = tmp_path / "cache"
+    tm = TemplateMatcher(bundle_dir=str(bundle_dir))
+    assert tm.last_reload_stats["read"] == 3
+    assert tm.wait_for_bundle(5.0)
+    return paths, images, bundle_dir
+
+
+def test_bundle_maps_templates_without_decoding(monkeypatch, tmp_path):
+    paths, images, bundle_dir = _built(monkeypatch, tmp_path)
+    assert len(TemplateBundle.load(str(bundle_dir))) == 3
+
+    def fail(*args, **kwargs):
+        raise AssertionError("template decoded despite an up-to-date bundle")
+    monkeypatch.setattr(tm_module.cv2, "imdecode", fail)
+    tm = TemplateMatcher(bundle_dir=str(bundle_dir))
+    assert tm.last_reload_stats == {"read": 0, "mapped": 3, "reused": 0, "removed": 0}
+    for label, img in images.items():
+        assert isinstance(tm.templates[label], np.memmap)
+        assert np.array_equal(tm.templates[label], img)
+    # Pyramid levels come from the bundle too
+    assert tm._pyramids["T0"][0] is tm.templates["T0"]
+    assert all(np.array_equal(a, b) for a, b in zip(tm._template_pyramid("T0", None), tm_module.build_pyramid(images["T0"])))
+
+    frame = np.zeros((120, 160), dtype=np.uint8)
+    frame[30:70, 50:98] = images["T1"]
+    assert [(d["label"], d["bbox"]) for d in tm.match(frame)] == [("T1", (50, 30, 98, 70))]
+
+
+def test_changed_template_is_decoded_and_bundle_rebuilt(monkeypatch, tmp_path):
+    paths, images, bundle_dir = _built(monkeypatch, tmp_path)
+    new_img = _write(paths["T2"], 42)
+    st = os.stat(paths["T2"])
+    os.utime(paths["T2"], ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    tm = TemplateMatcher(bundle_dir=str(bundle_dir))
+    assert tm.last_reload_stats == {"read": 1, "mapped": 2, "reused": 0, "removed": 0}
+    assert np.array_equal(tm.templates["T2"], new_img)
+    assert tm.wait_for_bundle(5.0)
+
+    tm = TemplateMatcher(bundle_dir=str(bundle_dir))
+    assert tm.last_reload_stats["mapped"] == 3
+    assert np.array_equal(tm.templates["T2"], new_img)
+    # Superseded blobs are cleaned up
+    assert len([n for n in os.listdir(bundle_dir) if n.endswith(".bin")]) == 1
+
+
+def test_missing_or_corrupt_bundle_falls_back_to_decoding(monkeypatch, tmp_path):
+    paths, images, bundle_dir = _built(monkeypatch, tmp_path)
+    (bundle_dir / "templates.json").write_text("{not json", encoding="utf-8")
+    tm = TemplateMatcher(bundle_dir=str(bundle_dir))
+    assert tm.last_reload_stats["read"] == 3
+    assert tm.wait_for_bundle(5.0)
+    assert TemplateMatcher(bundle_dir=str(bundle_dir)).last_reload_stats["mapped"] == 3
+
+
+def test_build_tool_writes_the_bundle_once(monkeypatch, tmp_path, capsys):
+    import sys
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("build_template_bundle", os.path.join(os.path.dirname(os.path.dirname(__file__)), "tools", "build_template_bundle.py"))
+    tool = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tool)
+    _define(monkeypatch, {f"T{i}": tmp_path / f"t{i}.png" for i in range(3)})
+    for i in range(3):
+        _write(tmp_path / f"t{i}.png", i)
+    writes = []
+    real_write = tm_module.write_bundle
+    monkeypatch.setattr(tm_module, "write_bundle", lambda *args: writes.append(1) or real_write(*args))
+    bundle_dir = tmp_path / "cache"
+    monkeypatch.setattr(sys, "argv", ["build_template_bundle.py", "--dir", str(bundle_dir)])
+    assert tool.main() == 0
+    assert len(writes) == 1
+    # An up-to-date bundle is reported, not rebuilt
+    assert tool.main() == 0
+    assert len(writes) == 1
+    assert len([n for n in os.listdir(bundle_dir) if n.endswith(".bin")]) == 1
+    assert "(3 templates)" in capsys.readouterr().out
@@ -0,0 +1,87 @@
+import os
+import threading
+import numpy as np
+import cv2
+from game_automation.core import targets
+from game_automation.core.template_matcher import TemplateMatcher
+
+
+def _setup(monkeypatch, count=12):
+    rng = np.random.default_rng(5)
+    frame = rng.integers(0, 255, (240, 320), dtype=np.uint8)
+    labels = [f"T{i}" for i in range(count)]
+    # Cut every template out of the frame so each one is found
+    crops = {label: frame[10 * i:10 * i + 16, 12 * i:12 * i + 16].copy() for i, label in enumerate(labels)}
+
+    def fake_load_templates(self):
+        self.templates = dict(crops)
+        self.template_sizes = {label: (16, 16) for label in labels}
+        self._targets_version_loaded = getattr(targets, "TARGETS_VERSION", 0)
+    monkeypatch.setattr(TemplateMatcher, "_load_templates", fake_load_templates, raising=True)
+    targets.TARGET_DEFINITIONS.clear()
+    targets.TARGET_DEFINITIONS.update({label: {"template": "", "threshold": 0.95} for label in labels})
+    return frame, labels
+
+
+def test_parallel_results_match_serial_in_definition_order(monkeypatch):
+    frame, labels = _setup(monkeypatch)
+    serial_tm = TemplateMatcher()
+    tm = TemplateMatcher(workers=4)
+    try:
+        for _ in range(5):
+            serial = serial_tm.match(frame)
+            assert tm.match(frame) == serial
+    finally:
+        tm.close()
+    assert [d["label"] for d in serial] == labels
+
+
+def test_parallel_bookkeeping_is_consistent(monkeypatch):
+    frame, labels = _setup(monkeypatch)
+    tm = TemplateMatcher(workers=4)
+    errors, stop = [], threading.Event()
+
+    def read_tracks():
+        while not stop.is_set():
+            try:
+                tm.tracks()
+            except Exception as e:
+                errors.append(e)
+    reader = threading.Thread(target=read_tracks, daemon=True)
+    reader.start()
+    try:
+        for _ in range(50):
+            tm.match(frame)
+    finally:
+        stop.set()
+        reader.join()
+        tm.close()
+    assert not errors
+    assert tm.targets_matched == 50 * len(labels)
+    assert set(tm.last_match_ms) == set(labels) and set(tm.tracks()) == set(labels)
+
+
+def test_worker_pool_limits_and_restores_cv_threads(monkeypatch):
+    _setup(monkeypatch, count=2)
+    before = cv2.getNumThreads()
+    tm = TemplateMatcher(workers=2)
+    assert tm.workers == 2
+    tm.set_workers(1)
+    assert tm.workers == 0
+    assert cv2.getNumThreads() == before
+
+
+def test_matchers_share_one_cv_thread_setting(monkeypatch):
+    _setup(monkeypatch, count=2)
+    before = cv2.getNumThreads()
+    cpus = os.cpu_count() or 1
+    a, b = TemplateMatcher(workers=2), TemplateMatcher(workers=4)
+    try:
+        assert cv2.getNumThreads() == max(1, cpus // 6)
+        # Closing one matcher must neither restore the setting nor keep the other's limit too tight
+        a.close()
+        assert cv2.getNumThreads() == max(1, cpus // 4)
+    finally:
+        a.close()
+        b.close()
+    assert cv2.getNumThreads() == before
@@ -0,0 +1,63 @@
+import time
+import numpy as np
+import cv2
+from game_automation.core import targets
+from game_automation.core.template_matcher import TemplateMatcher
+
+
+def _scene():
+    rng = np.random.default_rng(3)
+    # Smooth background so downscaling keeps the template distinctive
+    frame = cv2.GaussianBlur(rng.integers(0, 255, (1080, 1920), dtype=np.uint8), (0, 0), 3)
+    tmpl = cv2.GaussianBlur(rng.integers(0, 255, (64, 96), dtype=np.uint8), (0, 0), 2)
+    frame[601:665, 1237:1333] = tmpl
+    return frame, tmpl
+
+
+def _matcher(monkeypatch, tmpl, method, roi):
+    def fake_load_templates(self):
+        self.templates = {"CARD": tmpl}
+        self.template_sizes = {"CARD": (tmpl.shape[1], tmpl.shape[0])}
+        self._targets_version_loaded = getattr(targets, "TARGETS_VERSION", 0)
+    monkeypatch.setattr(TemplateMatcher, "_load_templates", fake_load_templates, raising=True)
+    targets.TARGET_DEFINITIONS.clear()
+    targets.TARGET_DEFINITIONS.update({
+        "CARD": {"template": "", "method": method, "threshold": 0.85, "roi": roi}
+    })
+    return TemplateMatcher()
+
+
+def test_pyramid_matches_full_resolution_result(monkeypatch):
+    frame, tmpl = _scene()
+    roi = [0.05, 0.30, 0.95, 0.75]
+    tm = _matcher(monkeypatch, tmpl, "tm", roi)
+    t0 = time.perf_counter()
+    (full,) = tm.match(frame)
+    t_full = time.perf_counter() - t0
+
+    tm = _matcher(monkeypatch, tmpl, "pyramid", roi)
+    tm.match(frame)  # Build the cached template pyramid
+    t0 = time.perf_counter()
+    (coarse,) = tm.match(frame)
+    t_pyramid = time.perf_counter() - t0
+
+    print(f"1080p ROI match: tm {t_full * 1000:.2f} ms, pyramid {t_pyramid * 1000:.2f} ms")
+    assert coarse["bbox"] == full["bbox"] == (1237, 601, 1333, 665)
+    # Confidence is the full-resolution score, so thresholds carry over unchanged
+    assert abs(coarse["confidence"] - full["confidence"]) < 1e-4
+
+
+def test_pyramid_rejects_absent_target(monkeypatch):
+    frame, tmpl = _scene()
+    frame[601:665, 1237:1333] = 0
+    tm = _matcher(monkeypatch, tmpl, "pyramid", [0.0, 0.0, 1.0, 1.0])
+    assert tm.match(frame) == []
+
+
+def test_pyramid_levels_cached_and_limited(monkeypatch):
+    _, tmpl = _scene()
+    tm = _matcher(monkeypatch, tmpl, "pyramid", [0.0, 0.0, 1.0, 1.0])
+    levels = tm._template_pyramid("CARD", None)
+    assert [lvl.shape for lvl in levels] == [(32, 48), (16, 24), (8, 12)]
+    assert tm._template_pyramid("CARD", None)[0] is levels[0]
+    assert len(tm._template_pyramid("CARD", 1)) == 1
@@ -0,0 +1,74 @@
+import numpy as np
+import cv2
+from game_automation.core import targets
+from game_automation.core import template_matcher as tm_module
+from game_automation.core.template_matcher import TemplateMatcher
+
+
+def _setup(monkeypatch):
+    rng = np.random.default_rng(7)
+    tmpl = rng.integers(0, 255, (20, 30), dtype=np.uint8)
+
+    def fake_load_templates(self):
+        self.templates = {"BTN": tmpl}
+        self.template_sizes = {"BTN": (30, 20)}
+        self._targets_version_loaded = getattr(targets, "TARGETS_VERSION", 0)
+    monkeypatch.setattr(TemplateMatcher, "_load_templates", fake_load_templates, raising=True)
+    targets.TARGET_DEFINITIONS.clear()
+    targets.TARGET_DEFINITIONS.update({"BTN": {"template": "", "threshold": 0.9}})
+    return tmpl
+
+
+def _frame(tmpl, x, y):
+    frame = np.random.default_rng(1).integers(0, 60, (300, 400), dtype=np.uint8)
+    frame[y:y + 20, x:x + 30] = tmpl
+    return frame
+
+
+def _count_roi_sized_matches(monkeypatch, min_area):
+    calls = []
+    real = cv2.matchTemplate
+
+    def counting(img, tmpl, method):
+        if img.shape[0] * img.shape[1] >= min_area:
+            calls.append(img.shape)
+        return real(img, tmpl, method)
+    monkeypatch.setattr(tm_module.cv2, "matchTemplate", counting)
+    return calls
+
+
+def test_tracked_label_is_searched_near_last_hit(monkeypatch):
+    tmpl = _setup(monkeypatch)
+    tm = TemplateMatcher()
+    assert tm.match(_frame(tmpl, 100, 50))[0]["bbox"] == (100, 50, 130, 70)
+    full_scans = _count_roi_sized_matches(monkeypatch, 300 * 400)
+
+    # Small moves stay inside the tracking window: no full-ROI scan needed
+    dets = tm.match(_frame(tmpl, 105, 53))
+    assert dets[0]["bbox"] == (105, 53, 135, 73)
+    assert full_scans == []
+    track = tm.get_track("BTN")
+    assert (track.bbox, track.age, track.hits) == ((105, 53, 135, 73), 0, 2)
+
+    # A jump outside the window falls back to the full ROI in the same frame
+    dets = tm.match(_frame(tmpl, 300, 250))
+    assert dets[0]["bbox"] == (300, 250, 330, 270)
+    assert len(full_scans) == 1
+
+
+def test_safety_sweep_and_miss_ageing(monkeypatch):
+    tmpl = _setup(monkeypatch)
+    tm = TemplateMatcher()
+    frame = _frame(tmpl, 100, 50)
+    tm.match(frame)
+    full_scans = _count_roi_sized_matches(monkeypatch, 300 * 400)
+    for _ in range(tm_module.TRACK_SWEEP_INTERVAL):
+        assert tm.match(frame)
+    assert len(full_scans) == 1
+
+    empty = np.zeros((300, 400), dtype=np.uint8)
+    assert tm.match(empty) == []
+    assert tm.match(empty) == []
+    track = tm.get_track("BTN")
+    assert (track.bbox, track.age, track.hits) == ((100, 50, 130, 70), 2, 0)
+    assert "BTN" in tm.tracks()
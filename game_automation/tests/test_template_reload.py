@@ -0,0 +1,122 @@
+import os
+import threading
+import numpy as np
+import cv2
+from game_automation.core import targets
+from game_automation.core import template_matcher as tm_module
+from game_automation.core.template_matcher import TemplateMatcher
+
+
+def _write(path, seed, size=(12, 16)):
+    img = np.random.default_rng(seed).integers(0, 255, size, dtype=np.uint8)
+    cv2.imwrite(str(path), img)
+    return img
+
+
+def _define(monkeypatch, paths):
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {label: {"template": str(p), "threshold": 0.9} for label, p in paths.items()})
+
+
+def _bump(monkeypatch):
+    monkeypatch.setattr(targets, "TARGETS_VERSION", getattr(targets, "TARGETS_VERSION", 0) + 1)
+
+
+def _touch_later(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_only_changed_templates_are_reloaded(monkeypatch, tmp_path):
+    paths = {f"T{i}": tmp_path / f"t{i}.png" for i in range(4)}
+    for i, p in enumerate(paths.values()):
+        _write(p, i)
+    _define(monkeypatch, paths)
+    tm = TemplateMatcher()
+    assert tm.last_reload_stats == {"read": 4, "mapped": 0, "reused": 0, "removed": 0}
+    before = dict(tm.templates)
+
+    # Change one file, add one target, remove one target
+    new_img = _write(paths["T1"], 99)
+    _touch_later(paths["T1"])
+    paths["T4"] = tmp_path / "t4.png"
+    _write(paths["T4"], 4)
+    del paths["T3"]
+    _define(monkeypatch, paths)
+    _bump(monkeypatch)
+    tm.match(np.zeros((50, 50), dtype=np.uint8))
+
+    assert tm.last_reload_stats == {"read": 2, "mapped": 0, "reused": 2, "removed": 1}
+    assert tm.templates["T0"] is before["T0"]
+    assert tm.templates["T2"] is before["T2"]
+    assert np.array_equal(tm.templates["T1"], new_img)
+    assert set(tm.templates) == {"T0", "T1", "T2", "T4"}
+
+
+def test_rewritten_file_with_same_content_is_not_decoded_again(monkeypatch, tmp_path):
+    path = tmp_path / "a.png"
+    _write(path, 1)
+    _define(monkeypatch, {"A": path})
+    tm = TemplateMatcher()
+    original = tm.templates["A"]
+    _touch_later(path)
+    _bump(monkeypatch)
+    tm.match(np.zeros((50, 50), dtype=np.uint8))
+    assert tm.last_reload_stats["read"] == 1
+    assert tm.templates["A"] is original
+
+
+def test_edit_during_a_reload_is_picked_up_next_time(monkeypatch, tmp_path):
+    paths = {"A": tmp_path / "a.png"}
+    _write(paths["A"], 1)
+    _define(monkeypatch, paths)
+    tm = TemplateMatcher()
+    real_snapshot = targets.current_snapshot
+    edits = []
+
+    def snapshot_then_edit():
+        # B is defined right after the reload took its snapshot
+        snapshot = real_snapshot()
+        if not edits:
+            edits.append(True)
+            paths["B"] = tmp_path / "b.png"
+            _write(paths["B"], 2)
+            _define(monkeypatch, paths)
+            _bump(monkeypatch)
+        return snapshot
+    monkeypatch.setattr(targets, "current_snapshot", snapshot_then_edit)
+    _bump(monkeypatch)
+    frame = np.zeros((50, 50), dtype=np.uint8)
+    tm.match(frame)
+    assert set(tm.templates) == {"A"}
+    tm.match(frame)
+    assert set(tm.templates) == {"A", "B"}
+
+
+def test_large_reload_runs_in_background_and_swaps_atomically(monkeypatch, tmp_path):
+    paths = {"OLD": tmp_path / "old.png"}
+    _write(paths["OLD"], 0)
+    _define(monkeypatch, paths)
+    tm = TemplateMatcher()
+    old_templates = tm.templates
+
+    release = threading.Event()
+    real_imdecode = cv2.imdecode
+
+    def slow_imdecode(buf, flags):
+        release.wait(2.0)
+        return real_imdecode(buf, flags)
+    monkeypatch.setattr(tm_module.cv2, "imdecode", slow_imdecode)
+
+    for i in range(tm_module.BACKGROUND_RELOAD_MIN + 2):
+        paths[f"N{i}"] = tmp_path / f"n{i}.png"
+        _write(paths[f"N{i}"], 10 + i)
+    _define(monkeypatch, paths)
+    _bump(monkeypatch)
+
+    # Matching does not wait for the reload and still sees the previous set
+    tm.match(np.zeros((50, 50), dtype=np.uint8))
+    assert tm.templates is old_templates
+    release.set()
+    assert tm.wait_for_reload(5.0)
+    assert set(tm.templates) == set(paths)
+    assert tm.templates["OLD"] is old_templates["OLD"]
@@ -0,0 +1,69 @@
+import json
+import threading
+import numpy as np
+from game_automation.core import tracer as tracer_module
+from game_automation.core.capture_backends import RawDumpBackend
+from game_automation.core.image_processor import ImageProcessor
+from game_automation.core.tracer import Tracer, get_tracer
+from game_automation.core.vision_pipeline import VisionPipeline
+
+
+def test_spans_from_threads_dump_as_chrome_trace(tmp_path):
+    tracer = Tracer()
+    with tracer.span("outer", "engine", {"node": "n1"}):
+        worker = threading.Thread(target=lambda: tracer.complete("inner", "capture", 1.0, 1.5), name="Worker")
+        worker.start()
+        worker.join()
+    path = tmp_path / "out" / "trace.json"
+    assert tracer.dump(str(path)) == 2
+    events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+    names = {e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert "Worker" in names and threading.current_thread().name in names
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    assert spans["inner"]["ts"] == 1.0e6 and spans["inner"]["dur"] == 0.5e6
+    assert spans["outer"]["args"] == {"node": "n1"} and spans["outer"]["dur"] >= 0
+    assert spans["inner"]["tid"] != spans["outer"]["tid"]
+
+
+def test_ring_is_bounded_and_disabled_records_nothing():
+    tracer = Tracer(capacity=4)
+    for i in range(10):
+        tracer.complete(f"s{i}", "", i, i + 1)
+    assert [e["name"] for e in tracer.events() if e["ph"] == "X"] == ["s6", "s7", "s8", "s9"]
+    tracer.clear()
+    tracer.enabled = False
+    tracer.complete("off", "", 0, 1)
+    with tracer.span("off"):
+        pass
+    assert tracer.events() == []
+
+
+def test_drain_and_merge_keep_process_of_origin():
+    child, parent = Tracer(), Tracer()
+    child.pid = parent.pid + 1
+    child.complete("match", "pipeline", 2.0, 2.1)
+    spans, names = child.drain()
+    assert child.events() == []
+    parent.complete("paint", "ui", 2.05, 2.06)
+    parent.merge(spans, names)
+    pids = {e["name"]: e["pid"] for e in parent.events() if e["ph"] == "X"}
+    assert pids == {"paint": parent.pid, "match": parent.pid + 1}
+
+
+def test_pipeline_records_stage_spans(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracer_module, "_tracer", Tracer())
+    path = tmp_path / "dump.raw"
+    np.arange(5, dtype=np.uint8).repeat(32 * 32 * 4).tofile(path)
+    done = threading.Event()
+    processor = ImageProcessor()
+    processor.matcher.set_active_labels([])
+    pipeline = VisionPipeline(processor, lambda res, ts: None, backend=RawDumpBackend(str(path), 32, 32, fps=200), pacing="fast", backpressure="block", on_finished=done.set)
+    pipeline.start()
+    assert done.wait(5.0) and pipeline.wait_idle(5.0)
+    pipeline.stop()
+    pipeline.join(1.0)
+    counts = {}
+    for e in get_tracer().events():
+        if e["ph"] == "X":
+            counts[e["name"]] = counts.get(e["name"], 0) + 1
+    assert all(counts.get(name) == 5 for name in ("grab", "preprocess", "match", "publish"))
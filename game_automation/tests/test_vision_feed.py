@@ -0,0 +1,60 @@
+import threading
+import time
+from game_automation.core.actions import VisualScript, VisualNode
+from game_automation.core.automation import AutomationController
+from game_automation.core.vision_feed import VisionFeed
+
+
+def test_publish_assigns_monotonic_sequence_and_timestamp():
+    feed = VisionFeed()
+    assert feed() == {}
+    s1 = feed.publish({"found_targets": []}, timestamp=10.0)
+    s2 = feed.publish({"found_targets": []}, timestamp=11.0)
+    assert (s1, s2) == (1, 2)
+    assert feed.latest()["seq"] == 2
+    assert feed.latest()["timestamp"] == 11.0
+
+
+def test_wait_for_result_blocks_until_newer_frame():
+    feed = VisionFeed()
+    feed.publish({"n": 1}, timestamp=1.0)
+    assert feed.wait_for_result(after_seq=1, timeout=0.01) is None
+
+    threading.Timer(0.02, lambda: feed.publish({"n": 2}, timestamp=5.0)).start()
+    res = feed.wait_for_result(after_time=2.0, timeout=1.0)
+    assert res is not None and res["n"] == 2
+
+
+def test_engine_waits_for_frame_captured_after_click(monkeypatch):
+    clicked_at = []
+    monkeypatch.setattr("pyautogui.moveTo", lambda x, y, duration=0: None)
+    monkeypatch.setattr("pyautogui.click", lambda button="left": clicked_at.append(time.time()))
+
+    feed = VisionFeed()
+    stop = threading.Event()
+
+    def _capture_loop():
+        # Target "B" only becomes visible on frames captured after the click
+        while not stop.is_set():
+            ts = time.time()
+            targets = [{"label": "A", "bbox": (0, 0, 10, 10), "confidence": 1.0}]
+            if clicked_at and ts >= clicked_at[0]:
+                targets.append({"label": "B", "bbox": (0, 0, 10, 10), "confidence": 1.0})
+            feed.publish({"found_targets": targets}, timestamp=ts)
+            time.sleep(0.01)
+
+    t = threading.Thread(target=_capture_loop, daemon=True)
+    t.start()
+    try:
+        feed.wait_for_result(after_seq=0, timeout=1.0)
+        n1 = VisualNode(id="n1", type="click", params={"mode": "label", "label": "A"})
+        n2 = VisualNode(id="n2", type="condition", params={"mode": "label", "label": "B"})
+        vs = VisualScript(id="s", name="s", nodes=[n1, n2], connections={"n1": "n2"})
+        ac = AutomationController()
+        results = []
+        ac.on_node_executed = lambda nid, ok: results.append((nid, ok))
+        ac.execute_visual_script(vs, feed)
+    finally:
+        stop.set()
+        t.join(timeout=1.0)
+    assert results == [("n1", True), ("n2", True)]
@@ -0,0 +1,95 @@
+import time
+import threading
+import numpy as np
+from game_automation.core.capture_backends import RawDumpBackend
+from game_automation.core.image_processor import ImageProcessor
+from game_automation.core.vision_feed import VisionFeed
+from game_automation.core.vision_pipeline import StageQueue, VisionPipeline
+
+
+def test_full_queue_drops_oldest():
+    dropped = []
+    q = StageQueue(2, on_drop=dropped.append)
+    assert q.put(1) and q.put(2)
+    assert not q.put(3)
+    assert dropped == [1] and q.dropped == 1 and q.max_depth == 2
+    assert q.get(0) == 2 and q.get(0) == 3 and q.get(0) is None
+    q.put(4)
+    q.close()
+    assert dropped == [1, 4] and q.get(0) is None
+
+
+class SlowProcessor(ImageProcessor):
+    def __init__(self, delay):
+        super().__init__(frame_slots=8)
+        self.matcher.set_active_labels([])
+        self.delay = delay
+
+    def analyze(self, result):
+        time.sleep(self.delay)
+        return super().analyze(result)
+
+
+def _dump(tmp_path, count):
+    path = tmp_path / "dump.raw"
+    np.arange(count, dtype=np.uint8).repeat(32 * 32 * 4).tofile(path)
+    return RawDumpBackend(str(path), 32, 32, fps=200)
+
+
+def test_slow_match_stage_does_not_stall_capture(tmp_path):
+    processor = SlowProcessor(delay=0.04)
+    feed = VisionFeed()
+    published = []
+
+    def publish(res, ts):
+        feed.publish(res, timestamp=ts)
+        published.append(int(res["gray"][0, 0]))
+
+    done = threading.Event()
+    pipeline = VisionPipeline(processor, publish, backend=_dump(tmp_path, 60), pacing="realtime", on_finished=done.set)
+    t0 = time.perf_counter()
+    pipeline.start()
+    assert done.wait(5.0)
+    capture_seconds = time.perf_counter() - t0
+    assert pipeline.wait_idle(5.0)
+    pipeline.stop()
+    pipeline.join(1.0)
+
+    stats = pipeline.stats()
+    # 60 frames at 200 fps: capture keeps its pace although matching takes 40 ms per frame
+    assert stats["capture"]["processed"] == 60
+    assert capture_seconds < 60 * 0.04 / 2
+    assert stats["match"]["avg_ms"] >= 40
+    assert stats["match"]["dropped"] > 0
+    assert len(published) < 60
+    # Frames stay in order, and the newest frame is always the one published last
+    assert published == sorted(published) and published[-1] == 59
+    dropped = sum(stage["dropped"] for stage in stats.values())
+    assert stats["publish"]["processed"] + dropped == 60
+    # Every dropped or published frame released its ring slots (the feed keeps the latest)
+    assert pipeline.frame_ring.stats()["in_use"] == 0
+    assert processor.allocation_stats()["in_use"] == 1
+
+
+def test_stop_releases_queued_frames(tmp_path):
+    processor = SlowProcessor(delay=0.2)
+    pipeline = VisionPipeline(processor, lambda res, ts: None, backend=_dump(tmp_path, 20), pacing="fast")
+    pipeline.start()
+    time.sleep(0.1)
+    pipeline.stop()
+    pipeline.join(2.0)
+    assert not pipeline.is_alive()
+    assert pipeline.frame_ring.stats()["in_use"] == 0
+    assert processor.allocation_stats()["in_use"] == 0
+
+
+def test_blocking_backpressure_is_lossless(tmp_path):
+    processor = SlowProcessor(delay=0.005)
+    published = []
+    done = threading.Event()
+    pipeline = VisionPipeline(processor, lambda res, ts: published.append(int(res["gray"][0, 0])), backend=_dump(tmp_path, 30), pacing="fast", backpressure="block", on_finished=done.set)
+    pipeline.start()
+    assert done.wait(5.0) and pipeline.wait_idle(5.0)
+    pipeline.stop()
+    assert published == list(range(30))
+    assert all(stage["dropped"] == 0 for stage in pipeline.stats().values())
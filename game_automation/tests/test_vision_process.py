@@ -0,0 +1,144 @@
+import threading
+import numpy as np
+import cv2
+from game_automation.core import targets
+from game_automation.core import tracer as tracer_module
+from game_automation.core.capture_crop import CaptureCrop
+from game_automation.core.image_processor import ImageProcessor
+from game_automation.core.tracer import Tracer
+from game_automation.core.vision_feed import VisionFeed
+from game_automation.core.vision_process import VisionProcess
+
+
+def _scene(tmp_path, count, h=96, w=128):
+    rng = np.random.default_rng(3)
+    tmpl = cv2.GaussianBlur(rng.integers(0, 255, (20, 24), dtype=np.uint8), (5, 5), 0)
+    tmpl = cv2.normalize(tmpl, None, 0, 255, cv2.NORM_MINMAX)
+    cv2.imwrite(str(tmp_path / "icon.png"), tmpl)
+    frames = np.zeros((count, h, w, 4), dtype=np.uint8)
+    for i in range(count):
+        frames[i, :, :, :3] = i + 1
+        frames[i, 40:60, 50:74, :3] = tmpl[..., None]
+    path = tmp_path / "dump.raw"
+    frames.tofile(path)
+    return {"backend": "raw", "path": str(path), "width": w, "height": h}
+
+
+def test_child_process_detects_and_shares_frames(monkeypatch, tmp_path):
+    config = _scene(tmp_path, 12)
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {"Icon": {"template": str(tmp_path / "icon.png"), "threshold": 0.9}})
+    tracer = Tracer()
+    monkeypatch.setattr(tracer_module, "_tracer", tracer)
+    feed = VisionFeed()
+    seen, done = [], threading.Event()
+
+    def publish(res, ts):
+        feed.publish(res, timestamp=ts)
+        seen.append((int(res["gray"][0, 0]), [t["label"] for t in res["found_targets"]], res["frame"].base is not None))
+
+    proc = VisionProcess(ImageProcessor(), publish, capture_config=config, region={"left": 0, "top": 0, "width": 128, "height": 96}, pacing="fast", backpressure="block", on_finished=done.set)
+    proc.start()
+    try:
+        assert done.wait(20.0)
+        assert [gray for gray, _, _ in seen] == list(range(1, 13))
+        assert all(labels == ["Icon"] for _, labels, _ in seen)
+        # Frames are views into the shared block, recycled by the release messages
+        assert all(shared for _, _, shared in seen)
+        latest = feed.latest()
+        assert latest["found_targets"][0]["bbox"][:2] == (50, 40)
+        assert proc.stats()["publish"]["processed"] == 12
+        assert proc.stats()["transport"]["unshared"] == 0
+        # Spans recorded in the child are merged into this process's tracer under the child's pid
+        child_spans = [e for e in tracer.events() if e["ph"] == "X" and e["pid"] == proc._process.pid]
+        assert sum(e["name"] == "match:Icon" for e in child_spans) == 12
+    finally:
+        proc.stop()
+        proc.join(5.0)
+    assert not proc.is_alive()
+
+
+def test_active_labels_are_forwarded(monkeypatch, tmp_path):
+    config = _scene(tmp_path, 200)
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {"Icon": {"template": str(tmp_path / "icon.png"), "threshold": 0.9}})
+    parent = ImageProcessor()
+    parent.matcher.set_active_labels([])
+    found, started = [], threading.Event()
+
+    def publish(res, ts):
+        found.append(len(res["found_targets"]))
+        started.set()
+
+    proc = VisionProcess(parent, publish, capture_config=config, region={"left": 0, "top": 0, "width": 128, "height": 96}, fps=100)
+    proc.start()
+    try:
+        assert started.wait(20.0)
+        parent.matcher.set_active_labels(["Icon"])
+        deadline = threading.Event()
+        for _ in range(100):
+            if found[-1]:
+                break
+            deadline.wait(0.05)
+        assert found[0] == 0 and found[-1] == 1
+    finally:
+        proc.stop()
+        proc.join(5.0)
+
+
+def test_wait_for_sees_late_target_without_pinning_shared_slots(monkeypatch, tmp_path):
+    from game_automation.core.actions import VisualScript, VisualNode
+    from game_automation.core.automation import AutomationController
+    config = _scene(tmp_path, 150)
+    # The icon is only drawn from frame 60 on
+    frames = np.fromfile(config["path"], dtype=np.uint8).reshape(150, 96, 128, 4)
+    frames[:60, 40:60, 50:74, :3] = frames[:60, :1, :1, :3]
+    frames.tofile(config["path"])
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {"Icon": {"template": str(tmp_path / "icon.png"), "threshold": 0.9}})
+    feed = VisionFeed()
+    processor = ImageProcessor()
+    proc = VisionProcess(processor, lambda res, ts: feed.publish(res, timestamp=ts), capture_config=config, region={"left": 0, "top": 0, "width": 128, "height": 96}, fps=100, slots=4)
+    n1 = VisualNode(id="n1", type="wait_for", params={"label": "Icon", "timeout": 10.0})
+    vs = VisualScript(id="s", name="s", nodes=[n1])
+    controller = AutomationController(image_processor=processor)
+    results = []
+    controller.on_node_executed = lambda nid, ok: results.append(ok)
+    proc.start()
+    try:
+        controller.execute_visual_script(vs, feed)
+        assert results == [True]
+        assert proc.frames_received > 60
+    finally:
+        proc.stop()
+        proc.join(5.0)
+
+
+def test_capture_crop_scope_is_forwarded(monkeypatch, tmp_path):
+    config = _scene(tmp_path, 250)
+    tmpl = cv2.imread(str(tmp_path / "icon.png"), cv2.IMREAD_GRAYSCALE)
+    monkeypatch.setattr(targets, "TARGET_DEFINITIONS", {"Icon": {"template": str(tmp_path / "icon.png"), "threshold": 0.9, "roi": [0.25, 0.25, 0.75, 0.75]}})
+    crop = CaptureCrop()
+    seen, started = [], threading.Event()
+
+    def publish(res, ts):
+        ox, oy = res["frame_origin"]
+        # The parent's view of the slot holds the cropped pixels
+        intact = np.array_equal(res["gray"][40 - oy:60 - oy, 50 - ox:74 - ox], tmpl)
+        seen.append((res["gray"].shape, res["frame_origin"], res["frame_size"], [t["bbox"][:2] for t in res["found_targets"]], intact))
+        started.set()
+
+    proc = VisionProcess(ImageProcessor(), publish, capture_config=config, region={"left": 0, "top": 0, "width": 128, "height": 96}, fps=100, crop=crop)
+    proc.start()
+    try:
+        assert started.wait(20.0)
+        assert seen[0] == ((96, 96), (16, 0), (128, 96), [(50, 40)], True)
+        # A color search in the top-left corner widens the crop
+        crop.set_scope(None, [(0.0, 0.0, 0.1, 0.1)])
+        wait = threading.Event()
+        for _ in range(100):
+            if seen[-1][1] == (0, 0):
+                break
+            wait.wait(0.05)
+        assert seen[-1] == ((96, 112), (0, 0), (128, 96), [(50, 40)], True)
+        assert all(s[4] and s[3] == [(50, 40)] for s in seen)
+    finally:
+        proc.stop()
+        proc.join(5.0)
@@ -0,0 +1,39 @@
+import numpy as np
+from PySide6.QtCore import QPointF
+from game_automation.core.actions import VisualScript, VisualNode, Action, ActionSequence
+from game_automation.core.automation import AutomationController
+from game_automation.core import image_processor as ip_mod
+from game_automation.core.image_processor import get_shared_image_processor
+
+
+class _CountingIP:
+    def __init__(self):
+        self.calls = 0
+
+    def find_color(self, frame_bgr, **kwargs):
+        self.calls += 1
+        return [(0, 0, 1, 1)]
+
+
+def test_shared_image_processor_is_singleton():
+    assert get_shared_image_processor() is get_shared_image_processor()
+
+
+def test_controller_uses_injected_processor_without_rebuilding(monkeypatch):
+    def _fail(*args, **kwargs):
+        raise AssertionError("ImageProcessor must not be constructed during node execution")
+    monkeypatch.setattr(ip_mod.ImageProcessor, "__init__", _fail)
+
+    fake = _CountingIP()
+    frame = np.zeros((20, 20, 3), dtype=np.uint8)
+    n1 = VisualNode(id="n1", type="find_color", params={"hsv_min": [0, 0, 0], "hsv_max": [1, 1, 1]}, position=QPointF(0, 0))
+    n2 = VisualNode(id="n2", type="condition", params={"mode": "color", "hsv_min": [0, 0, 0], "hsv_max": [1, 1, 1]}, position=QPointF(0, 0))
+    vs = VisualScript(id="s", name="s", nodes=[n1, n2], connections={"n1": "n2"})
+    ac = AutomationController(scale_factor=1.0, image_processor=fake)
+    results = []
+    ac.on_node_executed = lambda nid, ok: results.append((nid, ok))
+    ac.execute_visual_script(vs, {"frame": frame, "found_targets": []})
+    ac.run_sequence(ActionSequence(actions=[Action(type="find_color", params={"hsv_min": [0, 0, 0], "hsv_max": [1, 1, 1], "click": False})]), {"frame": frame})
+
+    assert results == [("n1", True), ("n2", True)]
+    assert fake.calls == 3
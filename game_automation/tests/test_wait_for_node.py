@@ -0,0 +1,106 @@
+import threading
+import time
+from game_automation.core.actions import VisualScript, VisualNode
+from game_automation.core.automation import AutomationController
+from game_automation.core.vision_feed import VisionFeed
+
+
+def _target(label):
+    return {"label": label, "bbox": (0, 0, 10, 10), "confidence": 1.0}
+
+
+def _run(script, vision):
+    ac = AutomationController()
+    results = []
+    ac.on_node_executed = lambda nid, ok: results.append((nid, ok))
+    ac.execute_visual_script(script, vision)
+    return results
+
+
+def test_wait_for_wakes_on_the_frame_where_label_appears():
+    feed = VisionFeed()
+    feed.publish({"found_targets": []})
+    appeared_at = []
+
+    def _publish_later():
+        appeared_at.append(time.perf_counter())
+        feed.publish({"found_targets": [_target("A")]})
+
+    threading.Timer(0.1, _publish_later).start()
+    n1 = VisualNode(id="n1", type="wait_for", params={"label": "A", "timeout": 5.0})
+    n2 = VisualNode(id="n2", type="sleep", params={"seconds": 0})
+    vs = VisualScript(id="s", name="s", nodes=[n1, n2], connections={"n1": "n2"})
+    results = _run(vs, feed)
+    reaction = time.perf_counter() - appeared_at[0]
+    assert results == [("n1", True), ("n2", True)]
+    print(f"wait_for reaction after frame publish: {reaction * 1000:.3f} ms")
+    assert reaction < 0.05
+
+
+def test_wait_for_timeout_takes_timeout_branch():
+    n1 = VisualNode(id="n1", type="wait_for", params={"label": "A", "timeout": 0.1, "next_timeout": "n3"})
+    n2 = VisualNode(id="n2", type="sleep", params={"seconds": 0})
+    n3 = VisualNode(id="n3", type="sleep", params={"seconds": 0})
+    vs = VisualScript(id="s", name="s", nodes=[n1, n2, n3], connections={"n1": "n2"})
+    assert _run(vs, {"found_targets": []}) == [("n1", False), ("n3", True)]
+
+
+def test_wait_for_timeout_without_branch_ends_run():
+    n1 = VisualNode(id="n1", type="wait_for", params={"label": "A", "timeout": 0.05})
+    n2 = VisualNode(id="n2", type="sleep", params={"seconds": 0})
+    vs = VisualScript(id="s", name="s", nodes=[n1, n2], connections={"n1": "n2"})
+    assert _run(vs, lambda: {"found_targets": []}) == [("n1", False)]
+
+
+def test_wait_for_disappear():
+    feed = VisionFeed()
+    feed.publish({"found_targets": [_target("A")]})
+    threading.Timer(0.05, lambda: feed.publish({"found_targets": []})).start()
+    n1 = VisualNode(id="n1", type="wait_for", params={"label": "A", "until": "disappear", "timeout": 5.0})
+    vs = VisualScript(id="s", name="s", nodes=[n1])
+    assert _run(vs, feed) == [("n1", True)]
+
+
+def test_wait_for_releases_leased_frames_it_has_moved_past():
+    from game_automation.core.frame_ring import FrameRing
+    ring = FrameRing({"frame": (2, 2)}, slots=3)
+    feed = VisionFeed()
+
+    def publish(found):
+        lease = ring.acquire()
+        feed.publish({"found_targets": found, "frame_lease": lease})
+        lease.release()
+
+    publish([])
+
+    def produce():
+        for i in range(50):
+            time.sleep(0.002)
+            publish([_target("A")] if i >= 40 else [])
+
+    threading.Thread(target=produce, daemon=True).start()
+    n1 = VisualNode(id="n1", type="wait_for", params={"label": "A", "timeout": 5.0})
+    vs = VisualScript(id="s", name="s", nodes=[n1])
+    assert _run(vs, feed) == [("n1", True)]
+    # Feed, node and producer never need more than the preallocated slots
+    assert ring.stats()["allocations"] == 3
+
+
+def test_wait_for_on_a_static_result_sleeps_between_checks(monkeypatch):
+    from game_automation.core import node_handlers
+    from game_automation.core.actions import Action, ActionSequence
+    from game_automation.core.automation import VISION_POLL_INTERVAL
+    checks = []
+    real_check = node_handlers._wait_condition_met
+
+    def counting_check(*args):
+        checks.append(time.monotonic())
+        return real_check(*args)
+    monkeypatch.setattr(node_handlers, "_wait_condition_met", counting_check)
+    seq = ActionSequence(actions=[Action(type="wait_for", params={"label": "A", "timeout": 0.5})])
+    cpu = time.process_time()
+    AutomationController().run_sequence(seq, {"found_targets": []})
+    cpu = time.process_time() - cpu
+    # A single result without a source to re-read: one check per poll interval, not a busy spin
+    assert len(checks) <= 0.5 / VISION_POLL_INTERVAL + 2
+    assert cpu < 0.25
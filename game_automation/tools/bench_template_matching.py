@@ -0,0 +1,99 @@
+"""
+Benchmark per-frame TemplateMatcher latency against template count, serial vs. worker pool.
+
+Uses synthetic templates, so no screen or template files are needed:
+
+    python game_automation/tools/bench_template_matching.py --width 1920 --height 1080 --workers 4
+
+With --peaks, benchmarks multi-instance peak extraction + NMS on a response map
+of the given frame size with that many planted candidate peaks instead:
+
+    python game_automation/tools/bench_template_matching.py --width 3840 --height 2160 --peaks 100,300,1000
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from game_automation.core import targets
+from game_automation.core.template_matcher import TemplateMatcher, extract_peaks
+
+
+def build_matcher(count, tmpl_size, workers):
+    rng = np.random.default_rng(0)
+    labels = [f"BENCH_{i}" for i in range(count)]
+    matcher = TemplateMatcher(workers=0)
+    matcher.templates = {label: rng.integers(0, 255, (tmpl_size, tmpl_size), dtype=np.uint8) for label in labels}
+    matcher.template_sizes = {label: (tmpl_size, tmpl_size) for label in labels}
+    targets.TARGET_DEFINITIONS.clear()
+    for i, label in enumerate(labels):
+        # Spread ROIs over the frame like real targets (each covers half of it)
+        x0 = (i % 2) * 0.5
+        targets.TARGET_DEFINITIONS[label] = {"template": "", "method": "tm", "threshold": 0.99, "roi": [x0, 0.0, x0 + 0.5, 1.0]}
+    matcher.set_workers(workers)
+    return matcher
+
+
+def time_match(matcher, frame, repeats):
+    matcher.match(frame)  # Warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        matcher.match(frame)
+    return (time.perf_counter() - t0) / repeats * 1000.0
+
+
+def bench_peaks(args):
+    tmpl = args.template_size
+    rng = np.random.default_rng(2)
+    h, w = args.height - tmpl + 1, args.width - tmpl + 1
+    print(f"response map {w}x{h} (frame {args.width}x{args.height}, template {tmpl}px)")
+    print(f"{'peaks':>8} {'found':>8} {'extract ms':>11}")
+    for count in [int(c) for c in args.peaks.split(",") if c]:
+        res = rng.uniform(-0.2, 0.5, (h, w)).astype(np.float32)
+        ys = rng.integers(0, h, count)
+        xs = rng.integers(0, w, count)
+        res[ys, xs] = rng.uniform(0.9, 1.0, count).astype(np.float32)
+        extract_peaks(res, 0.85, tmpl, tmpl, count)  # Warm-up
+        t0 = time.perf_counter()
+        for _ in range(args.repeats):
+            peaks = extract_peaks(res, 0.85, tmpl, tmpl, count)
+        elapsed = (time.perf_counter() - t0) / args.repeats * 1000.0
+        print(f"{count:>8} {len(peaks):>8} {elapsed:>11.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--template-size", type=int, default=48)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--counts", type=str, default="1,5,10,25,50")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--peaks", type=str, default="", help="comma-separated planted peak counts (peak extraction benchmark)")
+    args = parser.parse_args()
+
+    if args.peaks:
+        bench_peaks(args)
+        return
+
+    frame = np.random.default_rng(1).integers(0, 255, (args.height, args.width), dtype=np.uint8)
+    # Keep the registry version stable so match() never reloads real templates
+    targets.TARGETS_VERSION = getattr(targets, "TARGETS_VERSION", 0)
+    print(f"frame {args.width}x{args.height}, template {args.template_size}px, {args.workers} workers, cpu_count={os.cpu_count()}")
+    print(f"{'templates':>10} {'serial ms':>10} {'parallel ms':>12} {'speedup':>8}")
+    for count in [int(c) for c in args.counts.split(",") if c]:
+        serial = build_matcher(count, args.template_size, 0)
+        t_serial = time_match(serial, frame, args.repeats)
+        serial.close()
+        parallel = build_matcher(count, args.template_size, args.workers)
+        t_parallel = time_match(parallel, frame, args.repeats)
+        parallel.close()
+        print(f"{count:>10} {t_serial:>10.2f} {t_parallel:>12.2f} {t_serial / t_parallel:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Build the precompiled template bundle (see core/template_bundle.py) ahead of time.
+
+Loads every template defined in resources.json once and writes the bundle, so the
+next start of the application memory-maps templates instead of decoding PNGs:
+
+    python game_automation/tools/build_template_bundle.py [--dir PATH]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from game_automation.core.template_bundle import TemplateBundle, default_bundle_dir
+from game_automation.core.template_matcher import TemplateMatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dir", default=default_bundle_dir(), help="bundle directory (default: <project root>/.template_cache)")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    matcher = TemplateMatcher(bundle_dir=args.dir)
+    load_ms = (time.perf_counter() - t0) * 1000
+    print(f"loaded {len(matcher.templates)} templates in {load_ms:.1f} ms {matcher.last_reload_stats}")
+
+    # Loading writes the bundle in the background unless an up-to-date one already exists
+    matcher.wait_for_bundle()
+    bundle = matcher.bundle
+    if bundle is None:
+        print(f"failed to write bundle to {args.dir}")
+        return 1
+    t0 = time.perf_counter()
+    mapped = TemplateMatcher(bundle_dir=args.dir)
+    map_ms = (time.perf_counter() - t0) * 1000
+    print(f"bundle: {args.dir} ({len(TemplateBundle.load(args.dir))} templates)")
+    print(f"reload from bundle: {map_ms:.1f} ms {mapped.last_reload_stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
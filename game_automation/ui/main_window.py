@@ -1,16 +1,23 @@
-from typing import Optional, List
+from typing import Optional, List, Union
 import os
-from PySide6.QtCore import Qt, Signal, QObject, QThread, QTimer, QPointF, QMutex
+from PySide6.QtCore import Qt, Signal, QObject, QThread, QTimer, QPointF
 from PySide6.QtGui import QImage, QPixmap, QFont
 from PySide6.QtWidgets import QMainWindow, QWidget, QSplitter, QVBoxLayout, QHBoxLayout, QLabel, QListWidget, QPushButton, QStatusBar, QFormLayout, QLineEdit, QComboBox, QDoubleSpinBox, QFileDialog, QMessageBox, QApplication, QCompleter, QScrollArea, QInputDialog, QTextEdit, QDockWidget
 from .visual_script_editor import VisualScriptEditor, VisualNodeItem, CommentItem
 from .widgets import ResourceSidebar
 from .themes import LIGHT_QSS
 from ..core.actions import VisualScript, VisualNode
-from ..core.screen_capture import ScreenCaptureWorker
-from ..core.image_processor import ImageProcessor
+from ..core.vision_pipeline import VisionPipeline
+from ..core.vision_process import VisionProcess
+from ..core.template_bundle import default_bundle_dir
+from ..core.capture_backends import PACING_REALTIME, create_capture_backend, load_capture_config
+from ..core.image_processor import get_shared_image_processor
 from ..core.performance_monitor import PerformanceMonitor
+from ..core.tracer import get_tracer, load_trace_config
 from ..core.automation import AutomationController
+from ..core.vision_feed import VisionFeed
+import threading
+import time
 import traceback
 
 # Base directory for JSON files (project root)
@@ -18,6 +25,10 @@ import traceback
 # Legacy files like scripts.json and game_automation/*.json are deprecated and no longer used.
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 
+# Stage latency panel: refresh interval and the window its percentiles cover (seconds)
+LATENCY_REFRESH_SECONDS = 1.0
+LATENCY_DISPLAY_WINDOW = 10.0
+
 
 def _to_relative_path(path: str) -> str:
     """
@@ -216,6 +227,11 @@ class PropertiesPanel(QWidget):
             return
         t = node.type
         if t == "click":
+            combo_mode = QComboBox()
+            combo_mode.addItems(["label", "instance", "bbox"])
+            idx = combo_mode.findText(str(node.params.get("mode", "label")))
+            if idx >= 0:
+                combo_mode.setCurrentIndex(idx)
             edit_label = QLineEdit(str(node.params.get("label", "")))
             self._setup_label_autocomplete(edit_label)
             self._label_line_edits.append(edit_label)
@@ -229,9 +245,11 @@ class PropertiesPanel(QWidget):
             spin_dur.setDecimals(2)
             spin_dur.setSingleStep(0.1)
             spin_dur.setValue(float(node.params.get("duration", 0.0)))
+            self.form.addRow("模式", combo_mode)
             self.form.addRow("標籤", edit_label)
             self.form.addRow("按鈕", combo_btn)
             self.form.addRow("持續秒數", spin_dur)
+            combo_mode.currentTextChanged.connect(lambda v: self._update_param("mode", v))
             edit_label.textChanged.connect(lambda v: self._update_param("label", v))
             combo_btn.currentTextChanged.connect(lambda v: self._update_param("button", v))
             spin_dur.valueChanged.connect(lambda v: self._update_param("duration", float(v)))
@@ -327,6 +345,94 @@ class PropertiesPanel(QWidget):
             self.form.addRow("迴圈體", edit_body)
             self.form.addRow("迴圈後", edit_after)
             spin_count.valueChanged.connect(lambda v: self._update_param("count", int(v)))
+        elif t == "find_all":
+            edit_label = QLineEdit(str(node.params.get("label", "")))
+            self._setup_label_autocomplete(edit_label)
+            self._label_line_edits.append(edit_label)
+            spin_min_confidence = QDoubleSpinBox()
+            spin_min_confidence.setRange(0.0, 1.0)
+            spin_min_confidence.setDecimals(2)
+            spin_min_confidence.setSingleStep(0.05)
+            spin_min_confidence.setValue(float(node.params.get("min_confidence", 0.0)))
+            spin_max_count = QDoubleSpinBox()
+            spin_max_count.setRange(0, 100)
+            spin_max_count.setDecimals(0)
+            spin_max_count.setSingleStep(1)
+            spin_max_count.setValue(float(node.params.get("max_count", 0)))
+            combo_order = QComboBox()
+            combo_order.addItems(["position", "confidence"])
+            idx = combo_order.findText(str(node.params.get("order", "position")))
+            if idx >= 0:
+                combo_order.setCurrentIndex(idx)
+            next_body_id = str(node.params.get("next_body", ""))
+            next_after_id = str(node.params.get("next_after", ""))
+            body_label = self._get_node_label(next_body_id) if next_body_id else ""
+            after_label = self._get_node_label(next_after_id) if next_after_id else ""
+            edit_body = QLineEdit(body_label if body_label else next_body_id)
+            edit_after = QLineEdit(after_label if after_label else next_after_id)
+            edit_body.setReadOnly(True)
+            edit_after.setReadOnly(True)
+            self.form.addRow("標籤", edit_label)
+            self.form.addRow("最小置信度", spin_min_confidence)
+            self.form.addRow("最多數量", spin_max_count)
+            self.form.addRow("順序", combo_order)
+            self.form.addRow("迴圈體", edit_body)
+            self.form.addRow("迴圈後", edit_after)
+            edit_label.textChanged.connect(lambda v: self._update_param("label", v))
+            spin_min_confidence.valueChanged.connect(lambda v: self._update_param("min_confidence", float(v)))
+            spin_max_count.valueChanged.connect(lambda v: self._update_param("max_count", int(v)))
+            combo_order.currentTextChanged.connect(lambda v: self._update_param("order", v))
+        elif t == "wait_for":
+            combo_mode = QComboBox()
+            combo_mode.addItems(["label", "color"])
+            idx = combo_mode.findText(str(node.params.get("mode", "label")))
+            if idx >= 0:
+                combo_mode.setCurrentIndex(idx)
+            combo_until = QComboBox()
+            combo_until.addItems(["appear", "disappear"])
+            idx = combo_until.findText(str(node.params.get("until", "appear")))
+            if idx >= 0:
+                combo_until.setCurrentIndex(idx)
+            edit_label = QLineEdit(str(node.params.get("label", "")))
+            self._setup_label_autocomplete(edit_label)
+            self._label_line_edits.append(edit_label)
+            spin_min_confidence = QDoubleSpinBox()
+            spin_min_confidence.setRange(0.0, 1.0)
+            spin_min_confidence.setDecimals(2)
+            spin_min_confidence.setSingleStep(0.05)
+            spin_min_confidence.setValue(float(node.params.get("min_confidence", 0.0)))
+            spin_timeout = QDoubleSpinBox()
+            spin_timeout.setRange(0.0, 3600.0)
+            spin_timeout.setDecimals(1)
+            spin_timeout.setSingleStep(1.0)
+            spin_timeout.setValue(float(node.params.get("timeout", 10.0)))
+            next_timeout_id = str(node.params.get("next_timeout", ""))
+            timeout_label = self._get_node_label(next_timeout_id) if next_timeout_id else ""
+            edit_timeout_next = QLineEdit(timeout_label if timeout_label else next_timeout_id)
+            edit_timeout_next.setReadOnly(True)
+            edit_hmin = QLineEdit(",".join(str(x) for x in (node.params.get("hsv_min") or [])))
+            edit_hmax = QLineEdit(",".join(str(x) for x in (node.params.get("hsv_max") or [])))
+            edit_bmin = QLineEdit(",".join(str(x) for x in (node.params.get("bgr_min") or [])))
+            edit_bmax = QLineEdit(",".join(str(x) for x in (node.params.get("bgr_max") or [])))
+            self.form.addRow("模式", combo_mode)
+            self.form.addRow("等待直到", combo_until)
+            self.form.addRow("標籤", edit_label)
+            self.form.addRow("最小置信度", spin_min_confidence)
+            self.form.addRow("逾時秒數", spin_timeout)
+            self.form.addRow("逾時走向", edit_timeout_next)
+            self.form.addRow("HSV 最小", edit_hmin)
+            self.form.addRow("HSV 最大", edit_hmax)
+            self.form.addRow("BGR 最小", edit_bmin)
+            self.form.addRow("BGR 最大", edit_bmax)
+            combo_mode.currentTextChanged.connect(lambda v: self._update_param("mode", v))
+            combo_until.currentTextChanged.connect(lambda v: self._update_param("until", v))
+            edit_label.textChanged.connect(lambda v: self._update_param("label", v))
+            spin_min_confidence.valueChanged.connect(lambda v: self._update_param("min_confidence", float(v)))
+            spin_timeout.valueChanged.connect(lambda v: self._update_param("timeout", float(v)))
+            edit_hmin.textChanged.connect(lambda v: self._update_param("hsv_min", self._parse_list(v)))
+            edit_hmax.textChanged.connect(lambda v: self._update_param("hsv_max", self._parse_list(v)))
+            edit_bmin.textChanged.connect(lambda v: self._update_param("bgr_min", self._parse_list(v)))
+            edit_bmax.textChanged.connect(lambda v: self._update_param("bgr_max", self._parse_list(v)))
         elif t == "find_image":
             # Template name dropdown - get from sidebar templates and TARGET_DEFINITIONS
             combo_template = QComboBox()
@@ -522,7 +628,9 @@ class PropertiesPanel(QWidget):
             "condition": "條件",
             "loop": "迴圈",
             "find_image": "找圖片",
-            "verify_image_color": "驗證圖片顏色"
+            "verify_image_color": "驗證圖片顏色",
+            "wait_for": "等待畫面",
+            "find_all": "找全部"
         }
         type_name = type_names.get(node.type, node.type)
         return f"{type_name} ({node_id})"
@@ -572,22 +680,33 @@ class PropertiesPanel(QWidget):
 
 class FrameUpdateSignal(QObject):
     """Signal object for thread-safe frame updates"""
-    frame_ready = Signal(QImage, float)  # qimg, fps
+    frame_ready = Signal(QImage, float, object)  # qimg, fps, self-mask rect in frame pixels (or None)
 
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Game Automation Studio")
-        self._automation = AutomationController(scale_factor=1.0)
+        # Process-wide vision service shared by the capture path and the automation engine
+        self._image_processor = get_shared_image_processor()
+        self._automation = AutomationController(scale_factor=1.0, image_processor=self._image_processor)
         self._build_ui()
         self.setStyleSheet(LIGHT_QSS)
-        self._capture_worker: Optional[ScreenCaptureWorker] = None
+        self._vision_pipeline: Optional[Union[VisionPipeline, VisionProcess]] = None
         self._capture_region: Optional[dict] = None
         self._window_geometry: Optional[dict] = None  # Store window geometry for thread-safe access
-        self._image_processor = ImageProcessor()
         self._perf = PerformanceMonitor(window_seconds=1.0)
+        self._automation.latency_monitor = self._perf
+        # Process/thread CPU and memory of this process (and the vision child process), shown in the status bar
+        self._perf.start_resource_sampling()
+        self._trace_config = load_trace_config()
+        get_tracer().enabled = bool(self._trace_config.get("enabled", True))
+        # Frame-ring lease of the frame waiting to be drawn by _on_frame_ui (None: nothing pending)
+        self._display_lease = None
+        self._alloc_rate = 0.0
         self._latest_vision_result: dict = {}
+        # Sequence-numbered vision results; the script runner blocks on it for post-input frames
+        self._vision_feed = VisionFeed()
         self._script_cache: dict[str, VisualScript] = {}
         self._current_script_name: Optional[str] = None
         # Signal for thread-safe frame updates
@@ -598,6 +717,10 @@ class MainWindow(QMainWindow):
         self._autosave_timer = QTimer(self)
         self._autosave_timer.setSingleShot(True)
         self._autosave_timer.timeout.connect(self._autosave_scripts)
+        self._latency_timer = QTimer(self)
+        self._latency_timer.setInterval(int(LATENCY_REFRESH_SECONDS * 1000))
+        self._latency_timer.timeout.connect(self._update_latency_monitor)
+        self._latency_timer.start()
         # Initialize window geometry for thread-safe access
         try:
             geo = self.frameGeometry()
@@ -777,6 +900,18 @@ class MainWindow(QMainWindow):
         self._node_results_text.setStyleSheet("background-color: #1e1e1e; color: #d4d4d4;")
         var_monitor_layout.addWidget(self._node_results_text)
         
+        # Per-stage latency percentiles (refreshed by _latency_timer)
+        latency_label = QLabel("階段延遲 (ms):")
+        latency_label.setFont(QFont("Consolas", 9))
+        latency_label.setStyleSheet("font-weight: bold;")
+        var_monitor_layout.addWidget(latency_label)
+        self._latency_text = QTextEdit()
+        self._latency_text.setReadOnly(True)
+        self._latency_text.setFont(QFont("Consolas", 8))
+        self._latency_text.setMaximumHeight(160)
+        self._latency_text.setStyleSheet("background-color: #1e1e1e; color: #d4d4d4;")
+        var_monitor_layout.addWidget(self._latency_text)
+        
         var_monitor_dock.setWidget(var_monitor_widget)
         self.addDockWidget(Qt.LeftDockWidgetArea, var_monitor_dock)
         self._var_monitor_dock = var_monitor_dock
@@ -811,10 +946,13 @@ class MainWindow(QMainWindow):
         btn_undo.setToolTip("撤銷上一步操作 (Ctrl+Z)")
         btn_redo = QPushButton("重做", self)
         btn_redo.setToolTip("重做上一步操作 (Ctrl+Shift+Z)")
+        btn_trace = QPushButton("匯出追蹤", self)
+        btn_trace.setToolTip("將最近的管線與腳本執行時間軸匯出為 Chrome trace JSON（可用 Perfetto 開啟）")
         toolbar.addWidget(btn_start)
         toolbar.addWidget(btn_exec)
         toolbar.addWidget(btn_stop)
         toolbar.addWidget(btn_validate)
+        toolbar.addWidget(btn_trace)
         toolbar.addSeparator()
         toolbar.addWidget(btn_record)
         toolbar.addWidget(btn_step)
@@ -848,6 +986,7 @@ class MainWindow(QMainWindow):
         btn_exec.clicked.connect(self._run_current_script)
         btn_stop.clicked.connect(self._stop_current_script)
         btn_validate.clicked.connect(self._validate_current_script)
+        btn_trace.clicked.connect(self._export_trace_dialog)
         btn_record.toggled.connect(self._toggle_recording_mode)
         btn_step.clicked.connect(self._step_execute)
         btn_continue.clicked.connect(self._continue_execution)
@@ -927,126 +1066,215 @@ class MainWindow(QMainWindow):
             pass
 
     def _start_capture(self):
-        import mss
-        with mss.mss() as sct:
-            mon = sct.monitors[1]
-            region = {"left": mon["left"], "top": mon["top"], "width": mon["width"], "height": mon["height"]}
-        self._capture_region = region
-        if self._capture_worker:
+        # Frame source comes from the "capture" section of resources.json (default: live mss)
+        config = load_capture_config()
+        try:
+            backend = create_capture_backend(config)
+            pacing = config.get("pacing", PACING_REALTIME)
+            region = backend.region
+        except Exception as e:
+            print(f"[MainWindow] Invalid capture config {config}: {e}")
+            self.statusBar().showMessage(f"截圖來源設定錯誤：{e}", 5000)
+            return
+        # Only live capture shows this window; replayed frames need no self-masking
+        self._capture_region = region if backend.live else None
+        if self._vision_pipeline:
             try:
-                self._capture_worker.stop()
+                self._vision_pipeline.stop()
             except Exception:
                 pass
-        self._capture_worker = ScreenCaptureWorker(region=region, fps=60, callback=self._on_frame)
-        self._capture_worker.start()
-        self.statusBar().showMessage("截圖已開始")
+        self._perf.unwatch_process("vision")
+        # Unless "auto_crop" is false, only the area the targets in scope can be found in is captured (see capture_crop)
+        crop = self._image_processor.capture_crop if config.get("auto_crop", True) else None
+        if config.get("process"):
+            # Capture and matching run in a child process; frames arrive through shared memory (see VisionProcess)
+            backend.close()
+            self._vision_pipeline = VisionProcess(self._image_processor, self._publish_frame, capture_config=config, region=region, fps=60, pacing=pacing, match_workers=self._image_processor.matcher.workers, template_bundle_dir=default_bundle_dir(), change_detection=getattr(self._image_processor, "change_detector", None) is not None, crop=crop)
+        else:
+            # Capture, preprocess, match and publish each run on their own thread (see VisionPipeline)
+            self._vision_pipeline = VisionPipeline(self._image_processor, self._publish_frame, backend=backend, fps=60, pacing=pacing, crop=crop)
+        self._vision_pipeline.start()
+        if isinstance(self._vision_pipeline, VisionProcess):
+            self._perf.watch_process("vision", self._vision_pipeline.pid, self._vision_pipeline.thread_names)
+        if backend.live:
+            self.statusBar().showMessage("截圖已開始")
+        else:
+            self.statusBar().showMessage(f"重播已開始：{config.get('backend')}（{pacing}）")
+
+    def _frame_allocated_bytes(self) -> int:
+        total = self._image_processor.allocation_stats().get("allocated_bytes", 0) if hasattr(self._image_processor, "allocation_stats") else 0
+        pipeline = self._vision_pipeline
+        if pipeline is not None and pipeline.frame_ring is not None:
+            total += pipeline.frame_ring.stats()["allocated_bytes"]
+        return total
+
+    def _change_stats(self) -> dict:
+        pipeline = self._vision_pipeline
+        if isinstance(pipeline, VisionProcess):
+            # Matching (and its change detection) runs in the child process
+            return pipeline.stats().get("changes", {})
+        return self._image_processor.change_stats() if hasattr(self._image_processor, "change_stats") else {}
 
-    def _on_frame(self, frame_bgra, ts: float):
-        # This callback runs on the worker thread - do non-GUI processing here
+    def _publish_frame(self, res: dict, ts: float):
+        # Runs on the pipeline's publish thread - do non-GUI processing here
         # Do NOT call any GUI methods here (like self.frameGeometry()) as the window may be deleted
+        # The pipeline releases its frame ring reference afterwards; the feed and the display take their own
         self._perf.tick(ts)
-        res = self._image_processor.process_frame(frame_bgra)
+        self._perf.record_latencies(res.get("timings", {}))
+        self._vision_feed.publish(res, timestamp=ts)
         self._latest_vision_result = res
+        self._perf.sample_allocations(ts, self._frame_allocated_bytes())
+        self._alloc_rate = self._perf.allocation_rate()
+        self._perf.sample_change_stats(ts, self._change_stats())
         frame_bgr = res["frame"]
+        lease = res.get("frame_lease")
         
         # Process frame data (non-GUI work)
         # Use stored window geometry instead of calling GUI methods
+        mask = None
         if self._capture_region and self._window_geometry:
             wx = self._window_geometry["x"]
             wy = self._window_geometry["y"]
             ww = self._window_geometry["width"]
             wh = self._window_geometry["height"]
-            rx, ry, rw, rh = self._capture_region["left"], self._capture_region["top"], self._capture_region["width"], self._capture_region["height"]
+            # Screen rectangle covered by the frame (a capture crop starts at "frame_origin")
+            ox, oy = res.get("frame_origin", (0, 0))
+            rx, ry = self._capture_region["left"] + ox, self._capture_region["top"] + oy
+            rh, rw = frame_bgr.shape[:2]
             x1 = max(wx, rx)
             y1 = max(wy, ry)
             x2 = min(wx + ww, rx + rw)
             y2 = min(wy + wh, ry + rh)
             if x2 > x1 and y2 > y1:
-                import cv2
-                cv2.rectangle(frame_bgr, (x1 - rx, y1 - ry), (x2 - rx, y2 - ry), (255, 255, 255), -1)
+                # Painted over the preview only; the frame is shared with the nodes' pixel checks
+                mask = (x1 - rx, y1 - ry, x2 - rx, y2 - ry)
         
-        import cv2
-        rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        h, w = rgb.shape[:2]
+        if lease is not None and self._display_lease is not None:
+            # The GUI has not drawn the previous frame yet; only the newest frame matters
+            return
+        h, w = frame_bgr.shape[:2]
         bytes_per_line = 3 * w
-        # Create QImage with a copy of the data to avoid memory reference issues
-        qimg = QImage(rgb.copy(), w, h, bytes_per_line, QImage.Format_RGB888)
+        qimage_start = time.perf_counter()
+        if lease is not None and lease.retain():
+            # Zero-copy: the QImage wraps the ring slot, which stays reserved until the GUI drew it
+            self._display_lease = lease
+            qimg = QImage(frame_bgr.data, w, h, bytes_per_line, QImage.Format_BGR888)
+        else:
+            # Create QImage with a copy of the data to avoid memory reference issues
+            qimg = QImage(frame_bgr.copy(), w, h, bytes_per_line, QImage.Format_BGR888)
+        self._perf.record_latency("qimage", (time.perf_counter() - qimage_start) * 1000.0)
         fps = self._perf.fps()
         
         # Emit signal to queue GUI update on main thread
         # Check if window is closing to prevent RuntimeError when signal source is deleted
         if not self._is_closing and self._frame_signal is not None:
             try:
-                self._frame_signal.frame_ready.emit(qimg, fps)
+                self._frame_signal.frame_ready.emit(qimg, fps, mask)
+                return
             except RuntimeError:
                 # Signal source has been deleted, ignore
                 pass
+        self._release_display_lease()
+
+    def _release_display_lease(self):
+        lease, self._display_lease = self._display_lease, None
+        if lease is not None:
+            lease.release()
     
-    def _on_frame_ui(self, qimg: QImage, fps: float):
+    def _on_frame_ui(self, qimg: QImage, fps: float, mask=None):
         """Handle frame updates on the GUI thread"""
-        self.statusBar().showMessage(f"FPS: {fps:.1f}")
+        paint_start = time.perf_counter()
+        try:
+            self._draw_preview(qimg, fps, mask)
+        finally:
+            paint_end = time.perf_counter()
+            self._perf.record_latency("paint", (paint_end - paint_start) * 1000.0)
+            get_tracer().complete("paint", "ui", paint_start, paint_end)
+            # qimg may wrap a frame ring slot; it must not be used after this point
+            self._release_display_lease()
+
+    def _draw_preview(self, qimg: QImage, fps: float, mask=None):
+        message = f"FPS: {fps:.1f}"
+        pipeline = self._vision_pipeline
+        stats = pipeline.stats() if pipeline is not None else {}
+        if "capture" in stats and "match" in stats:
+            dropped = sum(stage.get("dropped", 0) for stage in stats.values())
+            message += f" | 擷取: {stats['capture']['fps']:.1f} | 比對: {stats['match']['avg_ms']:.1f} ms | 丟棄: {dropped}"
+        changes = self._perf.change_detection()
+        if self._perf.change_samples:
+            message += f" | 略過比對: {changes['hit_rate']:.0%}（省 {changes['saved_ms_per_s']:.0f} ms/s）"
+        message += f" | 影格配置: {self._alloc_rate / 1024:.0f} KB/s"
+        processes = self._perf.process_resources().get("processes", {})
+        for label, caption in (("main", "主程序"), ("vision", "視覺程序")):
+            proc = processes.get(label)
+            if proc:
+                message += f" | {caption} CPU: {proc['cpu_percent']:.0f}% RSS: {proc['rss'] / 1048576:.0f} MB"
+        self.statusBar().showMessage(message)
         
         # Update preview panel if not frozen
         if hasattr(self, '_preview_label') and self._preview_label and not self._preview_frozen:
-            # Draw detection boxes on the frame
-            preview_img = qimg.copy()
-            detection_boxes_info = []  # Store box info for click detection
+            # Get original image size for coordinate mapping
+            orig_w = qimg.width()
+            orig_h = qimg.height()
+            
+            # Scale image to fit preview label (the scaled copy is the only one made)
+            preview_size = self._preview_label.size()
+            scaled = qimg.scaled(
+                preview_size,
+                Qt.KeepAspectRatio,
+                Qt.SmoothTransformation
+            )
             
+            # Calculate scale factors for coordinate mapping
+            scale_x = scaled.width() / orig_w if orig_w > 0 else 1.0
+            scale_y = scaled.height() / orig_h if orig_h > 0 else 1.0
+            
+            # Calculate offset (centered scaling)
+            offset_x = (preview_size.width() - scaled.width()) / 2
+            offset_y = (preview_size.height() - scaled.height()) / 2
+            
+            if mask is not None:
+                # Hide this window where it overlaps the capture (no recursive preview)
+                from PySide6.QtGui import QPainter, QColor
+                painter = QPainter(scaled)
+                mx1, my1, mx2, my2 = mask
+                painter.fillRect(int(mx1 * scale_x), int(my1 * scale_y), int((mx2 - mx1) * scale_x) + 1, int((my2 - my1) * scale_y) + 1, QColor(255, 255, 255))
+                painter.end()
+
+            # Draw detection boxes on the scaled frame
+            detection_boxes_info = []  # Store box info for click detection
             if self._latest_vision_result and "found_targets" in self._latest_vision_result:
                 from PySide6.QtGui import QPainter, QPen, QColor
-                painter = QPainter(preview_img)
+                painter = QPainter(scaled)
                 pen = QPen(QColor(0, 255, 0), 2)
                 painter.setPen(pen)
                 
-                # Get original image size for coordinate mapping
-                orig_w = qimg.width()
-                orig_h = qimg.height()
-                
+                # The frame may be a capture crop; bboxes are in full-frame pixels
+                ox, oy = self._latest_vision_result.get("frame_origin", (0, 0))
                 for det in self._latest_vision_result["found_targets"]:
                     bbox = det.get("bbox", [])
                     if len(bbox) == 4:
-                        x1, y1, x2, y2 = bbox
-                        # Draw on preview image (original coordinates)
-                        painter.drawRect(int(x1), int(y1), int(x2 - x1), int(y2 - y1))
+                        x1, y1, x2, y2 = bbox[0] - ox, bbox[1] - oy, bbox[2] - ox, bbox[3] - oy
+                        # Draw on the scaled image (scaled coordinates)
+                        painter.drawRect(int(x1 * scale_x), int(y1 * scale_y), int((x2 - x1) * scale_x), int((y2 - y1) * scale_y))
                         # Draw label
                         label = det.get("label", "")
                         if label:
-                            painter.drawText(int(x1), int(y1) - 5, label)
+                            painter.drawText(int(x1 * scale_x), int(y1 * scale_y) - 5, label)
                         
-                        # Store box info for click detection (will be scaled later)
+                        # Store box info for click detection
                         detection_boxes_info.append({
                             "bbox": bbox,
                             "label": label,
-                            "screen_coords": None  # Will be calculated after scaling
+                            "screen_coords": (
+                                int(x1 * scale_x + offset_x),
+                                int(y1 * scale_y + offset_y),
+                                int(x2 * scale_x + offset_x),
+                                int(y2 * scale_y + offset_y),
+                            ),
                         })
                 painter.end()
             
-            # Scale image to fit preview label
-            preview_size = self._preview_label.size()
-            scaled = preview_img.scaled(
-                preview_size,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            
-            # Calculate scale factors for coordinate mapping
-            scale_x = scaled.width() / orig_w if orig_w > 0 else 1.0
-            scale_y = scaled.height() / orig_h if orig_h > 0 else 1.0
-            
-            # Calculate offset (centered scaling)
-            offset_x = (preview_size.width() - scaled.width()) / 2
-            offset_y = (preview_size.height() - scaled.height()) / 2
-            
-            # Update screen coordinates for detection boxes
-            for box_info in detection_boxes_info:
-                x1, y1, x2, y2 = box_info["bbox"]
-                # Scale and offset coordinates
-                screen_x1 = int(x1 * scale_x + offset_x)
-                screen_y1 = int(y1 * scale_y + offset_y)
-                screen_x2 = int(x2 * scale_x + offset_x)
-                screen_y2 = int(y2 * scale_y + offset_y)
-                box_info["screen_coords"] = (screen_x1, screen_y1, screen_x2, screen_y2)
-            
             # Store detection boxes for click detection
             self._preview_detection_boxes = detection_boxes_info
             if hasattr(self._preview_label, 'set_detection_boxes'):
@@ -1069,9 +1297,9 @@ class MainWindow(QMainWindow):
             return
         
         # Check if node type supports label parameter
-        if node.type in ["click", "condition", "find_image", "verify_image_color"]:
+        if node.type in ["click", "condition", "find_image", "verify_image_color", "wait_for", "find_all"]:
             # Update node parameter
-            if node.type == "click" or node.type == "condition":
+            if node.type in ["click", "condition", "wait_for", "find_all"]:
                 node.params["label"] = label
             elif node.type in ["find_image", "verify_image_color"]:
                 node.params["template_name"] = label
@@ -1118,7 +1346,7 @@ class MainWindow(QMainWindow):
         # Gate script execution on vision frame availability
         if "frame" not in self._latest_vision_result:
             # Ensure capture is running
-            if self._capture_worker is None or not self._capture_worker.is_alive():
+            if self._vision_pipeline is None or not self._vision_pipeline.is_alive():
                 self.statusBar().showMessage("正在啟動畫面擷取...")
                 self._start_capture()
             
@@ -1135,10 +1363,9 @@ class MainWindow(QMainWindow):
     
     def _start_script_runner(self, script):
         """Start the script runner thread (called when frame is ready or immediately if frame exists)"""
-        # Pass a callable that returns the latest vision result for dynamic updates
-        get_vision_result = lambda: self._latest_vision_result or {}
+        # Pass the vision feed: it returns the latest result and lets the engine wait for fresh frames
         try:
-            runner = ScriptRunnerThread(self._automation, script, get_vision_result)
+            runner = ScriptRunnerThread(self._automation, script, self._vision_feed)
             self._script_runner = runner
             
             # Connect signals
@@ -1186,23 +1413,32 @@ class MainWindow(QMainWindow):
         # Note: execution mode status will be cleared in _on_script_thread_finished
     
     def _show_performance_report(self, report: dict):
-        """Show performance report in log panel"""
+        """Show performance report in log panel (node times are NodeStatistics summaries in ms)"""
         self._append_log_message("\n" + "="*60)
-        self._append_log_message("效能報告")
+        self._append_log_message("效能報告（已取消）" if report.get("cancelled") else "效能報告")
         self._append_log_message("="*60)
         self._append_log_message(f"總執行時間: {report['total_duration']:.3f} 秒")
         self._append_log_message(f"總節點執行次數: {report['total_nodes_executed']}")
         self._append_log_message("\n節點執行時間詳情:")
-        for node_id, timing in sorted(report['node_timings'].items(), key=lambda x: x[1]['total_time'], reverse=True):
+        for node_id, timing in sorted(report['nodes'].items(), key=lambda x: x[1]['total'], reverse=True):
             self._append_log_message(f"  {node_id} ({timing['type']}):")
             self._append_log_message(f"    執行次數: {timing['count']}")
-            self._append_log_message(f"    總時間: {timing['total_time']:.3f} 秒")
-            self._append_log_message(f"    平均時間: {timing['avg_time']:.3f} 秒")
-            self._append_log_message(f"    最小/最大: {timing['min_time']:.3f} / {timing['max_time']:.3f} 秒")
+            self._append_log_message(f"    總時間: {timing['total'] / 1000:.3f} 秒")
+            self._append_log_message(f"    平均時間: {timing['mean'] / 1000:.3f} 秒 (標準差 {timing['std'] / 1000:.3f})")
+            self._append_log_message(f"    最小/最大: {timing['min'] / 1000:.3f} / {timing['max'] / 1000:.3f} 秒")
+            self._append_log_message(f"    p50/p95/p99: {timing['p50'] / 1000:.3f} / {timing['p95'] / 1000:.3f} / {timing['p99'] / 1000:.3f} 秒")
         self._append_log_message("\n節點類型摘要:")
-        for node_type, summary in sorted(report['node_type_summary'].items(), key=lambda x: x[1]['total_time'], reverse=True):
-            avg = summary['total_time'] / summary['count'] if summary['count'] > 0 else 0
-            self._append_log_message(f"  {node_type}: {summary['count']} 次, 總時間 {summary['total_time']:.3f} 秒, 平均 {avg:.3f} 秒")
+        for node_type, summary in sorted(report['types'].items(), key=lambda x: x[1]['total'], reverse=True):
+            self._append_log_message(f"  {node_type}: {summary['count']} 次, 總時間 {summary['total'] / 1000:.3f} 秒, 平均 {summary['mean'] / 1000:.3f} 秒, p95 {summary['p95'] / 1000:.3f} 秒")
+        latency = report.get("action_latency")
+        if latency and latency["count"]:
+            fmt = lambda q: f"p50 {q['p50']:.1f} / p95 {q['p95']:.1f} / p99 {q['p99']:.1f} / 最大 {q['max']:.1f} ms"
+            self._append_log_message(f"\n畫面到輸入延遲（最近 {latency['count']} 次輸入）:")
+            self._append_log_message(f"  擷取→輸入: {fmt(latency['total'])}")
+            self._append_log_message(f"  擷取→決策: {fmt(latency['capture_to_decision'])}")
+            self._append_log_message(f"  決策→輸入: {fmt(latency['decision_to_input'])}")
+            for node_id, node in sorted(latency["nodes"].items(), key=lambda x: x[1]["total"]["p95"], reverse=True):
+                self._append_log_message(f"  {node_id} ({node['type']}, {node['count']} 次): {fmt(node['total'])}")
         self._append_log_message("="*60 + "\n")
     
     def _on_script_failed(self, msg: str):
@@ -1276,6 +1512,40 @@ class MainWindow(QMainWindow):
             self._loop_counters_text.setPlainText("無活躍迴圈")
             self._node_results_text.setPlainText("")
         # Note: AutomationController state is reset in its finally block, so we don't need to reset it here
+        if self._trace_config.get("dump_on_script_end"):
+            self._dump_trace_on_script_end()
+    
+    def _trace_path(self, name: str) -> str:
+        """Default trace file path: <trace dir>/<name>_<YYYYmmdd_HHMMSS>.json"""
+        directory = self._trace_config.get("dir", "traces")
+        if not os.path.isabs(directory):
+            directory = os.path.join(BASE_DIR, directory)
+        safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name) or "trace"
+        return os.path.join(directory, f"{safe_name}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    
+    def _dump_trace_on_script_end(self):
+        try:
+            path = self._trace_path(self._current_script_name or "script")
+            count = get_tracer().dump(path)
+            self._append_log_message(f"追蹤檔已儲存（{count} 個區段）: {path}")
+        except Exception as e:
+            print(f"[MainWindow] trace dump failed: {e}")
+    
+    def _export_trace_dialog(self):
+        """Save the tracer's ring buffer as Chrome trace JSON"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "匯出追蹤",
+            self._trace_path("trace"),
+            "Chrome Trace (*.json);;All Files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            count = get_tracer().dump(file_path)
+            self.statusBar().showMessage(f"已匯出 {count} 個區段: {file_path}", 5000)
+        except Exception as e:
+            QMessageBox.warning(self, "匯出失敗", f"無法匯出追蹤檔: {e}")
     
     def _wait_for_first_frame(self, callback=None, **callback_kwargs):
         """
@@ -1321,7 +1591,7 @@ class MainWindow(QMainWindow):
                     delattr(self, '_frame_wait_callback_kwargs')
                 # Invoke callback
                 callback(**kwargs)
-        elif not self._capture_worker or not self._capture_worker.is_alive():
+        elif not self._vision_pipeline or not self._vision_pipeline.is_alive():
             timer.stop()
             # Clear callback references on failure
             if hasattr(self, '_frame_wait_callback'):
@@ -1399,6 +1669,19 @@ class MainWindow(QMainWindow):
         if self._script_runner and self._script_runner.isRunning():
             self.statusBar().showMessage(f"執行模式：{mode_text}", 0)
     
+    def _update_latency_monitor(self):
+        """Show p50/p95/p99/max per stage over the last LATENCY_DISPLAY_WINDOW seconds"""
+        if not hasattr(self, '_latency_text'):
+            return
+        stats = self._perf.latency_stats(window=LATENCY_DISPLAY_WINDOW)
+        lines = [f"{stage:<20} {s['p50']:7.2f} {s['p95']:7.2f} {s['p99']:7.2f} {s['max']:7.2f}"
+                 for stage, s in sorted(stats.items()) if s["count"]]
+        if not lines:
+            self._latency_text.setPlainText("尚無資料")
+            return
+        header = f"{'階段':<18} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}"
+        self._latency_text.setPlainText("\n".join([header] + lines))
+    
     def _update_variable_monitor(self):
         """Update variable monitor with current execution state"""
         if not hasattr(self, '_vision_summary_text'):
@@ -1645,7 +1928,7 @@ class MainWindow(QMainWindow):
                     if "next_false" in node.params and node.params["next_false"]:
                         old_id = node.params["next_false"]
                         node.params["next_false"] = node_id_mapping.get(old_id, old_id)
-                elif node.type == "loop":
+                elif node.type in ("loop", "find_all"):
                     # Update next_body and next_after references
                     if "next_body" in node.params and node.params["next_body"]:
                         old_id = node.params["next_body"]
@@ -1653,6 +1936,11 @@ class MainWindow(QMainWindow):
                     if "next_after" in node.params and node.params["next_after"]:
                         old_id = node.params["next_after"]
                         node.params["next_after"] = node_id_mapping.get(old_id, old_id)
+                elif node.type == "wait_for":
+                    # Update next_timeout reference
+                    if "next_timeout" in node.params and node.params["next_timeout"]:
+                        old_id = node.params["next_timeout"]
+                        node.params["next_timeout"] = node_id_mapping.get(old_id, old_id)
             
             # Fourth pass: duplicate and remap groups field
             # Groups are kept in sync with node ID remapping during duplication
@@ -1774,18 +2062,18 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         # Set flag to prevent signal emission from background thread
         self._is_closing = True
+        self._perf.stop_resource_sampling()
         
-        # Stop capture worker before closing to prevent background thread issues
-        if self._capture_worker is not None:
+        # Stop the vision pipeline before closing to prevent background thread issues
+        if self._vision_pipeline is not None:
             try:
-                self._capture_worker.stop()
-                # Wait a brief moment for the worker to finish current frame processing
-                import time
-                self._capture_worker.join(timeout=0.5)
+                self._vision_pipeline.stop()
+                # Wait a brief moment for the stages to finish current frame processing
+                self._vision_pipeline.join(timeout=0.5)
             except Exception:
-                print("[MainWindow] stop capture worker failed")
+                print("[MainWindow] stop vision pipeline failed")
                 traceback.print_exc()
-            self._capture_worker = None
+            self._vision_pipeline = None
         # Stop script runner cleanly by calling stop() method to set cancellation flag
         if hasattr(self, '_script_runner') and self._script_runner is not None:
             try:
@@ -1996,13 +2284,17 @@ class MainWindow(QMainWindow):
                     connections_data[f"{node.id}:next_true"] = next_true
                 if next_false and next_false in selected_node_ids:
                     connections_data[f"{node.id}:next_false"] = next_false
-            elif node.type == "loop":
+            elif node.type in ("loop", "find_all"):
                 next_body = node.params.get("next_body", "")
                 next_after = node.params.get("next_after", "")
                 if next_body and next_body in selected_node_ids:
                     connections_data[f"{node.id}:next_body"] = next_body
                 if next_after and next_after in selected_node_ids:
                     connections_data[f"{node.id}:next_after"] = next_after
+            elif node.type == "wait_for":
+                next_timeout = node.params.get("next_timeout", "")
+                if next_timeout and next_timeout in selected_node_ids:
+                    connections_data[f"{node.id}:next_timeout"] = next_timeout
         
         # Save template via sidebar
         self._sidebar.save_node_template(name.strip(), nodes_data, connections_data)
@@ -2100,13 +2392,17 @@ class MainWindow(QMainWindow):
                     node.params["next_true"] = node_id_mapping[next_true]
                 if next_false and next_false in node_id_mapping:
                     node.params["next_false"] = node_id_mapping[next_false]
-            elif node.type == "loop":
+            elif node.type in ("loop", "find_all"):
                 next_body = node.params.get("next_body", "")
                 next_after = node.params.get("next_after", "")
                 if next_body and next_body in node_id_mapping:
                     node.params["next_body"] = node_id_mapping[next_body]
                 if next_after and next_after in node_id_mapping:
                     node.params["next_after"] = node_id_mapping[next_after]
+            elif node.type == "wait_for":
+                next_timeout = node.params.get("next_timeout", "")
+                if next_timeout and next_timeout in node_id_mapping:
+                    node.params["next_timeout"] = node_id_mapping[next_timeout]
         
         # Then update standard connections and handle special connection format
         for old_src, old_dst in connections_data.items():
@@ -2148,22 +2444,17 @@ class ScriptRunnerThread(QThread):
         self._automation = automation
         self._script = script
         self._get_vision_result = get_vision_result
-        self._should_stop = False
-        self._mutex = QMutex()  # Use QMutex for thread-safe flag access
-        self._node_timings: dict[str, list[float]] = {}  # node_id -> list of execution times
-        self._script_start_time: Optional[float] = None
+        # Cancellation event handed to the controller; set() wakes any wait in the engine
+        self._stop_event = threading.Event()
     
     def stop(self):
         """Thread-safe method to request script execution to stop"""
-        self._mutex.lock()
-        try:
-            self._should_stop = True
-        finally:
-            self._mutex.unlock()
+        self._automation.cancel_execution(self._stop_event)
     
     def run(self):
+        # Name the runner thread for per-thread CPU accounting and traces
+        threading.current_thread().name = "ScriptRunner"
         try:
-            import time
             from datetime import datetime
             
             def log(msg: str):
@@ -2173,83 +2464,34 @@ class ScriptRunnerThread(QThread):
             def node_about_to_execute_callback(nid: str):
                 # Emit signal to MainWindow to set node to running state
                 self.nodeAboutToExecute.emit(nid)
-                # Record start time for performance tracking
-                if nid not in self._node_timings:
-                    self._node_timings[nid] = []
-                import time
-                self._node_timings[nid].append(time.time())
             
             def node_executed_callback(nid: str, ok: bool):
                 node = self._automation._find_node(self._script, nid) if hasattr(self._automation, '_find_node') else None
                 node_type = node.type if node else "unknown"
                 status = "成功" if ok else "失敗"
                 log(f"節點執行: {nid} ({node_type}) - {status}")
-                # Record end time and calculate duration
-                import time
-                if nid in self._node_timings and self._node_timings[nid]:
-                    start_time = self._node_timings[nid][-1]
-                    duration = time.time() - start_time
-                    # Store duration (negative to indicate it's a duration, not start time)
-                    self._node_timings[nid][-1] = duration
                 self.nodeExecuted.emit(nid, ok)
             
             self._automation.on_node_about_to_execute = node_about_to_execute_callback
             self._automation.on_node_executed = node_executed_callback
             log("腳本執行開始")
-            import time
-            self._script_start_time = time.time()
-            
-            # Pass cancellation callback to automation controller
-            def should_cancel():
-                self._mutex.lock()
-                try:
-                    return self._should_stop
-                finally:
-                    self._mutex.unlock()
-            
+            # Compile once up front; node lookups in the callbacks below hit the cached plan
+            plan = self._automation.compile_script(self._script)
+            for issue_node_id, issue in plan.issues:
+                log(f"編譯警告: {issue_node_id} - {issue}")
+            # Pass cancellation event to automation controller
             self._automation.execute_visual_script(
                 self._script, 
                 self._get_vision_result,
-                should_cancel_callback=should_cancel
+                cancel_event=self._stop_event
             )
             
-            import time
-            script_end_time = time.time()
-            total_duration = script_end_time - (self._script_start_time or script_end_time)
-            
-            if self._should_stop:
-                log("腳本執行已停止（使用者取消）")
-            else:
-                log("腳本執行完成")
-                # Generate performance report
-                report = {
-                    "total_duration": total_duration,
-                    "node_timings": {},
-                    "total_nodes_executed": 0,
-                    "node_type_summary": {}
-                }
-                for node_id, timings in self._node_timings.items():
-                    durations = [t for t in timings if t > 0]  # Filter out start times (negative)
-                    if durations:
-                        total_time = sum(durations)
-                        avg_time = total_time / len(durations)
-                        count = len(durations)
-                        node = self._automation._find_node(self._script, node_id) if hasattr(self._automation, '_find_node') else None
-                        node_type = node.type if node else "unknown"
-                        report["node_timings"][node_id] = {
-                            "type": node_type,
-                            "count": count,
-                            "total_time": total_time,
-                            "avg_time": avg_time,
-                            "min_time": min(durations),
-                            "max_time": max(durations)
-                        }
-                        report["total_nodes_executed"] += count
-                        if node_type not in report["node_type_summary"]:
-                            report["node_type_summary"][node_type] = {"count": 0, "total_time": 0.0}
-                        report["node_type_summary"][node_type]["count"] += count
-                        report["node_type_summary"][node_type]["total_time"] += total_time
-                self.performanceReportReady.emit(report)
+            # Node durations are kept by the controller as streaming statistics (also after a cancel)
+            report = self._automation.node_stats.report()
+            report["action_latency"] = self._automation.action_latency.summary(self._script.name or self._script.id)
+            log("腳本執行已停止（使用者取消）" if self._stop_event.is_set() else "腳本執行完成")
+            self.performanceReportReady.emit(report)
+            if not self._stop_event.is_set():
                 self.finishedOK.emit()
         except ValueError as e:
             self.logMessage.emit(f"錯誤: {str(e)}")
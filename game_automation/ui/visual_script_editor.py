@@ -17,6 +17,8 @@ class VisualNodeItem(QGraphicsRectItem):
         'loop': '#B8B0A8',       # Muted brown-gray
         'find_image': '#A8C4B0', # Muted green-gray
         'verify_image_color': '#C4B0A8', # Muted orange-gray
+        'wait_for': '#A8BCC4',   # Muted teal-gray
+        'find_all': '#B4C4A8',   # Muted olive-gray
         'default': '#B0B4B8'     # Neutral gray
     }
     
@@ -35,6 +37,8 @@ class VisualNodeItem(QGraphicsRectItem):
         'loop': '迴圈',
         'find_image': '找圖片（不點擊）',
         'verify_image_color': '驗證圖片顏色',
+        'wait_for': '等待畫面',
+        'find_all': '找全部',
         'default': '節點'
     }
     
@@ -771,7 +775,9 @@ class VisualScriptEditor(QWidget):
         {"id": "condition", "name": "條件", "color": "#A8B0C4"},
         {"id": "loop", "name": "迴圈", "color": "#B8B0A8"},
         {"id": "find_image", "name": "找圖片", "color": "#A8C4B0"},
-        {"id": "verify_image_color", "name": "驗證圖片顏色", "color": "#C4B0A8"}
+        {"id": "verify_image_color", "name": "驗證圖片顏色", "color": "#C4B0A8"},
+        {"id": "wait_for", "name": "等待畫面", "color": "#A8BCC4"},
+        {"id": "find_all", "name": "找全部", "color": "#B4C4A8"}
     ]
 
     def __init__(self, parent=None):
@@ -975,10 +981,14 @@ class VisualScriptEditor(QWidget):
                 nt = src_node.params.get("next_true", "")
                 nf = src_node.params.get("next_false", "")
                 return not (nt and nf)
-            if src_node.type == "loop":
+            if src_node.type in ("loop", "find_all"):
                 nb = src_node.params.get("next_body", "")
                 na = src_node.params.get("next_after", "")
                 return not (nb and na)
+            if src_node.type == "wait_for":
+                # Success path uses connections, timeout path uses next_timeout
+                nto = src_node.params.get("next_timeout", "")
+                return not (src_id in self._script.connections and nto)
             return src_id not in self._script.connections
         except Exception:
             return False
@@ -1072,8 +1082,8 @@ class VisualScriptEditor(QWidget):
             self._emit_changed()
             return
         
-        if src_node.type == "loop":
-            # For loop nodes, map connections to next_body and next_after
+        if src_node.type in ("loop", "find_all"):
+            # For loop/find_all nodes, map connections to next_body and next_after
             next_body = src_node.params.get("next_body", "")
             next_after = src_node.params.get("next_after", "")
             
@@ -1083,7 +1093,8 @@ class VisualScriptEditor(QWidget):
                 src_node.params["next_after"] = dst_id
             else:
                 # Both already set - emit signal to inform user
-                reason = "迴圈節點的迴圈體/迴圈後已設定，請先清除參數"
+                kind = "迴圈節點" if src_node.type == "loop" else "找全部節點"
+                reason = f"{kind}的迴圈體/迴圈後已設定，請先清除參數"
                 self.connectionRejected.emit(src_id, reason)
                 return
             # Emit signal to notify that node params changed
@@ -1093,6 +1104,20 @@ class VisualScriptEditor(QWidget):
             self._emit_changed()
             return
         
+        if src_node.type == "wait_for" and src_id in self._script.connections:
+            # wait_for: first connection is the success path (standard connection),
+            # second one maps to next_timeout
+            if src_node.params.get("next_timeout", ""):
+                reason = "等待節點的成功/逾時走向已設定，請先清除參數"
+                self.connectionRejected.emit(src_id, reason)
+                return
+            src_node.params["next_timeout"] = dst_id
+            self.nodeParamsChanged.emit(src_id, src_node)
+            self._push_history()  # Record state for undo/redo
+            self._rebuild_edges_from_model()
+            self._emit_changed()
+            return
+        
         # For other node types, use the standard connection mechanism
         # Guard against silently overwriting existing connections
         if src_id in self._script.connections:
@@ -1285,20 +1310,32 @@ class VisualScriptEditor(QWidget):
                 if next_false:
                     connected_nodes.add(next_false)
         
-        # Check loop nodes
+        # Check loop and find_all nodes
         for node in self._script.nodes:
-            if node.type == "loop":
+            if node.type in ("loop", "find_all"):
+                kind = "迴圈節點" if node.type == "loop" else "找全部節點"
+                if node.type == "find_all" and not node.params.get("label", ""):
+                    issues.append((node.id, "找全部節點缺少標籤"))
                 next_body = node.params.get("next_body", "")
                 next_after = node.params.get("next_after", "")
                 if not next_body:
-                    issues.append((node.id, "迴圈節點缺少迴圈體"))
+                    issues.append((node.id, f"{kind}缺少迴圈體"))
                 if not next_after:
-                    issues.append((node.id, "迴圈節點缺少迴圈後"))
+                    issues.append((node.id, f"{kind}缺少迴圈後"))
                 if next_body:
                     connected_nodes.add(next_body)
                 if next_after:
                     connected_nodes.add(next_after)
         
+        # Check wait_for nodes (next_timeout is optional: an unset timeout ends the script)
+        for node in self._script.nodes:
+            if node.type == "wait_for":
+                if node.params.get("mode", "label") == "label" and not node.params.get("label", ""):
+                    issues.append((node.id, "等待節點缺少標籤"))
+                next_timeout = node.params.get("next_timeout", "")
+                if next_timeout:
+                    connected_nodes.add(next_timeout)
+        
         # Check for isolated nodes
         for node in self._script.nodes:
             if node.id not in connected_nodes and node.id != starting_node_id:
@@ -1489,11 +1526,14 @@ class VisualScriptEditor(QWidget):
                         n.params["next_true"] = ""
                     if n.params.get("next_false") == node_id:
                         n.params["next_false"] = ""
-                elif n.type == "loop":
+                elif n.type in ("loop", "find_all"):
                     if n.params.get("next_body") == node_id:
                         n.params["next_body"] = ""
                     if n.params.get("next_after") == node_id:
                         n.params["next_after"] = ""
+                elif n.type == "wait_for":
+                    if n.params.get("next_timeout") == node_id:
+                        n.params["next_timeout"] = ""
         except Exception:
             print("[VisualScriptEditor] remove_node_connections update params failed")
             traceback.print_exc()
@@ -1529,13 +1569,17 @@ class VisualScriptEditor(QWidget):
                         self._create_edge(node.id, nt)
                     if nf:
                         self._create_edge(node.id, nf)
-                elif node.type == "loop":
+                elif node.type in ("loop", "find_all"):
                     nb = node.params.get("next_body", "")
                     na = node.params.get("next_after", "")
                     if nb:
                         self._create_edge(node.id, nb)
                     if na:
                         self._create_edge(node.id, na)
+                elif node.type == "wait_for":
+                    nto = node.params.get("next_timeout", "")
+                    if nto:
+                        self._create_edge(node.id, nto)
         except Exception:
             print("[VisualScriptEditor] rebuild create edges failed")
             traceback.print_exc()
@@ -468,8 +468,18 @@ class ResourceSidebar(QWidget):
             templates_to_save = {}
             for k, v in self._templates.items():
                 templates_to_save[k] = to_relative_path(v)
+            # Keep other top-level sections (e.g. "capture") intact
+            data = {}
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                pass
+            if not isinstance(data, dict):
+                data = {}
+            data["templates"] = templates_to_save
             with open(file_path, "w", encoding="utf-8") as f:
-                json.dump({"templates": templates_to_save}, f, ensure_ascii=False, indent=2)
+                json.dump(data, f, ensure_ascii=False, indent=2)
             try:
                 from ..core import targets as _targets
                 _targets.reload_targets_from_resources(override=False, prune_missing=True)